@@ -40,11 +40,14 @@ setup(
     install_requires=['boto3', 'six', 'pip', 'flask', 'gunicorn', 'gevent', 'werkzeug'],
 
     extras_require={
-        'test': ['tox', 'flake8', 'pytest', 'pytest-cov', 'mock', 'sagemaker', 'numpy']
+        'test': ['tox', 'flake8', 'pytest', 'pytest-cov', 'mock', 'sagemaker', 'numpy'],
+        'asgi': ['uvicorn'],
+        'zstd': ['zstandard']
     },
 
     entry_points={
           'console_scripts': ['serve=sagemaker_containers.cli.serve:main',
+                              'transform=sagemaker_containers.cli.transform:main',
                               'train=sagemaker_containers.cli.train:main'],
     }
 )
@@ -0,0 +1,113 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import os
+import threading
+import time
+
+from sagemaker_containers import _metrics
+
+
+class AdmissionController(object):
+    """Bounds the number of requests transformed at the same time by a worker, and the number of requests
+    waiting for their turn.
+
+    A request is admitted immediately while fewer than max_in_flight requests are in flight. Otherwise it waits
+    in the queue, unless max_queued requests are already waiting, in which case it is rejected without waiting.
+    Rejecting the requests that cannot be served in time keeps the latency of the admitted requests stable
+    under overload.
+
+    Examples:
+    >>>admission = AdmissionController(max_in_flight=4, max_queued=8)
+    >>>if admission.acquire():
+    >>>     try:
+    >>>         transform()
+    >>>     finally:
+    >>>         admission.release()
+
+    Attributes:
+        in_flight (int): number of requests admitted and not released.
+        queued (int): number of requests waiting to be admitted.
+        admitted (int): number of requests admitted.
+        rejected (int): number of requests rejected because the queue was full.
+        queue_time (float): total time in seconds that the admitted requests waited in the queue.
+        max_queue_time (float): longest time in seconds that an admitted request waited in the queue.
+    """
+
+    def __init__(self, max_in_flight, max_queued):
+        """
+        Args:
+            max_in_flight (int): maximum number of requests in flight.
+            max_queued (int): maximum number of requests waiting to be admitted.
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.queue_time = 0.
+        self.max_queue_time = 0.
+        self._lock = threading.Lock()
+        self._semaphore = None
+        self._pid = None
+
+    def acquire(self):  # type: () -> bool
+        """Admit a request, waiting in the queue if necessary. Admitted requests must call release when done.
+
+        Returns:
+            (bool): True if the request was admitted, False if it was rejected because the queue was full.
+        """
+        semaphore = self._get_semaphore()
+        start = time.time()
+
+        if not semaphore.acquire(False):
+            with self._lock:
+                if self.queued >= self.max_queued:
+                    self.rejected += 1
+                    _metrics.increment('requests_rejected')
+                    return False
+                self.queued += 1
+
+            try:
+                semaphore.acquire()
+            finally:
+                with self._lock:
+                    self.queued -= 1
+
+        waited = time.time() - start
+        with self._lock:
+            self.in_flight += 1
+            self.admitted += 1
+            self.queue_time += waited
+            self.max_queue_time = max(self.max_queue_time, waited)
+
+        _metrics.observe('queue', waited)
+        return True
+
+    def release(self):  # type: () -> None
+        """Release the slot of an admitted request, admitting the next request in the queue."""
+        with self._lock:
+            self.in_flight -= 1
+        self._get_semaphore().release()
+
+    def _get_semaphore(self):
+        # the semaphore is created lazily, in the worker process, after gunicorn forks and the gevent worker
+        # monkey-patches the threading primitives. See sagemaker_containers._batching.Batcher.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._semaphore = threading.Semaphore(self.max_in_flight)
+                    self._pid = os.getpid()
+        return self._semaphore
@@ -0,0 +1,122 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""CPU affinity and math library threads of the model server workers.
+
+By default, every worker runs the OpenMP, MKL and OpenBLAS thread pools with one thread per cpu, so N workers
+run N times more threads than cpus. When ServingEnv.model_server_cpu_affinity is True, the cpus of the
+container are split among the workers: each worker is pinned to its share of the cpus after gunicorn forks it,
+and its math libraries use one thread per cpu of its share.
+
+The cpus are split among the configured number of workers, exported by the model server in the environment
+variable SAGEMAKER_CPU_AFFINITY_WORKERS. The workers started beyond that number, e.g. by
+sagemaker_containers._autoscaler, are not pinned: they run on all the cpus, with as many math library threads
+as the smallest share.
+
+The pre_fork and post_fork server hooks of this module are called by sagemaker_containers._gunicorn, the
+gunicorn configuration file of the model server, in this mode. It must not import the math libraries, which
+read the number of threads when they are loaded.
+"""
+from __future__ import absolute_import
+
+import itertools
+import multiprocessing
+import os
+
+from sagemaker_containers import _params
+
+THREADS_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+_TOPOLOGY_DIR = '/sys/devices/system/cpu/cpu%d/topology'
+
+
+def available_cpus():  # type: () -> list
+    """Returns:
+        (list[int]): the cpus the current process can run on, ordered by socket and physical core, so the
+            hyperthreads of a core are next to each other."""
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = os.sched_getaffinity(0)
+    else:
+        cpus = range(multiprocessing.cpu_count())
+
+    return sorted(cpus, key=lambda cpu: (_topology(cpu, 'physical_package_id'), _topology(cpu, 'core_id'), cpu))
+
+
+def layout(cpus, workers):  # type: (list, int) -> list
+    """Split the cpus among the workers.
+
+    Args:
+        cpus (list[int]): the cpus, see available_cpus.
+        workers (int): the number of workers.
+
+    Returns:
+        (list[list[int]]): the cpus of each worker. Each worker has a contiguous share of the cpus, the first
+            workers have one more cpu when the cpus are not evenly divisible. When there are more workers than
+            cpus, the workers share the cpus, one cpu per worker.
+    """
+    if workers >= len(cpus):
+        return [[cpus[i % len(cpus)]] for i in range(workers)]
+
+    size, remainder = divmod(len(cpus), workers)
+    shares = []
+    start = 0
+    for i in range(workers):
+        end = start + size + (1 if i < remainder else 0)
+        shares.append(cpus[start:end])
+        start = end
+    return shares
+
+
+def threads_env(threads):  # type: (int) -> dict
+    """Returns:
+        (dict): the environment variables setting the number of threads of the math libraries."""
+    return {name: str(threads) for name in THREADS_ENV_VARS}
+
+
+def pre_fork(server, worker):
+    """gunicorn server hook, called in the master before forking a worker. Assigns the worker the first slot of
+    cpus not used by the other workers, including the slot of a worker that exited."""
+    used = {getattr(w, 'cpu_slot', None) for w in server.WORKERS.values()}
+    worker.cpu_slot = next(slot for slot in itertools.count() if slot not in used)
+
+
+def post_fork(server, worker):
+    """gunicorn server hook, called in the worker after it is forked and before it loads the application. Pins
+    the worker to the cpus of its slot and sets the number of threads of the math libraries."""
+    cpus = available_cpus()
+    shares = layout(cpus, int(os.environ.get(_params.CPU_AFFINITY_WORKERS_ENV, server.num_workers)))
+
+    if worker.cpu_slot >= len(shares):
+        os.environ.update(threads_env(min(len(share) for share in shares)))
+        server.log.info('Worker %s is beyond the %d workers sharing the cpus, it runs on all the cpus.',
+                        os.getpid(), len(shares))
+        return
+
+    cpus = shares[worker.cpu_slot]
+
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    else:
+        server.log.warning('CPU affinity is not supported by this Python version. Only the threads are limited.')
+
+    os.environ.update(threads_env(len(cpus)))
+
+    server.log.info('Worker %s pinned to cpus %s, with %d math library threads.',
+                    os.getpid(), ','.join(str(cpu) for cpu in cpus), len(cpus))
+
+
+def _topology(cpu, name):  # type: (int, str) -> int
+    try:
+        with open(os.path.join(_TOPOLOGY_DIR % cpu, name)) as f:
+            return int(f.read())
+    except (IOError, OSError, ValueError):
+        return 0
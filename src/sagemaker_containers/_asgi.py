@@ -0,0 +1,316 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""ASGI model server. Requires Python 3.5 or later.
+
+Implements the same /ping and /invocations contract as sagemaker_containers._worker.Worker, accepting
+``async def`` implementations of the transformer functions. It is used by the model server when
+ServingEnv.model_server_worker_class is 'asgi', which requires uvicorn.
+
+Examples:
+>>>from sagemaker_containers.beta.framework import asgi
+>>>
+>>>async def predict_fn(data, model):
+>>>     return await model.predict(data)
+>>>
+>>>transformer = asgi.Transformer(model_fn=model_fn, predict_fn=predict_fn)
+>>>app = asgi.Worker(transformer)
+"""
+from __future__ import absolute_import
+
+import asyncio
+import concurrent.futures
+import functools
+import io
+
+from six.moves import http_client
+from werkzeug import exceptions
+
+from sagemaker_containers import (_compression, _content_types, _errors, _functions, _logging, _metrics, _readiness,
+                                  _transformer, _worker)
+
+logger = _logging.get_logger()
+
+
+class Transformer(_transformer.Transformer):
+    """Transformer accepting ``async def`` implementations of its functions.
+
+    Coroutine functions are awaited in the event loop. Regular functions run in a thread pool, so they do not
+    block the event loop. The thread pool has a single thread when thread_safe is False.
+
+    Requests are not pipelined, split or coalesced: ServingEnv.pipeline_threads, record_split_threads and
+    request_coalescing are ignored.
+    """
+
+    def __init__(self, model_fn=None, input_fn=None, predict_fn=None, output_fn=None,
+                 transform_fn=None, error_class=_errors.ClientError, thread_safe=True):
+        super(Transformer, self).__init__(model_fn=model_fn, input_fn=input_fn, predict_fn=predict_fn,
+                                          output_fn=output_fn, transform_fn=transform_fn,
+                                          error_class=error_class, thread_safe=thread_safe)
+
+        self._coroutine_fns = {name for name, fn in [('model_fn', model_fn), ('input_fn', input_fn),
+                                                     ('predict_fn', predict_fn), ('output_fn', output_fn),
+                                                     ('transform_fn', transform_fn)]
+                               if asyncio.iscoroutinefunction(fn)}
+
+        if 'predict_fn' in self._coroutine_fns:
+            # requests are not batched by sagemaker_containers._batching, which requires a regular predict_fn.
+            self._predict_fn = _functions.error_wrapper(predict_fn, error_class)
+
+        self._has_transform_fn = transform_fn is not None
+        self._executor = None if thread_safe else concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def _wrap_transform_fn(self, default_transform_fn):  # type: (bool) -> None
+        # the requests are transformed in the event loop: transform_fn is not wrapped.
+        if _worker.env.multi_model:
+            raise ValueError('Multi-model serving is not supported by the asgi model server worker class.')
+
+        ignored = [name for name, value in [('pipeline_threads', _worker.env.pipeline_threads),
+                                            ('record_split_threads', _worker.env.record_split_threads > 1),
+                                            ('request_coalescing', _worker.env.request_coalescing)] if value]
+        if ignored:
+            logger.warning('%s ignored: not supported by the asgi model server worker class.', ', '.join(ignored))
+
+    async def initialize_async(self):  # type: () -> None
+        """Load the model without blocking the event loop. See Transformer.initialize."""
+        self._model = await self._call('model_fn', self._model_fn, _worker.env.model_dir)
+
+    async def transform_async(self, content, content_type, accept):  # type: (object, str, str) -> _worker.Response
+        """Deserialize the request data, make a prediction, and return a serialized response.
+
+        Args:
+            content (obj): the request data.
+            content_type (str): the request Content-Type.
+            accept (str): the content type expected by the client.
+
+        Returns:
+            sagemaker_containers.beta.framework.worker.Response: a Flask response object.
+        """
+        if self._cache is None:
+            return await self._transform_async(content, content_type, accept)
+
+        key = self._cache_key(content, content_type, accept)
+        cached = self._cache.get(key)
+        if cached is not None:
+            _metrics.increment('cache_hits')
+            return _transformer._cached_response(cached)
+
+        _metrics.increment('cache_misses')
+        response = await self._transform_async(content, content_type, accept)
+        self._cache_response(key, response)
+        return response
+
+    async def _transform_async(self, content, content_type, accept):
+        with _metrics.timer('transform'):
+            if self._has_transform_fn:
+                result = await self._call('transform_fn', self._transform_fn, self._model, content, content_type,
+                                          accept)
+            else:
+                result = await self._default_transform_async(content, content_type, accept)
+
+        return _transformer._response(result, accept)
+
+    async def _default_transform_async(self, content, content_type, accept):
+        try:
+            with _metrics.timer('input'):
+                data = await self._call('input_fn', self._input_fn, content, content_type)
+        except _errors.UnsupportedFormatError as e:
+            return self._error_response(e, http_client.UNSUPPORTED_MEDIA_TYPE)
+
+        with _metrics.timer('predict'):
+            prediction = await self._call('predict_fn', self._predict_fn, data, self._model)
+
+        try:
+            with _metrics.timer('output'):
+                result = await self._call('output_fn', self._output_fn, prediction, accept)
+        except _errors.UnsupportedFormatError as e:
+            return self._error_response(e, http_client.NOT_ACCEPTABLE)
+
+        return result
+
+    async def _call(self, name, fn, *args):
+        if name in self._coroutine_fns:
+            try:
+                return await fn(*args)
+            except Exception as e:
+                raise self._error_class(e) from e
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+
+
+class Worker(object):
+    """ASGI application that receives predictions from a Transformer ready for inferences.
+
+    The transformer is initialized and warmed up during the ASGI lifespan startup, or before the first request
+    when the server does not support the lifespan protocol.
+    """
+
+    def __init__(self, transformer, healthcheck_fn=None):
+        """
+        Args:
+            transformer (Transformer): responsible to make predictions against the model.
+            healthcheck_fn (function, optional): function, or coroutine function, used for healthcheck calls.
+                If not specified, /ping returns 200 once all the workers are ready. Returns:
+                    `sagemaker_containers.beta.framework.worker.Response`: the healthcheck response.
+        """
+        self._transformer = transformer
+        self._healthcheck_fn = healthcheck_fn
+        self._startup_future = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._startup()
+
+            if scope['path'] != '/invocations':
+                await _send_response(send, await self._handle(scope, receive))
+                return
+
+            _metrics.add('requests_in_flight', 1)
+            try:
+                response = await self._handle(scope, receive)
+                if _worker.env.response_compression:
+                    response = _worker.compress(response, _header(scope, 'accept-encoding'))
+                with _metrics.timer('write'):
+                    await _send_response(send, response)
+            finally:
+                _metrics.add('requests_in_flight', -1)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self._startup()
+                except Exception as e:
+                    logger.exception('Model server startup failed')
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                else:
+                    await send({'type': 'lifespan.startup.complete'})
+
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _startup(self):
+        if self._startup_future is None:
+            self._startup_future = asyncio.ensure_future(self._initialize())
+        return self._startup_future
+
+    async def _initialize(self):
+        await self._transformer.initialize_async()
+
+        for path, data, content_type in _worker.warmup_requests():
+            response = await self._transformer.transform_async(_content(data, content_type), content_type,
+                                                               content_type)
+
+            if response.status_code != http_client.OK:
+                logger.warning('Warmup request %s failed with status code %s', path, response.status_code)
+
+        _readiness.mark_ready(_worker.env.model_server_workers)
+
+    async def _handle(self, scope, receive):
+        path, method = scope['path'], scope['method']
+
+        try:
+            if path == '/ping' and method in ('GET', 'HEAD'):
+                return await self._ping()
+
+            if path == '/invocations' and method == 'POST':
+                headers = {k.decode('latin1').lower(): v.decode('latin1') for k, v in scope['headers']}
+                with _metrics.timer('read'):
+                    body = await _read_body(receive)
+                return await self._invoke(headers, body)
+
+            if path == '/metrics' and method in ('GET', 'HEAD'):
+                return _worker.default_metrics_fn()
+        except Exception:
+            logger.exception('Exception on %s [%s]', path, method)
+            return _worker.Response(status=http_client.INTERNAL_SERVER_ERROR)
+
+        return _worker.Response(response='{}', status=http_client.NOT_FOUND)
+
+    async def _ping(self):
+        if self._healthcheck_fn is None:
+            status = http_client.OK if _readiness.is_ready() else http_client.SERVICE_UNAVAILABLE
+            return _worker.Response(status=status)
+
+        response = self._healthcheck_fn()
+        if asyncio.iscoroutine(response):
+            response = await response
+        return response
+
+    async def _invoke(self, headers, body):
+        # same defaults as sagemaker_containers._worker.Request
+        content_type = headers.get('contenttype') or headers.get('content-type') or _content_types.JSON
+        accept = headers.get('accept', _content_types.JSON)
+
+        try:
+            body = _compression.decompress(body, headers.get('content-encoding'),
+                                           _worker.env.max_decompressed_request_size)
+        except exceptions.HTTPException as e:
+            return e.get_response()
+
+        return await self._transformer.transform_async(_content(body, content_type), content_type, accept)
+
+
+def _header(scope, name):  # type: (dict, str) -> str
+    for key, value in scope['headers']:
+        if key.decode('latin1').lower() == name:
+            return value.decode('latin1')
+    return None
+
+
+def _content(data, content_type):  # type: (bytes, str) -> object
+    if _worker.env.stream_requests:
+        # the body is already read by the ASGI server, the stream only provides the same interface as Worker.
+        return io.BytesIO(data)
+    return data.decode('utf-8') if content_type in _content_types.UTF8_TYPES else data
+
+
+async def _read_body(receive):  # type: (function) -> bytes
+    chunks = []
+    more_body = True
+
+    while more_body:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        more_body = message.get('more_body', False)
+
+    return b''.join(chunks)
+
+
+async def _send_response(send, response):  # type: (function, _worker.Response) -> None
+    headers = [[k.lower().encode('latin1'), v.encode('latin1')] for k, v in response.headers.items() if v]
+
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+
+    if not response.is_streamed:
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+        return
+
+    # the chunks of a streamed response are produced in a thread, so they do not block the event loop.
+    loop = asyncio.get_event_loop()
+    chunks = response.iter_encoded()
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                break
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        response.close()
+
+    await send({'type': 'http.response.body', 'body': b''})
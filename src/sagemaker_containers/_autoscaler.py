@@ -0,0 +1,329 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Autoscaling of the gunicorn workers of the model server.
+
+The autoscaler runs in sagemaker_containers._server, next to the gunicorn master. Every second it samples the
+number of /invocations requests in flight in all the workers, see sagemaker_containers._metrics, and the cpu
+usage of the workers. It adds workers, with the signal TTIN, when the workers are saturated and the cpus are
+not, and removes them, with the signal TTOU, when the load has been low for a while.
+
+The range of workers can be changed at runtime through a unix socket, with one JSON object per connection:
+
+>>>from sagemaker_containers import _autoscaler
+>>>
+>>>_autoscaler.control(min_workers=2, max_workers=8)
+{'workers': 4, 'min_workers': 2, 'max_workers': 8, 'in_flight': 3.0, 'cpu_utilization': 0.42}
+"""
+from __future__ import absolute_import
+
+import collections
+import errno
+import json
+import math
+import os
+import signal
+import socket
+import threading
+import time
+
+from sagemaker_containers import _env, _logging, _metrics
+
+logger = _logging.get_logger()
+
+CONTROL_SOCKET = '/tmp/sagemaker-autoscaler.sock'  # type: str
+
+SAMPLE_INTERVAL = 1  # type: int
+
+# pending signals of the same kind are merged, and the gunicorn master handles a few signals at a time.
+SIGNAL_INTERVAL = .1  # type: float
+
+# workers are added when the mean number of requests in flight over the last SCALE_UP_WINDOW samples reaches
+# SCALE_UP_UTILIZATION of the capacity of the workers, unless the cpu utilization is above MAX_CPU_UTILIZATION,
+# in which case more workers would only compete for the same cpus.
+SCALE_UP_WINDOW = 5  # type: int
+SCALE_UP_UTILIZATION = 1.  # type: float
+MAX_CPU_UTILIZATION = .9  # type: float
+
+# a worker is removed when, for the last SCALE_DOWN_WINDOW samples, one less worker would have been used below
+# SCALE_DOWN_UTILIZATION of its capacity.
+SCALE_DOWN_WINDOW = 30  # type: int
+SCALE_DOWN_UTILIZATION = .5  # type: float
+
+
+class Autoscaler(object):
+    """Adjusts the number of workers of a gunicorn master between min_workers and max_workers.
+
+    Attributes:
+        workers (int): number of workers of the gunicorn master.
+        in_flight (float): number of requests in flight at the last sample.
+        cpu_utilization (float): fraction of the cpus of the container used by the workers at the last sample.
+    """
+
+    def __init__(self, master_pid, workers, min_workers, max_workers, concurrency=1):
+        """
+        Args:
+            master_pid (int): pid of the gunicorn master.
+            workers (int): number of workers started by the gunicorn master.
+            min_workers (int): minimum number of workers.
+            max_workers (int): maximum number of workers.
+            concurrency (int): number of requests a worker serves in parallel, e.g. its number of threads.
+        """
+        _validate(min_workers, max_workers)
+
+        self.master_pid = master_pid
+        self.workers = workers
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.concurrency = concurrency
+        self.in_flight = 0.
+        self.cpu_utilization = 0.
+        self._samples = collections.deque(maxlen=SCALE_DOWN_WINDOW)
+        self._cpu_times = {}
+        self._last_sample = time.time()
+        self._lock = threading.Lock()
+        self._paused = False
+
+    def start(self, control_socket=CONTROL_SOCKET):  # type: (str) -> None
+        """Start sampling the workers, and serving the control socket, in daemon threads."""
+        server = _listen(control_socket)
+
+        for target, args in [(self._run, ()), (self._serve, (server,))]:
+            thread = threading.Thread(target=target, args=args)
+            thread.daemon = True
+            thread.start()
+
+        logger.info('Autoscaling between %d and %d workers. Control socket: %s',
+                    self.min_workers, self.max_workers, control_socket)
+
+    def sample(self, in_flight, cpu_utilization):  # type: (float, float) -> int
+        """Record a sample and add or remove workers.
+
+        Args:
+            in_flight (float): number of requests in flight in all the workers.
+            cpu_utilization (float): fraction of the cpus of the container used by the workers.
+
+        Returns:
+            (int): number of workers added, negative if workers were removed. 0 while the autoscaler is paused.
+        """
+        with self._lock:
+            self.in_flight = in_flight
+            self.cpu_utilization = cpu_utilization
+            if self._paused:
+                return 0
+
+            self._samples.append((in_flight, cpu_utilization))
+
+            change = self._target() - self.workers
+            if change:
+                self._scale(change)
+            return change
+
+    def pause(self):  # type: () -> None
+        """Stop adding and removing workers, e.g. while sagemaker_containers._reloader replaces them. Waits for
+        the workers being added or removed."""
+        with self._lock:
+            self._paused = True
+
+    def resume(self):  # type: () -> None
+        """Add and remove workers again, based on the samples taken from now on."""
+        with self._lock:
+            self._paused = False
+            self._samples.clear()
+
+    def configure(self, min_workers=None, max_workers=None):  # type: (int, int) -> dict
+        """Change the range of workers. The workers are adjusted at the next sample.
+
+        Returns:
+            (dict): the status of the autoscaler. See status.
+        """
+        with self._lock:
+            min_workers = self.min_workers if min_workers is None else int(min_workers)
+            max_workers = self.max_workers if max_workers is None else int(max_workers)
+            _validate(min_workers, max_workers)
+
+            self.min_workers, self.max_workers = min_workers, max_workers
+            logger.info('Autoscaling between %d and %d workers.', min_workers, max_workers)
+
+        return self.status()
+
+    def follow(self, master_pid, workers):  # type: (int, int) -> None
+        """Scale a new gunicorn master, e.g. after the previous one crashed and was restarted.
+
+        Args:
+            master_pid (int): pid of the gunicorn master.
+            workers (int): number of workers started by the gunicorn master.
+        """
+        with self._lock:
+            self.master_pid = master_pid
+            self.workers = workers
+            self._samples.clear()
+            self._cpu_times = {}
+
+    def status(self):  # type: () -> dict
+        """Returns:
+            (dict): the number of workers, the range of workers, and the last sample."""
+        return {'workers': self.workers, 'min_workers': self.min_workers, 'max_workers': self.max_workers,
+                'in_flight': self.in_flight, 'cpu_utilization': self.cpu_utilization}
+
+    def _target(self):  # type: () -> int
+        if self.workers < self.min_workers:
+            return self.min_workers
+        if self.workers > self.max_workers:
+            return self.max_workers
+
+        recent = list(self._samples)[-SCALE_UP_WINDOW:]
+        in_flight = sum(s[0] for s in recent) / len(recent)
+        cpu_utilization = sum(s[1] for s in recent) / len(recent)
+
+        if (len(recent) == SCALE_UP_WINDOW and self.workers < self.max_workers
+                and in_flight >= SCALE_UP_UTILIZATION * self.concurrency * self.workers
+                and cpu_utilization < MAX_CPU_UTILIZATION):
+            # enough workers for the requests in flight, at most twice as many workers at a time.
+            needed = int(math.ceil(in_flight / self.concurrency))
+            return min(self.max_workers, 2 * self.workers, max(self.workers + 1, needed))
+
+        capacity = SCALE_DOWN_UTILIZATION * self.concurrency * (self.workers - 1)
+        if (len(self._samples) == SCALE_DOWN_WINDOW and self.workers > self.min_workers
+                and all(s[0] < capacity for s in self._samples)):
+            return self.workers - 1
+
+        return self.workers
+
+    def _scale(self, change):  # type: (int) -> None
+        signo = signal.SIGTTIN if change > 0 else signal.SIGTTOU
+
+        for i in range(abs(change)):
+            if i:
+                time.sleep(SIGNAL_INTERVAL)
+            os.kill(self.master_pid, signo)
+
+        logger.info('Scaling from %d to %d workers. Requests in flight: %.1f, cpu utilization: %.2f',
+                    self.workers, self.workers + change, self.in_flight, self.cpu_utilization)
+
+        self.workers += change
+        # the next decision waits for samples of the new workers.
+        self._samples.clear()
+
+    def _run(self):
+        while True:
+            time.sleep(SAMPLE_INTERVAL)
+            try:
+                self.sample(_metrics.value('requests_in_flight'), self._measure_cpu_utilization())
+            except Exception:
+                logger.exception('Autoscaler sample failed')
+
+    def _measure_cpu_utilization(self):  # type: () -> float
+        now = time.time()
+        cpu_times = {pid: _cpu_time(pid) for pid in _children(self.master_pid)}
+
+        # workers started since the last sample start counting from now.
+        used = sum(max(cpu_time - self._cpu_times.get(pid, cpu_time), 0) for pid, cpu_time in cpu_times.items())
+        elapsed = max(now - self._last_sample, 1e-6)
+
+        self._cpu_times = cpu_times
+        self._last_sample = now
+        return used / elapsed / _env.num_cpus()
+
+    def _serve(self, server):  # type: (socket.socket) -> None
+        while True:
+            connection, _ = server.accept()
+            try:
+                connection.sendall(self._handle(_read_line(connection)).encode('utf-8') + b'\n')
+            except Exception:
+                logger.exception('Autoscaler control request failed')
+            finally:
+                connection.close()
+
+    def _handle(self, line):  # type: (bytes) -> str
+        try:
+            settings = json.loads(line.decode('utf-8')) if line.strip() else {}
+            unknown = set(settings) - {'min_workers', 'max_workers'}
+            if unknown:
+                raise ValueError('Unknown settings: %s' % ', '.join(sorted(unknown)))
+            return json.dumps(self.configure(**settings))
+        except ValueError as e:
+            return json.dumps({'error': str(e)})
+
+
+def control(control_socket=CONTROL_SOCKET, **settings):  # type: (str, **int) -> dict
+    """Change the range of workers of the running model server.
+
+    Args:
+        control_socket (str): path of the control socket of the autoscaler.
+        **settings: min_workers and/or max_workers. The status is returned unchanged without settings.
+
+    Returns:
+        (dict): the status of the autoscaler, or the error of an invalid change.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(control_socket)
+        client.sendall(json.dumps(settings).encode('utf-8') + b'\n')
+        return json.loads(_read_line(client).decode('utf-8'))
+    finally:
+        client.close()
+
+
+def _validate(min_workers, max_workers):  # type: (int, int) -> None
+    if not 1 <= min_workers <= max_workers:
+        raise ValueError('Invalid range of workers [%s, %s]. The minimum must be at least 1 and at most the '
+                         'maximum.' % (min_workers, max_workers))
+
+
+def _listen(path):  # type: (str) -> socket.socket
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(8)
+    return server
+
+
+def _read_line(connection):  # type: (socket.socket) -> bytes
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = connection.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def _children(pid):  # type: (int) -> list
+    children = []
+    for name in os.listdir('/proc'):
+        if name.isdigit() and _stat(name)[1:2] == [str(pid)]:
+            children.append(int(name))
+    return children
+
+
+def _cpu_time(pid):  # type: (int) -> float
+    """Returns:
+        (float): cpu time in seconds, user and system, of the process, or 0 if it exited."""
+    fields = _stat(pid)
+    if not fields:
+        return 0.
+    return (int(fields[11]) + int(fields[12])) / float(os.sysconf('SC_CLK_TCK'))
+
+
+def _stat(pid):  # type: (object) -> list
+    # the fields of /proc/<pid>/stat after the command name, starting with the state and the parent pid.
+    try:
+        with open('/proc/%s/stat' % pid) as f:
+            return f.read().rsplit(')', 1)[1].split()
+    except (IOError, OSError, IndexError):
+        return []
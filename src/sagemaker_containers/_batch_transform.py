@@ -0,0 +1,336 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Offline batch transform, without the model server.
+
+Every file of an input directory is read incrementally as records, see sagemaker_containers._records, and each
+record is transformed by Transformer.transform_content, as if it was the body of an /invocations request. The
+responses of the records of an input file are written, in order, to the file with the same relative path and the
+.out suffix in the output directory.
+
+When a cache directory is set, the responses of the records are kept in it, keyed by the model version, the
+content type, the accept and the record, so the records of a retried or rerun job are not transformed again. See
+sagemaker_containers._cache.DiskCache. The cache is not invalidated when the inference code changes: clear the
+directory, or use another one.
+
+Examples:
+>>>from sagemaker_containers import _batch_transform
+>>>
+>>>stats = _batch_transform.run('/opt/ml/input/data', '/opt/ml/output', content_type='text/csv',
+>>>                             split_type='Line')
+"""
+from __future__ import absolute_import
+
+import collections
+import importlib
+import io
+import multiprocessing
+import os
+import threading
+import time
+
+from six.moves import http_client
+
+from sagemaker_containers import (_cache, _content_types, _env, _errors, _logging, _modules, _records,
+                                  _transformer, _worker)
+
+logger = _logging.get_logger()
+
+OUTPUT_SUFFIX = '.out'  # type: str
+
+# SageMaker batch transform AssembleWith: the responses of the records of a file are either concatenated or
+# followed by a newline.
+ASSEMBLE_WITH = (_records.NONE, _records.LINE)
+
+# number of records sent at once to a pool process.
+CHUNK_SIZE = 16  # type: int
+
+# maximum number of records read ahead of the responses written, per process. The records of the input files
+# are read incrementally, so the memory used by the records waiting to be transformed is bounded.
+READ_AHEAD = 4 * CHUNK_SIZE  # type: int
+
+Stats = collections.namedtuple('Stats', ['files', 'records', 'bytes_in', 'bytes_out', 'seconds', 'cached'])
+
+# the transformer used by the current process. It is created before the pool processes are forked, and
+# initialized in each one of them.
+_transformer_instance = None
+
+
+class TransformRecordError(_errors.ClientError):
+    """Raised when the response of a record does not have the status code 200."""
+
+    def __init__(self, path, record, status_code, body):
+        message = 'Record %d of %s failed with status code %d: %s' % (record, path, status_code,
+                                                                      body.decode('utf-8', 'replace'))
+        super(TransformRecordError, self).__init__(message)
+
+
+def load_transformer(transformer=None):  # type: (str) -> _transformer.Transformer
+    """Load the transformer used to transform the records.
+
+    Args:
+        transformer (str): the transformer of the framework, in the format 'module:attribute', where attribute is
+            a Transformer or a function returning one. If not specified, a Transformer is created with the
+            model_fn, input_fn, predict_fn, output_fn and transform_fn implemented by the user module, see
+            ServingEnv.module_name, and the default implementation of the other functions.
+
+    Returns:
+        (Transformer): the transformer, not initialized.
+    """
+    if transformer:
+        module_name, attribute = transformer.split(':')
+        obj = getattr(importlib.import_module(module_name), attribute)
+        return obj if isinstance(obj, _transformer.Transformer) else obj()
+
+    env = _env.ServingEnv()
+    user_module = _modules.import_module(env.module_dir, env.module_name)
+
+    fns = ['model_fn', 'input_fn', 'predict_fn', 'output_fn', 'transform_fn']
+    return _transformer.Transformer(**{name: getattr(user_module, name, None) for name in fns})
+
+
+def run(input_dir, output_dir, transformer=None, content_type=_content_types.JSON, accept=None,
+        split_type=_records.LINE, assemble_with=_records.LINE, processes=None, cache_dir=None, cache_size=None):
+    # type: (str, str, str, str, str, str, str, int, str, int) -> Stats
+    """Transform the records of all the files in the input directory.
+
+    Args:
+        input_dir (str): directory containing the input files, read recursively.
+        output_dir (str): directory where the output files are written.
+        transformer (str): the transformer of the framework. See load_transformer.
+        content_type (str): the content type of the records.
+        accept (str): the content type of the responses. Defaults to content_type.
+        split_type (str): how the input files are split into records. One of sagemaker_containers._records
+            SPLIT_TYPES.
+        assemble_with (str): Line to write a newline after the response of each record, None to concatenate
+            the responses.
+        processes (int): number of processes transforming records in parallel, each one with its own model.
+            Defaults to the number of cpus. The records are transformed in the current process when it is 1.
+        cache_dir (str): directory where the responses of the records are cached across runs. Defaults to
+            ServingEnv.prediction_cache_dir. The responses are not cached when it is None.
+        cache_size (int): maximum number of bytes of the cache. Defaults to ServingEnv.prediction_cache_size.
+
+    Returns:
+        (Stats): the number of files, records, bytes read and written, the time in seconds of the transform, and
+            the number of records found in the cache.
+    """
+    global _transformer_instance
+
+    if split_type not in _records.SPLIT_TYPES:
+        raise ValueError('Invalid split type %s. Valid split types are: %s'
+                         % (split_type, ', '.join(_records.SPLIT_TYPES)))
+    if assemble_with not in ASSEMBLE_WITH:
+        raise ValueError('Invalid assemble with %s. Valid values are: %s' % (assemble_with, ', '.join(ASSEMBLE_WITH)))
+
+    accept = accept or content_type
+    processes = processes or _env.num_cpus()
+    paths = _input_files(input_dir)
+    separator = b'\n' if assemble_with == _records.LINE else b''
+
+    cache_dir = cache_dir or _worker.env.prediction_cache_dir
+    cache_size = cache_size or _worker.env.prediction_cache_size
+    cache = _RecordCache(cache_dir, cache_size, content_type, accept) if cache_dir else None
+
+    _transformer_instance = load_transformer(transformer)
+    start = time.time()
+    stats = {'records': 0, 'bytes_in': 0, 'bytes_out': 0, 'cached': 0}
+    read_ahead = _ReadAhead(processes * READ_AHEAD)
+    records = _read_records(input_dir, paths, split_type, content_type, accept, cache, read_ahead)
+
+    pool = None
+    if processes > 1:
+        pool = multiprocessing.Pool(processes, initializer=_initialize)
+        results = pool.imap(_transform_record, records, chunksize=CHUNK_SIZE)
+    else:
+        _initialize()
+        results = (_transform_record(args) for args in records)
+
+    try:
+        written = _write_responses(results, paths, output_dir, separator, cache, stats, read_ahead)
+    finally:
+        # the thread of the pool reading the records stops before the pool is terminated.
+        read_ahead.close()
+        if pool:
+            pool.terminate()
+        if cache:
+            cache.close()
+
+    for index, path in enumerate(paths):
+        stats['bytes_in'] += os.path.getsize(os.path.join(input_dir, path))
+        # files without records have an empty output.
+        if index not in written:
+            _open_output(output_dir, path).close()
+
+    result = Stats(files=len(paths), seconds=time.time() - start, **stats)
+    _log_stats(result)
+    return result
+
+
+class _RecordCache(object):
+    """The responses of the records in a DiskCache, keyed by the model version, the content type, the accept and
+    the record, for the records of the current run identified by file and record number."""
+
+    def __init__(self, directory, max_size, content_type, accept):
+        self._cache = _cache.DiskCache(directory, max_size)
+        self._prefix = (_cache.model_version(_env.model_dir), content_type, accept)
+        # the responses found in the cache, and the cache keys of the records to transform.
+        self._found = {}
+        self._keys = {}
+
+    def lookup(self, index, number, record):  # type: (int, int, bytes) -> bool
+        """Returns:
+            (bool): whether the response of the record is in the cache. It is then returned by response."""
+        key = _cache.key(*(self._prefix + (record,)))
+        body = self._cache.get(key)
+        if body is None:
+            self._keys[index, number] = key
+            return False
+
+        self._found[index, number] = body
+        return True
+
+    def response(self, index, number, body):  # type: (int, int, bytes) -> bytes
+        """Cache the response of a transformed record, or return the cached one when body is None."""
+        if body is None:
+            return self._found.pop((index, number))
+
+        self._cache.put(self._keys.pop((index, number)), body)
+        return body
+
+    def close(self):  # type: () -> None
+        self._cache.close()
+
+
+class _ReadAhead(object):
+    """Bound the number of records read ahead of the responses written. The records are read by a thread of the
+    pool while the responses are written by the current thread."""
+
+    def __init__(self, size):
+        self._slots = threading.Semaphore(size)
+        self._closed = False
+
+    def acquire(self):  # type: () -> bool
+        """Wait until a record can be read.
+
+        Returns:
+            (bool): False once closed: no more records are read.
+        """
+        self._slots.acquire()
+        return not self._closed
+
+    def release(self):  # type: () -> None
+        """Release the slot of a record whose response is written."""
+        self._slots.release()
+
+    def close(self):  # type: () -> None
+        """Stop reading records, and wake up the thread waiting for a slot."""
+        self._closed = True
+        self._slots.release()
+
+
+def _read_records(input_dir, paths, split_type, content_type, accept, cache, read_ahead):
+    # type: (str, list, str, str, str, _RecordCache, _ReadAhead) -> generator
+    """Yields the arguments of _transform_record for each record of the input files, read incrementally. The
+    records found in the cache are not sent to the pool processes."""
+    for index, path in enumerate(paths):
+        with open(os.path.join(input_dir, path), 'rb') as f:
+            for number, record in enumerate(_records.read(f, split_type)):
+                if not read_ahead.acquire():
+                    return
+
+                if cache and cache.lookup(index, number, record):
+                    record = None
+                yield index, number, record, content_type, accept
+
+
+def _write_responses(results, paths, output_dir, separator, cache, stats, read_ahead):
+    # type: (iter, list, str, bytes, _RecordCache, dict, _ReadAhead) -> set
+    """Write the responses of the records, in order, to the output files.
+
+    Returns:
+        (set[int]): the indexes of the input files with at least one record.
+    """
+    written = set()
+    output = None
+    try:
+        for index, number, status_code, body in results:
+            read_ahead.release()
+            if status_code != http_client.OK:
+                raise TransformRecordError(paths[index], number, status_code, body)
+
+            if body is None:
+                stats['cached'] += 1
+            if cache:
+                body = cache.response(index, number, body)
+
+            if index not in written:
+                if output:
+                    output.close()
+                output = _open_output(output_dir, paths[index])
+                written.add(index)
+
+            output.write(body)
+            output.write(separator)
+            stats['records'] += 1
+            stats['bytes_out'] += len(body) + len(separator)
+    finally:
+        if output:
+            output.close()
+
+    return written
+
+
+def _initialize():
+    _transformer_instance.initialize()
+
+
+def _transform_record(args):  # type: (tuple) -> tuple
+    index, number, record, content_type, accept = args
+
+    if record is None:
+        # the response is in the cache.
+        return index, number, http_client.OK, None
+
+    response = _transformer_instance.transform_content(_content(record, content_type), content_type, accept)
+    return index, number, response.status_code, response.get_data()
+
+
+def _content(record, content_type):  # type: (bytes, str) -> object
+    # same content as the body of an /invocations request. See sagemaker_containers._worker.Request.
+    if _worker.env.stream_requests:
+        return io.BytesIO(record)
+    return record.decode('utf-8') if content_type in _content_types.UTF8_TYPES else record
+
+
+def _input_files(input_dir):  # type: (str) -> list
+    paths = []
+    for root, _, names in os.walk(input_dir):
+        for name in names:
+            paths.append(os.path.relpath(os.path.join(root, name), input_dir))
+    return sorted(paths)
+
+
+def _open_output(output_dir, path):  # type: (str, str) -> file
+    output_path = os.path.join(output_dir, path + OUTPUT_SUFFIX)
+    directory = os.path.dirname(output_path)
+
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    return open(output_path, 'wb')
+
+
+def _log_stats(stats):  # type: (Stats) -> None
+    seconds = max(stats.seconds, 1e-6)
+    logger.info('Transformed %d records of %d files in %.2f seconds: %.1f records/s, %.2f MB/s read, '
+                '%.2f MB/s written, %d records from the cache', stats.records, stats.files, stats.seconds,
+                stats.records / seconds, stats.bytes_in / seconds / 1024 ** 2, stats.bytes_out / seconds / 1024 ** 2,
+                stats.cached)
@@ -0,0 +1,207 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import six
+from six.moves import queue
+
+from sagemaker_containers import _logging
+
+logger = _logging.get_logger()
+
+
+class _Item(object):
+    """A single predict_fn call waiting to be batched."""
+
+    def __init__(self, data, model):
+        self.data = data
+        self.model = model
+        self.prediction = None
+        self.exc_info = None
+        self.done = threading.Event()
+
+    def result(self):
+        self.done.wait()
+
+        if self.exc_info:
+            six.reraise(*self.exc_info)
+        return self.prediction
+
+
+class Batcher(object):
+    """Merges predict_fn calls that arrive at the same time into a single predict_fn call.
+
+    Requests are queued and collected by a background thread, which waits at most max_batch_delay
+    milliseconds for the batch to fill before calling predict_fn with the rows of all the queued requests.
+    The prediction is then split back and returned to each caller.
+
+    Only numpy arrays with the same dtype and the same trailing shape are merged: a 1-D array is a single
+    row, and its prediction is returned without the batch axis. Any other data is predicted on its own. When the
+    prediction of a batch fails, its requests are predicted one by one, and only the failed ones get an error.
+
+    Under the gevent worker used by sagemaker_containers._server, the threading primitives are
+    monkey-patched by gunicorn, so the collector runs as a greenlet and the collection window is the time
+    concurrent requests spend waiting for the greenlet currently running predict_fn.
+
+    Examples:
+    >>>batcher = Batcher(predict_fn, max_batch_size=32, max_batch_delay=5)
+    >>>prediction = batcher.predict(data, model)
+    """
+
+    def __init__(self, predict_fn, max_batch_size, max_batch_delay):
+        """
+        Args:
+            predict_fn (fn): Function responsible for model predictions. It must return one prediction per
+                input row.
+            max_batch_size (int): Maximum number of requests merged in a single predict_fn call.
+            max_batch_delay (int): Maximum time, in milliseconds, to wait for a batch to fill.
+        """
+        self._predict_fn = predict_fn
+        self._max_batch_size = max_batch_size
+        self._max_batch_delay = max_batch_delay / 1000.
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def predict(self, data, model):  # type: (object, object) -> object
+        """Queue data for prediction and wait for the result. Same signature as predict_fn.
+
+        Args:
+            data (obj): de-serialized data returned by input_fn.
+            model (obj): model loaded by model_fn.
+
+        Returns:
+            (obj): the rows of the batch prediction that belong to data.
+        """
+        self._start()
+
+        item = _Item(data, model)
+        self._queue.put(item)
+        return item.result()
+
+    def _start(self):
+        # the queue and the collector thread are created lazily, in the worker process, after gunicorn forks
+        # and the gevent worker monkey-patches the threading primitives.
+        if self._pid == os.getpid():
+            return
+
+        thread = None
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+
+                thread = threading.Thread(target=self._run)
+                thread.daemon = True
+
+        if thread:
+            thread.start()
+
+    def _run(self):
+        while True:
+            self._predict(self._collect())
+
+    def _collect(self):  # type: () -> list
+        batch = [self._queue.get()]
+        deadline = time.time() + self._max_batch_delay
+
+        while len(batch) < self._max_batch_size:
+            timeout = deadline - time.time()
+            try:
+                item = self._queue.get(block=timeout > 0, timeout=max(timeout, 0))
+            except queue.Empty:
+                break
+            batch.append(item)
+
+        return batch
+
+    def _predict(self, batch):  # type: (list) -> None
+        groups = {}
+        for item in batch:
+            key = _batch_key(item.data)
+            groups.setdefault((id(item.model), id(item) if key is None else key), []).append(item)
+
+        for items in groups.values():
+            try:
+                self._predict_batch(items)
+            finally:
+                for item in items:
+                    item.done.set()
+
+    def _predict_batch(self, items):  # type: (list) -> None
+        if len(items) > 1:
+            try:
+                data, sizes = _merge([item.data for item in items])
+                rows = [item.data.ndim == 1 for item in items]
+                predictions = _split(self._predict_fn(data, items[0].model), sizes, rows)
+            except Exception as e:
+                # the requests are predicted one by one, so only the ones that fail on their own get the error.
+                logger.warning('Prediction of a batch of %d requests failed: %s. Predicting them one by one.',
+                               len(items), e)
+            else:
+                for item, prediction in zip(items, predictions):
+                    item.prediction = prediction
+                return
+
+        for item in items:
+            try:
+                item.prediction = self._predict_fn(item.data, item.model)
+            except Exception:
+                item.exc_info = sys.exc_info()
+
+
+def _batch_key(data):  # type: (object) -> tuple
+    """Returns:
+        (tuple): the dtype and the shape of a row of data, once a 1-D array is promoted to a single row. Data
+            with the same key can be merged. None if data is not a numpy array with at least one dimension.
+    """
+    if not isinstance(data, np.ndarray) or data.ndim == 0:
+        return None
+    return data.dtype.str, np.atleast_2d(data).shape[1:]
+
+
+def _merge(arrays):  # type: (list) -> (np.array, list)
+    """Concatenate arrays along their first axis, 1-D arrays being a single row.
+
+    Returns:
+        (np.array, list[int]): the merged array and the number of rows contributed by each array.
+    """
+    arrays = [np.atleast_2d(array) for array in arrays]
+    sizes = [len(array) for array in arrays]
+    return np.concatenate(arrays), sizes
+
+
+def _split(prediction, sizes, rows=None):  # type: (np.array, list, list) -> list
+    """Split a batch prediction back into the rows of each request.
+
+    Args:
+        prediction (np.array): the prediction of the merged array.
+        sizes (list[int]): the number of rows contributed by each request.
+        rows (list[bool]): whether each request was a single 1-D row, its prediction being returned without
+            the batch axis.
+    """
+    prediction = np.asarray(prediction)
+
+    if prediction.ndim == 0 or len(prediction) != sum(sizes):
+        raise ValueError('predict_fn returned %s rows for a batch of %s rows. '
+                         'Batching requires predict_fn to return one prediction per input row.'
+                         % (len(prediction) if prediction.ndim else 0, sum(sizes)))
+
+    predictions = np.split(prediction, np.cumsum(sizes)[:-1])
+    return [p[0] if row else p for p, row in zip(predictions, rows or [False] * len(sizes))]
@@ -0,0 +1,576 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Caches of serialized /invocations responses.
+
+The responses are keyed by a hash of the request payload, content type, accept and model version. They are
+cached either in the memory of each worker, see MemoryCache, or in a shared memory directory available to all
+the workers of the model server, see SharedCache.
+
+Identical requests in flight at the same time in a worker can also be coalesced, so only the first one is
+transformed, see SingleFlight.
+
+The responses of batch transform records can be kept across runs in a persistent directory, see DiskCache.
+"""
+from __future__ import absolute_import
+
+import collections
+import errno
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+import six
+from six.moves import cPickle
+
+from sagemaker_containers import _readiness
+
+CACHE_DIR = 'cache'  # type: str
+
+SEGMENT_SUFFIX = '.segment'  # type: str
+
+# a SharedCache exceeding its budget evicts values until it holds at most EVICTION_TARGET of its budget, so the
+# directory is listed again only after the values written since fill the rest.
+EVICTION_TARGET = 0.9  # type: float
+
+# number of segments of a DiskCache filling its size budget: the oldest segment, evicted when the budget is
+# exceeded, holds about 1 / SEGMENTS of the cached values.
+SEGMENTS = 8  # type: int
+
+# entry of a DiskCache segment: the crc32 of the key and the value, the length of the key and the length of the
+# value, followed by the key and the pickled value.
+_ENTRY_HEADER = struct.Struct('<IHI')
+
+BACKENDS = ('memory', 'shared')
+
+
+class MemoryCache(object):
+    """Least recently used cache, in the memory of the current process, with a size budget in bytes."""
+
+    def __init__(self, max_size, ttl=0):
+        """
+        Args:
+            max_size (int): maximum number of bytes of the cached values.
+            ttl (int): time in seconds that a value is valid. Values never expire when ttl is 0.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):  # type: (str) -> object
+        """Returns:
+            (obj): the value cached with the key, or None if the key is not cached or its value has expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and _expired(entry[0]):
+                self._remove(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries[key] = self._entries.pop(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, value, size):  # type: (str, object, int) -> None
+        """Cache a value, evicting the least recently used values until the cache fits its size budget.
+        Values larger than the budget are not cached.
+
+        Args:
+            key (str): the key.
+            value (obj): the value.
+            size (int): the size of the value in bytes.
+        """
+        if size > self.max_size:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            while self._entries and self.size + size > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+            self._entries[key] = (_expiration(self.ttl), size, value)
+            self.size += size
+
+    def _remove(self, key):
+        self.size -= self._entries.pop(key)[1]
+
+
+class SharedCache(object):
+    """Least recently used cache, stored in a directory with one file per value, with a size budget in bytes.
+
+    The directory is shared by all the workers of the model server, so a value cached by one worker is
+    available to the others. Values are pickled. The hit and miss counts are the ones of the current process.
+
+    Each process estimates the size of the cache from the last time it listed the directory and the values it
+    wrote since, and only lists the directory when the estimate exceeds the budget. The values written by the
+    other workers are counted at the next listing, so the cache can exceed its budget until then.
+    """
+
+    def __init__(self, directory, max_size, ttl=0):
+        """
+        Args:
+            directory (str): directory where the values are stored, preferably in shared memory.
+            max_size (int): maximum number of bytes of the cached values.
+            ttl (int): time in seconds that a value is valid. Values never expire when ttl is 0.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+
+        _makedirs(directory)
+
+    def get(self, key):  # type: (str) -> object
+        """Returns:
+            (obj): the value cached with the key, or None if the key is not cached or its value has expired."""
+        path = os.path.join(self.directory, key)
+
+        try:
+            with open(path, 'rb') as f:
+                expiration, value = cPickle.load(f)
+        except (IOError, OSError, EOFError, cPickle.UnpicklingError):
+            expiration, value = None, None
+
+        if value is not None and _expired(expiration):
+            _remove(path)
+            value = None
+
+        if value is None:
+            self.misses += 1
+            return None
+
+        # the modification time orders the values for eviction.
+        _touch(path)
+        self.hits += 1
+        return value
+
+    def put(self, key, value, size):  # type: (str, object, int) -> None
+        """Cache a value, evicting the least recently used values until the cache fits its size budget.
+        Values larger than the budget are not cached.
+
+        Args:
+            key (str): the key.
+            value (obj): the value.
+            size (int): the size of the value in bytes. The size of the pickled value is counted instead.
+        """
+        data = cPickle.dumps((_expiration(self.ttl), value), cPickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_size:
+            return
+
+        path = os.path.join(self.directory, key)
+        tmp_path = '%s.%s.tmp' % (path, os.getpid())
+
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.rename(tmp_path, path)
+
+        if self._size is not None:
+            self._size += len(data)
+        if self._size is None or self._size > self.max_size:
+            self._evict()
+
+    @property
+    def size(self):  # type: () -> int
+        """Returns:
+            (int): number of bytes of the cached values."""
+        return sum(size for _, size, _ in self._files())
+
+    def _evict(self):
+        files = sorted(self._files())
+        size = sum(size for _, size, _ in files)
+        target_size = self.max_size * EVICTION_TARGET if size > self.max_size else size
+
+        for _, file_size, path in files:
+            if size <= target_size:
+                break
+            _remove(path)
+            size -= file_size
+
+        self._size = size
+
+    def _files(self):  # type: () -> list
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                continue
+
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # evicted by another worker.
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+
+class DiskCache(object):
+    """Persistent cache, stored in a directory as a log of append-only segment files, with a size budget in bytes.
+
+    Values are appended to the newest segment, and a new segment is started when it reaches its size. When the
+    cache exceeds its budget, the oldest segment is deleted: the values are evicted in the order they were
+    cached, a segment at a time. The index of the keys is kept in memory and rebuilt from the segments when the
+    cache is opened, so the values cached by a previous process are found again. An entry truncated by a crash is
+    ignored, and overwritten by the next value. Values are pickled.
+
+    A cache directory is written by a single process at a time.
+
+    Examples:
+    >>>cache = DiskCache('/opt/ml/cache', max_size=10 * 1024 ** 3)
+    >>>cache.put(key, body, len(body))
+    >>>cache.get(key)
+    """
+
+    def __init__(self, directory, max_size, segment_size=None):
+        """
+        Args:
+            directory (str): directory where the segments are stored, created if it does not exist.
+            max_size (int): maximum number of bytes of the segments.
+            segment_size (int): number of bytes of a segment before a new segment is started. Defaults to
+                max_size / SEGMENTS.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.segment_size = segment_size or max(max_size // SEGMENTS, 1)
+        self.hits = 0
+        self.misses = 0
+        self._index = {}
+        self._segments = collections.OrderedDict()
+        self._readers = {}
+        self._writer = None
+        self._lock = threading.Lock()
+
+        _makedirs(directory)
+        self._load()
+
+    @property
+    def size(self):  # type: () -> int
+        """Returns:
+            (int): number of bytes of the segments."""
+        return sum(size for size, _ in self._segments.values())
+
+    def get(self, key):  # type: (str) -> object
+        """Returns:
+            (obj): the value cached with the key, or None if the key is not cached."""
+        with self._lock:
+            location = self._index.get(key)
+
+            if location is None:
+                self.misses += 1
+                return None
+
+            segment, offset, length = location
+            reader = self._readers.get(segment)
+            if reader is None:
+                reader = self._readers[segment] = open(self._path(segment), 'rb')
+
+            reader.seek(offset)
+            value = cPickle.loads(reader.read(length))
+
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size=None):  # type: (str, object, int) -> None
+        """Append a value to the cache, evicting the oldest segments until the cache fits its size budget.
+        Values larger than a segment are not cached.
+
+        Args:
+            key (str): the key.
+            value (obj): the value.
+            size (int): ignored, the size of the pickled value is counted instead.
+        """
+        data = cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+        encoded_key = key.encode('utf-8')
+        entry_size = _ENTRY_HEADER.size + len(encoded_key) + len(data)
+
+        if entry_size > self.segment_size:
+            return
+
+        header = _ENTRY_HEADER.pack(zlib.crc32(data, zlib.crc32(encoded_key)) & 0xffffffff, len(encoded_key),
+                                    len(data))
+
+        with self._lock:
+            segment = next(reversed(self._segments), None)
+            if segment is None or self._segments[segment][0] + entry_size > self.segment_size:
+                segment = self._start_segment(0 if segment is None else segment + 1)
+
+            segment_size, keys = self._segments[segment]
+            # a single write per entry, flushed so the entry survives the process.
+            self._writer.write(header + encoded_key + data)
+            self._writer.flush()
+
+            self._index[key] = (segment, segment_size + _ENTRY_HEADER.size + len(encoded_key), len(data))
+            keys.append(key)
+            self._segments[segment] = (segment_size + entry_size, keys)
+
+            self._evict()
+
+    def close(self):  # type: () -> None
+        """Close the segment files."""
+        with self._lock:
+            for reader in self._readers.values():
+                reader.close()
+            self._readers = {}
+
+            if self._writer:
+                self._writer.close()
+                self._writer = None
+
+    def _load(self):
+        segments = sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.directory)
+                          if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit())
+
+        for segment in segments:
+            with open(self._path(segment), 'rb') as f:
+                data = f.read()
+
+            keys = []
+            offset = 0
+            while offset + _ENTRY_HEADER.size <= len(data):
+                crc, key_length, value_length = _ENTRY_HEADER.unpack_from(data, offset)
+                start = offset + _ENTRY_HEADER.size
+                end = start + key_length + value_length
+                if end > len(data) or zlib.crc32(data[start:end]) & 0xffffffff != crc:
+                    break
+
+                key = data[start:start + key_length].decode('utf-8')
+                self._index[key] = (segment, start + key_length, value_length)
+                keys.append(key)
+                offset = end
+
+            self._segments[segment] = (offset, keys)
+
+        if segments:
+            # the next values are appended after the last valid entry of the newest segment.
+            last = segments[-1]
+            self._writer = open(self._path(last), 'r+b')
+            self._writer.truncate(self._segments[last][0])
+            self._writer.seek(0, os.SEEK_END)
+
+        self._evict()
+
+    def _start_segment(self, segment):  # type: (int) -> int
+        if self._writer:
+            self._writer.close()
+
+        self._writer = open(self._path(segment), 'wb')
+        self._segments[segment] = (0, [])
+        return segment
+
+    def _evict(self):
+        while len(self._segments) > 1 and self.size > self.max_size:
+            segment, (_, keys) = self._segments.popitem(last=False)
+
+            for key in keys:
+                if self._index.get(key, (None,))[0] == segment:
+                    del self._index[key]
+
+            reader = self._readers.pop(segment, None)
+            if reader:
+                reader.close()
+            _remove(self._path(segment))
+
+    def _path(self, segment):  # type: (int) -> str
+        return os.path.join(self.directory, '%08d%s' % (segment, SEGMENT_SUFFIX))
+
+
+class _Call(object):
+    """A call in flight, waited for by the concurrent calls with the same key."""
+
+    def __init__(self):
+        self.value = None
+        self.exc_info = None
+        self.done = threading.Event()
+
+    def result(self):
+        self.done.wait()
+
+        if self.exc_info:
+            six.reraise(*self.exc_info)
+        return self.value
+
+
+class SingleFlight(object):
+    """Coalesces concurrent calls with the same key: while a call is in flight, the calls with the same key wait
+    for its result instead of calling the function again. The calls are coalesced in the current process only.
+
+    Examples:
+    >>>single_flight = SingleFlight()
+    >>>value, shared = single_flight.do(key, lambda: predict(data))
+    """
+
+    def __init__(self):
+        self.deduplicated = 0
+        self._calls = {}
+        self._lock = None
+        self._pid = None
+        self._pid_lock = threading.Lock()
+
+    @property
+    def in_flight(self):  # type: () -> int
+        """Returns:
+            (int): number of distinct keys being computed."""
+        return len(self._calls)
+
+    def do(self, key, fn):  # type: (str, function) -> (object, bool)
+        """Call fn, unless a call with the same key is in flight, in which case wait for its result.
+
+        Args:
+            key (str): the key identifying identical calls.
+            fn (function): called without arguments.
+
+        Returns:
+            (obj, bool): the value returned by fn, and whether it was computed by another call in flight. The
+                exception raised by fn is raised by all the calls waiting for it.
+        """
+        lock = self._get_lock()
+
+        with lock:
+            call = self._calls.get(key)
+            owner = call is None
+            if owner:
+                call = self._calls[key] = _Call()
+            else:
+                self.deduplicated += 1
+
+        if not owner:
+            return call.result(), True
+
+        try:
+            call.value = fn()
+        except Exception:
+            call.exc_info = sys.exc_info()
+            raise
+        finally:
+            with lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.value, False
+
+    def _get_lock(self):
+        # the lock is created lazily, in the worker process, after gunicorn forks and the gevent worker
+        # monkey-patches the threading primitives.
+        if self._pid != os.getpid():
+            with self._pid_lock:
+                if self._pid != os.getpid():
+                    self._lock = threading.Lock()
+                    self._calls = {}
+                    self._pid = os.getpid()
+        return self._lock
+
+
+def response_cache(env):  # type: (_env.ServingEnv) -> object
+    """Create the response cache configured in the serving environment.
+
+    Args:
+        env (ServingEnv): the serving environment.
+
+    Returns:
+        (MemoryCache or SharedCache): the response cache, or None if the cache is disabled.
+    """
+    if env.response_cache_size <= 0:
+        return None
+
+    if env.response_cache_backend == 'memory':
+        return MemoryCache(env.response_cache_size, env.response_cache_ttl)
+
+    if env.response_cache_backend == 'shared':
+        state_dir = _readiness.state_dir()
+        directory = os.path.join(state_dir, CACHE_DIR) if state_dir else tempfile.mkdtemp(prefix='sagemaker-cache-')
+        return SharedCache(directory, env.response_cache_size, env.response_cache_ttl)
+
+    raise ValueError('Invalid response cache backend %s. Valid backends are: %s'
+                     % (env.response_cache_backend, ', '.join(BACKENDS)))
+
+
+def key(*parts):  # type: (*object) -> str
+    """Returns:
+        (str): hexadecimal sha256 digest of the parts. Text is encoded as utf-8 and other objects are
+            converted to text."""
+    digest = hashlib.sha256()
+
+    for part in parts:
+        if isinstance(part, six.text_type):
+            part = part.encode('utf-8')
+        elif not isinstance(part, (bytes, bytearray)):
+            part = six.text_type(part).encode('utf-8')
+
+        digest.update(str(len(part)).encode('utf-8'))
+        digest.update(b':')
+        digest.update(part)
+
+    return digest.hexdigest()
+
+
+def model_version(model_dir):  # type: (str) -> str
+    """Returns:
+        (str): signature of the files in the model directory, based on their paths, sizes and modification
+            times. The signature changes when the model files change."""
+    files = []
+    for root, _, names in os.walk(model_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((os.path.relpath(path, model_dir), stat.st_size, stat.st_mtime))
+
+    return key(*sorted(files))
+
+
+def _expiration(ttl):  # type: (int) -> float
+    return time.time() + ttl if ttl else None
+
+
+def _expired(expiration):  # type: (float) -> bool
+    return expiration is not None and time.time() > expiration
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _touch(path):
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
@@ -0,0 +1,249 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Compression of the /invocations requests and responses.
+
+Request bodies sent with the header Content-Encoding gzip or zstd are decompressed while input_fn reads them,
+up to ServingEnv.max_decompressed_request_size bytes.
+When ServingEnv.response_compression is True, the responses of at least ServingEnv.response_compression_min_size
+bytes are compressed with the encoding preferred by the header Accept-Encoding of the client.
+
+zstd requires the package zstandard, installed with the extra sagemaker_containers[zstd].
+"""
+from __future__ import absolute_import
+
+import io
+import zlib
+
+from werkzeug import exceptions, http
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP = 'gzip'  # type: str
+ZSTD = 'zstd'  # type: str
+IDENTITY = 'identity'  # type: str
+
+CHUNK_SIZE = 64 * 1024  # type: int
+
+# gzip format, see zlib.decompressobj.
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def encodings():  # type: () -> list
+    """Returns:
+        (list[str]): the supported content encodings, from the most to the least preferred."""
+    return [ZSTD, GZIP] if zstandard else [GZIP]
+
+
+def negotiate(accept_encoding, supported=None):  # type: (str, list) -> str
+    """Choose the encoding of a response.
+
+    Args:
+        accept_encoding (str): the header Accept-Encoding of the request.
+        supported (list[str]): the encodings the server can use. Default: encodings().
+
+    Returns:
+        (str): the supported encoding with the highest quality in accept_encoding, or None if the response is
+            not compressed.
+    """
+    if not accept_encoding:
+        return None
+    return http.parse_accept_header(accept_encoding).best_match(encodings() if supported is None else supported)
+
+
+def decompress_stream(stream, content_encoding, max_size=None):  # type: (io.IOBase, str, int) -> io.IOBase
+    """Decompress a stream while it is read.
+
+    Args:
+        stream (file-like): the compressed data.
+        content_encoding (str): the header Content-Encoding of the data.
+        max_size (int): maximum number of bytes of the decompressed data. There is no limit when it is None.
+
+    Returns:
+        (file-like): the decompressed data. Reading corrupted data raises werkzeug.exceptions.BadRequest, and
+            reading more than max_size bytes raises werkzeug.exceptions.RequestEntityTooLarge.
+
+    Raises:
+        werkzeug.exceptions.UnsupportedMediaType: if the encoding is not supported.
+    """
+    encoding = (content_encoding or IDENTITY).strip().lower()
+
+    if encoding == IDENTITY:
+        return stream
+    if encoding == GZIP:
+        reader = _GzipReader(stream)
+    elif encoding == ZSTD and zstandard:
+        reader = _ZstdReader(stream)
+    else:
+        raise exceptions.UnsupportedMediaType('Unsupported Content-Encoding %s. Supported encodings: %s'
+                                              % (content_encoding, ', '.join(encodings())))
+
+    if max_size is not None:
+        reader = _LimitedReader(reader, max_size)
+    return io.BufferedReader(reader, CHUNK_SIZE)
+
+
+def decompress(data, content_encoding, max_size=None):  # type: (bytes, str, int) -> bytes
+    """Decompress data. See decompress_stream."""
+    if (content_encoding or IDENTITY).strip().lower() == IDENTITY:
+        return data
+    return decompress_stream(io.BytesIO(data), content_encoding, max_size).read()
+
+
+def compress_response(response, encoding, min_size=0):
+    # type: (werkzeug.wrappers.Response, str, int) -> werkzeug.wrappers.Response
+    """Compress the body of a response, in place.
+
+    The response is not compressed when encoding is None, when it is already encoded, or when its body is
+    smaller than min_size bytes. A streamed response is compressed chunk by chunk, and each chunk is flushed so
+    the client receives it without delay.
+
+    Args:
+        response (werkzeug.wrappers.Response): the response.
+        encoding (str): the encoding, see negotiate.
+        min_size (int): the minimum number of bytes of a compressed body.
+
+    Returns:
+        (werkzeug.wrappers.Response): the response.
+    """
+    if not encoding or response.headers.get('Content-Encoding'):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    if response.is_streamed:
+        response.response = _compress_chunks(response.iter_encoded(), encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        response.set_data(_compress(data, encoding))
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def _compress(data, encoding):  # type: (bytes, str) -> bytes
+    if encoding == GZIP:
+        return b''.join(_compress_chunks([data], encoding))
+    # the frame records the size of the data, so clients can decompress it in a single buffer.
+    return zstandard.ZstdCompressor().compress(data)
+
+
+def _compress_chunks(chunks, encoding):  # type: (iter, str) -> iter
+    if encoding == GZIP:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, _GZIP_WBITS)
+        sync_flush, finish = zlib.Z_SYNC_FLUSH, zlib.Z_FINISH
+    else:
+        compressor = zstandard.ZstdCompressor().compressobj()
+        sync_flush, finish = zstandard.COMPRESSOBJ_FLUSH_BLOCK, zstandard.COMPRESSOBJ_FLUSH_FINISH
+
+    chunks = iter(chunks)
+    chunk = next(chunks, None)
+    while chunk is not None:
+        following = next(chunks, None)
+        if following is None:
+            # the last chunk ends the compressed data.
+            yield compressor.compress(chunk) + compressor.flush(finish)
+            return
+
+        yield compressor.compress(chunk) + compressor.flush(sync_flush)
+        chunk = following
+
+    yield compressor.flush(finish)
+
+
+class _GzipReader(io.RawIOBase):
+    """Decompresses a gzip stream, made of one or more gzip members, without reading it entirely."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._decompressor = zlib.decompressobj(_GZIP_WBITS)
+        self._pending = b''
+        self._started = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while True:
+            data = self._pending or self._stream.read(CHUNK_SIZE)
+            self._pending = b''
+
+            if not data:
+                # Python 2 does not expose eof, truncated bodies are only detected by Python 3.
+                if self._started and getattr(self._decompressor, 'eof', True) is False:
+                    raise exceptions.BadRequest('The gzip request body is truncated.')
+                return 0
+
+            try:
+                out = self._decompressor.decompress(data, len(b))
+            except zlib.error as e:
+                raise exceptions.BadRequest('Invalid gzip request body: %s' % e)
+
+            self._started = True
+            self._pending = self._decompressor.unconsumed_tail
+
+            if self._decompressor.unused_data:
+                # the end of a member, the next member follows.
+                self._pending = self._decompressor.unused_data
+                self._decompressor = zlib.decompressobj(_GZIP_WBITS)
+
+            if out:
+                b[:len(out)] = out
+                return len(out)
+
+
+class _ZstdReader(io.RawIOBase):
+    """Decompresses a zstd stream without reading it entirely."""
+
+    def __init__(self, stream):
+        self._reader = zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        try:
+            out = self._reader.read(len(b))
+        except zstandard.ZstdError as e:
+            raise exceptions.BadRequest('Invalid zstd request body: %s' % e)
+
+        b[:len(out)] = out
+        return len(out)
+
+
+class _LimitedReader(io.RawIOBase):
+    """Counts the bytes read from a decompressing reader, and raises werkzeug.exceptions.RequestEntityTooLarge
+    once there are more than max_size. Each read decompresses at most the size of the buffer, so a small
+    compressed body never expands in memory beyond the limit."""
+
+    def __init__(self, reader, max_size):
+        self._reader = reader
+        self._max_size = max_size
+        self._size = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        size = self._reader.readinto(b)
+        self._size += size
+
+        if self._size > self._max_size:
+            raise exceptions.RequestEntityTooLarge('The decompressed request body is larger than %d bytes.'
+                                                   % self._max_size)
+        return size
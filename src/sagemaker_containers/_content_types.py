@@ -15,4 +15,5 @@ CSV = "text/csv"
 OCTET_STREAM = "application/octet-stream"
 ANY = '*/*'
 NPY = 'application/x-npy'
-UTF8_TYPES = [JSON, CSV]
+JSONLINES = 'application/jsonlines'
+UTF8_TYPES = [JSON, CSV, JSONLINES]
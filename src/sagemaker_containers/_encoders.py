@@ -19,6 +19,9 @@ from six import BytesIO, StringIO
 
 from sagemaker_containers import _content_types, _errors
 
+# number of rows serialized in each chunk of a streamed response.
+CHUNK_ROWS = 1024  # type: int
+
 
 def array_to_npy(array_like):  # type: (np.array or Iterable or int or float) -> object
     """Convert an array like object to the NPY format.
@@ -117,8 +120,173 @@ def array_to_csv(array_like):  # type: (np.array or Iterable or int or float) ->
     return stream.getvalue()
 
 
-_encoders_map = {_content_types.NPY: array_to_npy, _content_types.CSV: array_to_csv, _content_types.JSON: array_to_json}
-_decoders_map = {_content_types.NPY: npy_to_numpy, _content_types.CSV: csv_to_numpy, _content_types.JSON: json_to_numpy}
+def array_to_jsonlines(array_like):  # type: (np.array or Iterable or int or float) -> str
+    """Convert an array like object to JSON Lines, one JSON document per row.
+
+    Args:
+        array_like (np.array or Iterable or int or float): array like object to be converted to JSON Lines.
+
+    Returns:
+        (str): object serialized to JSON Lines
+    """
+    return ''.join(array_to_jsonlines_chunks(array_like))
+
+
+def jsonlines_to_numpy(string_like, dtype=None):  # type: (str or unicode) -> np.array
+    """Convert a JSON Lines object to a numpy array, one row per line.
+
+    Args:
+        string_like (str): JSON Lines string.
+        dtype (dtype, optional):  Data type of the resulting array. If None, the dtypes will be determined by the
+                                        contents of each column, individually. This argument can only be used to
+                                        'upcast' the array.  For downcasting, use the .astype(t) method.
+    Returns:
+        (np.array): numpy array
+    """
+    return np.array([json.loads(line) for line in string_like.splitlines() if line.strip()], dtype=dtype)
+
+
+def array_to_csv_chunks(array_like, rows=CHUNK_ROWS):  # type: (object, int) -> Iterable
+    """Convert an array like object, or an iterator of array like objects, to CSV chunks.
+
+    Args:
+        array_like (np.array or Iterable or iterator): array like object, or iterator of array like objects
+            such as a generator yielding predictions in batches, to be converted to CSV.
+        rows (int): maximum number of rows in each chunk.
+
+    Returns:
+        (generator): chunks of the object serialized to CSV.
+    """
+    for batch in _batches(array_like, rows):
+        yield array_to_csv(batch)
+
+
+def array_to_jsonlines_chunks(array_like, rows=CHUNK_ROWS):  # type: (object, int) -> Iterable
+    """Convert an array like object, or an iterator of array like objects, to JSON Lines chunks.
+
+    Args:
+        array_like (np.array or Iterable or iterator): array like object, or iterator of array like objects
+            such as a generator yielding predictions in batches, to be converted to JSON Lines.
+        rows (int): maximum number of rows in each chunk.
+
+    Returns:
+        (generator): chunks of the object serialized to JSON Lines.
+    """
+    for batch in _batches(array_like, rows):
+        yield ''.join(array_to_json(row) + '\n' for row in np.atleast_1d(batch))
+
+
+def array_to_npy_chunks(array_like, rows=CHUNK_ROWS):  # type: (object, int) -> Iterable
+    """Convert an array like object to NPY chunks: the NPY header followed by the data of the rows.
+
+    The NPY header contains the shape of the whole array, so an iterator of array like objects is
+    concatenated before being converted. Arrays of Python objects are converted in a single chunk.
+
+    Args:
+        array_like (np.array or Iterable or iterator): array like object, or iterator of array like objects,
+            to be converted to NPY.
+        rows (int): maximum number of rows in each chunk.
+
+    Returns:
+        (generator): chunks of the object serialized to NPY.
+    """
+    array = np.concatenate(list(_batches(array_like, rows))) if _is_iterator(array_like) else np.asarray(array_like)
+
+    if array.dtype.hasobject or array.ndim == 0:
+        yield array_to_npy(array)
+        return
+
+    array = np.ascontiguousarray(array)
+
+    header = BytesIO()
+    np.lib.format.write_array_header_1_0(header, np.lib.format.header_data_from_array_1_0(array))
+    yield header.getvalue()
+
+    for start in range(0, len(array), rows):
+        yield array[start:start + rows].tobytes()
+
+
+def csv_to_numpy_chunks(stream, rows=CHUNK_ROWS, dtype=None):  # type: (object, int, object) -> Iterable
+    """Convert a stream of CSV data to numpy arrays, decoding it incrementally as it is read.
+
+    Args:
+        stream (file-like): binary or text stream of CSV data, such as the request stream.
+        rows (int): maximum number of rows in each array.
+        dtype (dtype, optional): Data type of the resulting arrays. See csv_to_numpy.
+
+    Returns:
+        (generator): two dimensional numpy arrays with at most rows rows.
+    """
+    for lines in _lines(stream, rows):
+        yield csv_to_numpy(''.join(lines), dtype=dtype).reshape(len(lines), -1)
+
+
+def jsonlines_to_numpy_chunks(stream, rows=CHUNK_ROWS, dtype=None):  # type: (object, int, object) -> Iterable
+    """Convert a stream of JSON Lines data to numpy arrays, decoding it incrementally as it is read.
+
+    Args:
+        stream (file-like): binary or text stream of JSON Lines data, such as the request stream.
+        rows (int): maximum number of rows in each array.
+        dtype (dtype, optional): Data type of the resulting arrays. See jsonlines_to_numpy.
+
+    Returns:
+        (generator): numpy arrays with at most rows rows.
+    """
+    for lines in _lines(stream, rows):
+        yield np.array([json.loads(line) for line in lines], dtype=dtype)
+
+
+def _lines(stream, rows):  # type: (object, int) -> Iterable
+    """Yields lists of at most rows non empty lines of the stream, decoded from utf-8."""
+    lines = []
+
+    while True:
+        line = stream.readline()
+        if not line:
+            break
+
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+
+        if line.strip():
+            lines.append(line)
+
+        if len(lines) == rows:
+            yield lines
+            lines = []
+
+    if lines:
+        yield lines
+
+
+def _is_iterator(obj):  # type: (object) -> bool
+    return hasattr(obj, '__next__') or hasattr(obj, 'next')
+
+
+def _batches(array_like, rows):  # type: (object, int) -> Iterable
+    """Yields the items of an iterator of array like objects, or the rows of an array like object in slices of
+    at most rows rows."""
+    if _is_iterator(array_like):
+        for batch in array_like:
+            yield np.asarray(batch)
+        return
+
+    array = np.asarray(array_like)
+    if array.ndim == 0:
+        yield array.reshape(1)
+        return
+
+    for start in range(0, len(array), rows):
+        yield array[start:start + rows]
+
+
+_encoders_map = {_content_types.NPY: array_to_npy, _content_types.CSV: array_to_csv, _content_types.JSON: array_to_json,
+                 _content_types.JSONLINES: array_to_jsonlines}
+_decoders_map = {_content_types.NPY: npy_to_numpy, _content_types.CSV: csv_to_numpy, _content_types.JSON: json_to_numpy,
+                 _content_types.JSONLINES: jsonlines_to_numpy}
+_chunk_decoders_map = {_content_types.CSV: csv_to_numpy_chunks, _content_types.JSONLINES: jsonlines_to_numpy_chunks}
+_chunk_encoders_map = {_content_types.NPY: array_to_npy_chunks, _content_types.CSV: array_to_csv_chunks,
+                       _content_types.JSONLINES: array_to_jsonlines_chunks}
 
 
 def decode(obj, content_type):  # type: (np.array or Iterable or int or float) -> np.array
@@ -138,6 +306,33 @@ def decode(obj, content_type):  # type: (np.array or Iterable or int or float) -
         raise _errors.UnsupportedFormatError(content_type)
 
 
+def decode_stream(stream, content_type):  # type: (object, str) -> np.array
+    """Decode a stream in one of the default content types to a numpy array.
+
+    CSV and JSON Lines are decoded incrementally, as the stream is read, without holding the whole stream in
+    memory. Other content types are read completely before being decoded.
+
+    Args:
+        stream (file-like): binary stream to be decoded, such as the request stream.
+        content_type (str): content type to be used.
+
+    Returns:
+        np.array: decoded object.
+    """
+    chunk_decoder = _chunk_decoders_map.get(content_type)
+    if chunk_decoder:
+        chunks = list(chunk_decoder(stream))
+        if not chunks:
+            return np.array([])
+
+        array = np.concatenate(chunks)
+        # same shape as csv_to_numpy, np.genfromtxt squeezes the arrays it reads.
+        return np.squeeze(array) if content_type == _content_types.CSV else array
+
+    data = stream.read()
+    return decode(data.decode('utf-8') if content_type in _content_types.UTF8_TYPES else data, content_type)
+
+
 def encode(array_like, content_type):  # type: (np.array or Iterable or int or float) -> np.array
     """Encode an array like object in a specific content_type to a numpy array.
 
@@ -156,3 +351,31 @@ def encode(array_like, content_type):  # type: (np.array or Iterable or int or f
         return encoder(array_like)
     except KeyError:
         raise _errors.UnsupportedFormatError(content_type)
+
+
+def encode_chunks(array_like, content_type):  # type: (object, str) -> Iterable
+    """Encode an array like object, or an iterator of array like objects, in a specific content_type as a
+    sequence of chunks, which can be streamed in a response without serializing the whole object in memory.
+
+    CSV, JSON Lines and NPY are encoded incrementally. Other content types supported by encode are encoded in
+    a single chunk.
+
+    Args:
+        array_like (np.array or Iterable or iterator): to be encoded. An iterator, such as a generator yielding
+            predictions in batches, is treated as a sequence of array like objects.
+        content_type (str): content type to be used.
+
+    Returns:
+        (generator): the encoded chunks.
+    """
+    chunk_encoder = _chunk_encoders_map.get(content_type)
+    if chunk_encoder:
+        return chunk_encoder(array_like)
+
+    if content_type not in _encoders_map:
+        raise _errors.UnsupportedFormatError(content_type)
+
+    if _is_iterator(array_like):
+        batches = list(_batches(array_like, CHUNK_ROWS))
+        array_like = np.concatenate(batches) if batches else []
+    return iter([encode(array_like, content_type)])
@@ -766,6 +766,40 @@ class ServingEnv(_Env):
             model_server_workers (int): Number of worker processes the model server will use.
             framework_module (str):  Name of the framework module and entry point. For example:
                 my_module:main
+            max_batch_size (int): Maximum number of requests merged in a single predict_fn call.
+            max_batch_delay (int): Maximum time in milliseconds a request waits for its batch to fill.
+            preload_model (bool): Whether to load the model in the gunicorn master before forking the workers.
+            model_server_worker_class (str): The model server worker class: gevent, sync, gthread or asgi.
+            model_server_threads (int): Number of threads per worker process used by the gthread worker class.
+            nginx_worker_processes (int): Number of nginx worker processes.
+            nginx_worker_connections (int): Maximum number of connections of each nginx worker process.
+            nginx_keepalive_timeout (int): Timeout in seconds of idle client connections to nginx.
+            nginx_upstream_keepalive (int): Number of idle connections to gunicorn kept open by each nginx worker.
+            nginx_proxy_buffering (bool): Whether nginx buffers the responses from gunicorn.
+            response_cache_size (int): Size in bytes of the cache of /invocations responses.
+            response_cache_ttl (int): Time in seconds that a cached response is valid.
+            response_cache_backend (str): Where responses are cached: memory or shared.
+            max_concurrent_requests (int): Maximum number of requests transformed at the same time by each worker.
+            max_queued_requests (int): Maximum number of requests waiting to be transformed in each worker.
+            retry_after (int): Seconds that clients are asked to wait before retrying a rejected request.
+            stream_requests (bool): Whether input_fn receives a file-like stream of the request body.
+            multi_model (bool): Whether the model server serves the models stored in subdirectories of model_dir.
+            multi_model_memory_budget (int): Maximum number of bytes used by the models loaded by each worker.
+            model_server_min_workers (int): Minimum number of worker processes when autoscaling.
+            model_server_max_workers (int): Maximum number of worker processes when autoscaling.
+            model_server_cpu_affinity (bool): Whether the cpus are split among the worker processes.
+            model_server_reload_interval (int): Seconds between checks of the model directory for a new model.
+            fast_ping (bool): Whether /ping is answered from the readiness state, without the worker processes.
+            response_compression (bool): Whether responses are compressed with the encoding accepted by the client.
+            response_compression_min_size (int): Minimum size in bytes of a compressed response.
+            max_decompressed_request_size (int): Maximum size in bytes of a compressed request body once decompressed.
+            pipeline_threads (int): Number of threads decoding, and encoding, requests in each worker process.
+            ipc_socket (str): Path of the unix socket receiving invocations from colocated clients.
+            ipc_max_payload_size (int): Maximum size in bytes of the payload of an invocation on the unix socket.
+            record_split_threads (int): Number of threads transforming the records of a multi-record request.
+            request_coalescing (bool): Whether identical requests in flight at the same time are transformed once.
+            prediction_cache_dir (str): Directory where batch transform keeps the responses of the records across runs.
+            prediction_cache_size (int): Maximum number of bytes of the prediction cache.
     """
 
     def __init__(self):
@@ -775,11 +809,80 @@ class ServingEnv(_Env):
         model_server_timeout = int(os.environ.get(_params.MODEL_SERVER_TIMEOUT_ENV, '60'))
         model_server_workers = int(os.environ.get(_params.MODEL_SERVER_WORKERS_ENV, num_cpus()))
         framework_module = os.environ.get(_params.FRAMEWORK_SERVING_MODULE_ENV, None)
+        max_batch_size = int(os.environ.get(_params.MAX_BATCH_SIZE_ENV, '1'))
+        max_batch_delay = int(os.environ.get(_params.MAX_BATCH_DELAY_ENV, '10'))
+        preload_model = util.strtobool(os.environ.get(_params.PRELOAD_MODEL_ENV, 'false')) == 1
+        model_server_worker_class = os.environ.get(_params.MODEL_SERVER_WORKER_CLASS_ENV, 'gevent')
+        model_server_threads = int(os.environ.get(_params.MODEL_SERVER_THREADS_ENV, '1'))
+        nginx_worker_processes = int(os.environ.get(_params.NGINX_WORKER_PROCESSES_ENV, num_cpus()))
+        nginx_worker_connections = int(os.environ.get(_params.NGINX_WORKER_CONNECTIONS_ENV, '2048'))
+        nginx_keepalive_timeout = int(os.environ.get(_params.NGINX_KEEPALIVE_TIMEOUT_ENV, '3'))
+        nginx_upstream_keepalive = int(os.environ.get(_params.NGINX_UPSTREAM_KEEPALIVE_ENV, '32'))
+        nginx_proxy_buffering = util.strtobool(os.environ.get(_params.NGINX_PROXY_BUFFERING_ENV, 'true')) == 1
+        response_cache_size = int(os.environ.get(_params.RESPONSE_CACHE_SIZE_ENV, '0'))
+        response_cache_ttl = int(os.environ.get(_params.RESPONSE_CACHE_TTL_ENV, '300'))
+        response_cache_backend = os.environ.get(_params.RESPONSE_CACHE_BACKEND_ENV, 'memory')
+        max_concurrent_requests = int(os.environ.get(_params.MAX_CONCURRENT_REQUESTS_ENV, '0'))
+        max_queued_requests = int(os.environ.get(_params.MAX_QUEUED_REQUESTS_ENV, '0'))
+        retry_after = int(os.environ.get(_params.RETRY_AFTER_ENV, '1'))
+        stream_requests = util.strtobool(os.environ.get(_params.STREAM_REQUESTS_ENV, 'false')) == 1
+        multi_model = util.strtobool(os.environ.get(_params.MULTI_MODEL_ENV, 'false')) == 1
+        multi_model_memory_budget = int(os.environ.get(_params.MULTI_MODEL_MEMORY_BUDGET_ENV, '0'))
+        model_server_min_workers = int(os.environ.get(_params.MODEL_SERVER_MIN_WORKERS_ENV, model_server_workers))
+        model_server_max_workers = int(os.environ.get(_params.MODEL_SERVER_MAX_WORKERS_ENV, model_server_workers))
+        model_server_cpu_affinity = util.strtobool(os.environ.get(_params.MODEL_SERVER_CPU_AFFINITY_ENV, 'false')) == 1
+        model_server_reload_interval = int(os.environ.get(_params.MODEL_SERVER_RELOAD_INTERVAL_ENV, '0'))
+        fast_ping = util.strtobool(os.environ.get(_params.FAST_PING_ENV, 'false')) == 1
+        response_compression = util.strtobool(os.environ.get(_params.RESPONSE_COMPRESSION_ENV, 'false')) == 1
+        response_compression_min_size = int(os.environ.get(_params.RESPONSE_COMPRESSION_MIN_SIZE_ENV, '1024'))
+        max_decompressed_request_size = int(os.environ.get(_params.MAX_DECOMPRESSED_REQUEST_SIZE_ENV,
+                                                           str(100 * 1024 * 1024)))
+        pipeline_threads = int(os.environ.get(_params.PIPELINE_THREADS_ENV, '0'))
+        ipc_socket = os.environ.get(_params.IPC_SOCKET_ENV, None)
+        ipc_max_payload_size = int(os.environ.get(_params.IPC_MAX_PAYLOAD_SIZE_ENV, str(100 * 1024 * 1024)))
+        record_split_threads = int(os.environ.get(_params.RECORD_SPLIT_THREADS_ENV, '0'))
+        request_coalescing = util.strtobool(os.environ.get(_params.REQUEST_COALESCING_ENV, 'false')) == 1
+        prediction_cache_dir = os.environ.get(_params.PREDICTION_CACHE_DIR_ENV, None)
+        prediction_cache_size = int(os.environ.get(_params.PREDICTION_CACHE_SIZE_ENV, str(1024 ** 3)))
 
         self._use_nginx = use_nginx
         self._model_server_timeout = model_server_timeout
         self._model_server_workers = model_server_workers
         self._framework_module = framework_module
+        self._max_batch_size = max_batch_size
+        self._max_batch_delay = max_batch_delay
+        self._preload_model = preload_model
+        self._model_server_worker_class = model_server_worker_class
+        self._model_server_threads = model_server_threads
+        self._nginx_worker_processes = nginx_worker_processes
+        self._nginx_worker_connections = nginx_worker_connections
+        self._nginx_keepalive_timeout = nginx_keepalive_timeout
+        self._nginx_upstream_keepalive = nginx_upstream_keepalive
+        self._nginx_proxy_buffering = nginx_proxy_buffering
+        self._response_cache_size = response_cache_size
+        self._response_cache_ttl = response_cache_ttl
+        self._response_cache_backend = response_cache_backend
+        self._max_concurrent_requests = max_concurrent_requests
+        self._max_queued_requests = max_queued_requests
+        self._retry_after = retry_after
+        self._stream_requests = stream_requests
+        self._multi_model = multi_model
+        self._multi_model_memory_budget = multi_model_memory_budget
+        self._model_server_min_workers = model_server_min_workers
+        self._model_server_max_workers = model_server_max_workers
+        self._model_server_cpu_affinity = model_server_cpu_affinity
+        self._model_server_reload_interval = model_server_reload_interval
+        self._fast_ping = fast_ping
+        self._response_compression = response_compression
+        self._response_compression_min_size = response_compression_min_size
+        self._max_decompressed_request_size = max_decompressed_request_size
+        self._pipeline_threads = pipeline_threads
+        self._ipc_socket = ipc_socket
+        self._ipc_max_payload_size = ipc_max_payload_size
+        self._record_split_threads = record_split_threads
+        self._request_coalescing = request_coalescing
+        self._prediction_cache_dir = prediction_cache_dir
+        self._prediction_cache_size = prediction_cache_size
 
     @property
     def use_nginx(self):  # type: () -> bool
@@ -806,3 +909,275 @@ class ServingEnv(_Env):
             str: Name of the framework module and entry point. For example:
                 my_module:main"""
         return self._framework_module
+
+    @property
+    def max_batch_size(self):  # type: () -> int
+        """Returns:
+            int: Maximum number of concurrent requests merged in a single predict_fn call. Batching is
+                disabled when the value is 1. Default: 1"""
+        return self._max_batch_size
+
+    @property
+    def max_batch_delay(self):  # type: () -> int
+        """Returns:
+            int: Maximum time in milliseconds that a request waits for other requests to fill its batch.
+                Default: 10"""
+        return self._max_batch_delay
+
+    @property
+    def preload_model(self):  # type: () -> bool
+        """Returns:
+            bool: Whether to load the model once in the gunicorn master, before forking the workers, instead of
+                once per worker. The workers share the memory pages of the model copy-on-write. Default: False"""
+        return self._preload_model
+
+    @property
+    def model_server_worker_class(self):  # type: () -> str
+        """Returns:
+            str: The gunicorn worker class used by the model server. One of:
+
+                * gevent: each worker serves concurrent requests in greenlets. Default.
+                * sync: each worker serves a single request at a time.
+                * gthread: each worker serves model_server_threads requests in parallel threads, sharing
+                    a single model instance. Useful for frameworks that release the GIL during predictions.
+                * asgi: each worker runs an asyncio event loop serving an ASGI application, see
+                    sagemaker_containers._asgi. Requires uvicorn."""
+        return self._model_server_worker_class
+
+    @property
+    def model_server_threads(self):  # type: () -> int
+        """Returns:
+            int: Number of threads per worker process used by the gthread worker class. Default: 1"""
+        return self._model_server_threads
+
+    @property
+    def nginx_worker_processes(self):  # type: () -> int
+        """Returns:
+            int: Number of nginx worker processes. Default: the number of cpus available in the container."""
+        return self._nginx_worker_processes
+
+    @property
+    def nginx_worker_connections(self):  # type: () -> int
+        """Returns:
+            int: Maximum number of simultaneous connections, to clients and to gunicorn, of each nginx worker
+                process. Default: 2048"""
+        return self._nginx_worker_connections
+
+    @property
+    def nginx_keepalive_timeout(self):  # type: () -> int
+        """Returns:
+            int: Timeout in seconds during which an idle client connection stays open in nginx. Default: 3"""
+        return self._nginx_keepalive_timeout
+
+    @property
+    def nginx_upstream_keepalive(self):  # type: () -> int
+        """Returns:
+            int: Maximum number of idle connections to gunicorn kept open by each nginx worker process, so
+                requests do not pay for a new connection. 0 disables upstream keepalive. Default: 32"""
+        return self._nginx_upstream_keepalive
+
+    @property
+    def nginx_proxy_buffering(self):  # type: () -> bool
+        """Returns:
+            bool: Whether nginx buffers the responses from gunicorn, releasing the gunicorn worker as soon as
+                possible. When False, responses are sent to the client synchronously as they are received.
+                Default: True"""
+        return self._nginx_proxy_buffering
+
+    @property
+    def response_cache_size(self):  # type: () -> int
+        """Returns:
+            int: Size in bytes of the cache of serialized /invocations responses, keyed by the request payload,
+                content type, accept and model version. The least recently used responses are evicted when the
+                cache is full. The cache is disabled when the value is 0. Default: 0"""
+        return self._response_cache_size
+
+    @property
+    def response_cache_ttl(self):  # type: () -> int
+        """Returns:
+            int: Time in seconds that a cached response is valid. Responses never expire when the value is 0.
+                Default: 300"""
+        return self._response_cache_ttl
+
+    @property
+    def response_cache_backend(self):  # type: () -> str
+        """Returns:
+            str: Where the responses are cached. One of:
+
+                * memory: in the memory of each worker. Default.
+                * shared: in shared memory, a cached response is available to all the workers."""
+        return self._response_cache_backend
+
+    @property
+    def max_concurrent_requests(self):  # type: () -> int
+        """Returns:
+            int: Maximum number of /invocations requests transformed at the same time by each worker. Requests
+                beyond this limit wait in a queue of max_queued_requests requests, and are rejected with the
+                status code 503 when the queue is full. There is no limit when the value is 0. Not supported by
+                the asgi model server worker class. Default: 0"""
+        return self._max_concurrent_requests
+
+    @property
+    def max_queued_requests(self):  # type: () -> int
+        """Returns:
+            int: Maximum number of /invocations requests waiting to be transformed in each worker, when
+                max_concurrent_requests is set. Default: 0"""
+        return self._max_queued_requests
+
+    @property
+    def retry_after(self):  # type: () -> int
+        """Returns:
+            int: Seconds that clients are asked to wait, in the Retry-After header, before retrying a request
+                rejected because the worker is overloaded. Default: 1"""
+        return self._retry_after
+
+    @property
+    def stream_requests(self):  # type: () -> bool
+        """Returns:
+            bool: Whether input_fn receives a file-like stream of the raw request body, instead of the whole body
+                read in memory and decoded to text for JSON, CSV and JSON Lines. The default input_fn decodes CSV
+                and JSON Lines incrementally. Responses are not cached when requests are streamed. Default: False"""
+        return self._stream_requests
+
+    @property
+    def multi_model(self):  # type: () -> bool
+        """Returns:
+            bool: Whether the model server serves multiple models, each one stored in a subdirectory of model_dir.
+                A model is invoked with POST /models/<model name>/invoke, or POST /invocations with the header
+                X-Amzn-SageMaker-Target-Model, and loaded the first time it is invoked. Default: False"""
+        return self._multi_model
+
+    @property
+    def multi_model_memory_budget(self):  # type: () -> int
+        """Returns:
+            int: Maximum number of bytes used by the models loaded by each worker in multi-model mode. The least
+                recently used models are evicted when the budget is exceeded. There is no limit when the value is
+                0. Default: 0"""
+        return self._multi_model_memory_budget
+
+    @property
+    def model_server_min_workers(self):  # type: () -> int
+        """Returns:
+            int: Minimum number of worker processes of the model server. The number of workers is adjusted
+                between model_server_min_workers and model_server_max_workers, following the number of requests
+                in flight and the cpu usage, when they are different. See sagemaker_containers._autoscaler.
+                Default: model_server_workers"""
+        return self._model_server_min_workers
+
+    @property
+    def model_server_max_workers(self):  # type: () -> int
+        """Returns:
+            int: Maximum number of worker processes of the model server. See model_server_min_workers.
+                Default: model_server_workers"""
+        return self._model_server_max_workers
+
+    @property
+    def model_server_cpu_affinity(self):  # type: () -> bool
+        """Returns:
+            bool: Whether the cpus of the container are split among the worker processes. Each worker is pinned
+                to its share of the cpus, and the OpenMP, MKL and OpenBLAS libraries of each worker use one
+                thread per cpu of its share, instead of one thread per cpu of the container.
+                See sagemaker_containers._affinity. Default: False"""
+        return self._model_server_cpu_affinity
+
+    @property
+    def model_server_reload_interval(self):  # type: () -> int
+        """Returns:
+            int: Time in seconds between checks of the files in the model directory. The workers are replaced
+                one at a time, loading the new model, when the files change. The model is also reloaded when the
+                model server receives SIGHUP. The directory is not checked when the value is 0. See
+                sagemaker_containers._reloader. Default: 0"""
+        return self._model_server_reload_interval
+
+    @property
+    def fast_ping(self):  # type: () -> bool
+        """Returns:
+            bool: whether /ping is answered from the readiness state of the workers, without entering a worker
+                process, so health checks are not delayed by busy workers. nginx answers /ping when use_nginx is
+                True, and a custom healthcheck_fn is not called in this mode. It has no effect without nginx: /ping
+                is then answered by the workers. Default: False"""
+        return self._fast_ping
+
+    @property
+    def response_compression(self):  # type: () -> bool
+        """Returns:
+            bool: whether the /invocations responses are compressed with the encoding preferred by the header
+                Accept-Encoding of the client, gzip or zstd. In nginx mode, nginx compresses the responses with
+                gzip. Compressed request bodies are always accepted. See sagemaker_containers._compression.
+                Default: False"""
+        return self._response_compression
+
+    @property
+    def response_compression_min_size(self):  # type: () -> int
+        """Returns:
+            int: Minimum size in bytes of a compressed response. Smaller responses are sent uncompressed, the
+                time spent compressing them is larger than the time saved sending them. Default: 1024"""
+        return self._response_compression_min_size
+
+    @property
+    def max_decompressed_request_size(self):  # type: () -> int
+        """Returns:
+            int: Maximum size in bytes of a request body sent with the header Content-Encoding, once
+                decompressed. Larger bodies are rejected with the status code 413, so a small compressed body
+                cannot exhaust the memory of a worker. Default: 104857600 (100 MB)"""
+        return self._max_decompressed_request_size
+
+    @property
+    def pipeline_threads(self):  # type: () -> int
+        """Returns:
+            int: Number of threads running input_fn, and number of threads running output_fn, in each worker
+                process. When greater than 0, the requests of a worker are pipelined: input_fn, predict_fn and
+                output_fn run in their own threads, and predict_fn runs in a single thread, so the requests
+                are decoded and encoded while the model predicts other requests. It requires concurrent
+                requests in each worker, e.g. the gthread worker class. See sagemaker_containers._pipeline.
+                Default: 0"""
+        return self._pipeline_threads
+
+    @property
+    def ipc_socket(self):  # type: () -> str
+        """Returns:
+            str: Path of a unix socket receiving invocations in a length-prefixed binary protocol, without nginx,
+                HTTP and Flask, for clients running in the same host. Every worker process accepts connections
+                on the socket. See sagemaker_containers._ipc. Default: None, no unix socket"""
+        return self._ipc_socket
+
+    @property
+    def ipc_max_payload_size(self):  # type: () -> int
+        """Returns:
+            int: Maximum size in bytes of the payload of an invocation on the unix socket ipc_socket. Larger
+                payloads are rejected with the status code 413 before they are received, and the connection is
+                closed. Default: 104857600 (100 MB)"""
+        return self._ipc_max_payload_size
+
+    @property
+    def record_split_threads(self):  # type: () -> int
+        """Returns:
+            int: Number of threads transforming the records of a CSV or JSON Lines request in each worker
+                process. When greater than 1, a request holding many records, one record per line, is split in
+                chunks of consecutive records, which are decoded, predicted and encoded in parallel and joined
+                in order. See sagemaker_containers._splitting. Default: 0, requests are not split"""
+        return self._record_split_threads
+
+    @property
+    def request_coalescing(self):  # type: () -> bool
+        """Returns:
+            bool: Whether a request identical to a request in flight in the same worker process, with the same
+                content, content type, accept and model, waits for the response of the request in flight instead
+                of being transformed again. See sagemaker_containers._cache.SingleFlight. Default: False"""
+        return self._request_coalescing
+
+    @property
+    def prediction_cache_dir(self):  # type: () -> str
+        """Returns:
+            str: Directory where sagemaker_containers._batch_transform keeps the responses of the records, keyed
+                by the model version and the record, so the records of a retried or rerun job are not predicted
+                again, e.g. a directory under /opt/ml. See sagemaker_containers._cache.DiskCache. Default: None,
+                the responses are not cached"""
+        return self._prediction_cache_dir
+
+    @property
+    def prediction_cache_size(self):  # type: () -> int
+        """Returns:
+            int: Maximum number of bytes of the prediction cache. The responses cached first are evicted when the
+                cache is full. Default: 1073741824, 1 GB"""
+        return self._prediction_cache_size
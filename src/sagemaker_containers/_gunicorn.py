@@ -0,0 +1,59 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""gunicorn configuration file of the model server, with the server hooks of the workers.
+
+The hooks run in the gunicorn master, before forking a worker and after a worker exits, and in the worker, after
+it is forked:
+
+- the cpus are split among the workers when ServingEnv.model_server_cpu_affinity is True, see
+  sagemaker_containers._affinity.
+- the garbage collector, disabled in the master by sagemaker_containers._memory.freeze when the model is
+  preloaded, is enabled again in the workers.
+- the readiness of the workers is recorded, see sagemaker_containers._readiness. When the model is preloaded,
+  each worker is marked ready once it is forked, instead of the master which loaded the model.
+
+This module is imported by the gunicorn master, it must not import the math libraries. See
+sagemaker_containers._affinity.
+"""
+from __future__ import absolute_import
+
+import gc
+import os
+
+from sagemaker_containers import _affinity, _params, _readiness
+
+
+def pre_fork(server, worker):
+    """gunicorn server hook, called in the master before forking a worker."""
+    if _params.CPU_AFFINITY_WORKERS_ENV in os.environ:
+        _affinity.pre_fork(server, worker)
+
+
+def post_fork(server, worker):
+    """gunicorn server hook, called in the worker after it is forked and before it loads the application."""
+    gc.enable()
+
+    if _params.CPU_AFFINITY_WORKERS_ENV in os.environ:
+        _affinity.post_fork(server, worker)
+
+
+def post_worker_init(worker):
+    """gunicorn server hook, called in the worker after it loads the application."""
+    if worker.cfg.preload_app:
+        # the master loaded the model and warmed up the application before forking the worker.
+        _readiness.mark_ready(1)
+
+
+def child_exit(server, worker):
+    """gunicorn server hook, called in the master after a worker exits."""
+    _readiness.remove_worker(worker.pid)
@@ -0,0 +1,365 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Invocations over a unix socket, for clients running next to the model server.
+
+The requests skip nginx, HTTP and Flask: each worker accepts connections on the unix socket
+ServingEnv.ipc_socket and passes the requests straight to Transformer.transform_content. A connection carries
+any number of requests, each one answered before the next one is read. The integers are big-endian.
+
+Request: flags (uint8), content type length (uint16), accept length (uint16), payload length (uint32), then the
+content type, the accept and the payload.
+
+Response: status code (uint16), content type length (uint16), body length (uint32), then the content type and
+the body.
+
+A request with a payload larger than the maximum payload size is answered with the status code 413 before its
+payload is received, and the connection is closed. With admission control, the requests rejected because the
+worker is overloaded are answered with the status code 503, as on /invocations.
+
+When the flags have SHARED_MEMORY, the payload is not sent on the socket. The header of the request carries
+the file descriptor of a file in shared memory holding the payload, in SCM_RIGHTS ancillary data, and the
+worker maps the file instead of copying the payload through the socket. Requires Python 3.
+
+Examples:
+>>>from sagemaker_containers.beta.framework import ipc
+>>>
+>>>client = ipc.Client('/tmp/model.sock')
+>>>status, content_type, body = client.invoke(b'[[1, 2, 3]]', 'application/json', 'application/json')
+"""
+from __future__ import absolute_import
+
+import array
+import errno
+import io
+import json
+import mmap
+import os
+import socket
+import struct
+import tempfile
+import threading
+
+from six.moves import http_client
+
+from sagemaker_containers import _content_types, _logging, _memory, _metrics, _params
+
+logger = _logging.get_logger()
+
+REQUEST_HEADER = struct.Struct('>BHHI')
+RESPONSE_HEADER = struct.Struct('>HHI')
+
+SHARED_MEMORY = 1  # type: int
+
+# payloads of at least SHARED_MEMORY_MIN_SIZE bytes are sent through shared memory by Client.
+SHARED_MEMORY_MIN_SIZE = 1024 * 1024  # type: int
+
+# maximum number of connections served at the same time by a worker, each one by its own thread. The other
+# connections wait in the backlog of the listening socket.
+MAX_CONNECTIONS = 64  # type: int
+
+_FD_SIZE = array.array('i').itemsize
+
+
+class _PayloadTooLarge(Exception):
+    """Raised when the payload of a request is larger than the maximum payload size."""
+
+
+def serve(transform_content, path, stream_requests=False, admission=None, max_payload_size=None,
+          max_connections=MAX_CONNECTIONS):
+    # type: (function, str, bool, _admission.AdmissionController, int, int) -> socket.socket
+    """Accept connections and answer their requests in daemon threads.
+
+    Under sagemaker_containers._server, the socket is created by the server and inherited by all the workers,
+    which accept its connections in turn. Otherwise the socket is created at path.
+
+    Args:
+        transform_content (function): called with the content, the content type and the accept of each
+            request, returns a Flask response. See Transformer.transform_content.
+        path (str): path of the unix socket.
+        stream_requests (bool): whether transform_content receives a file-like stream of the payload, instead
+            of its content. See ServingEnv.stream_requests.
+        admission (AdmissionController): the admission control of the requests, shared with /invocations.
+            The requests are not limited when it is None.
+        max_payload_size (int): maximum number of bytes of a payload. See ServingEnv.ipc_max_payload_size.
+            There is no limit when it is None.
+        max_connections (int): maximum number of connections served at the same time.
+
+    Returns:
+        (socket.socket): the listening socket.
+    """
+    fd = os.environ.get(_params.IPC_SOCKET_FD_ENV)
+    listener = socket.fromfd(int(fd), socket.AF_UNIX, socket.SOCK_STREAM) if fd else listen(path)
+
+    _start_thread(_accept, listener, threading.Semaphore(max_connections), transform_content, stream_requests,
+                  admission, max_payload_size)
+
+    logger.info('Serving invocations on unix socket %s', path)
+    return listener
+
+
+def listen(path):  # type: (str) -> socket.socket
+    """Create a unix socket listening at path, replacing the socket of a previous server.
+
+    Returns:
+        (socket.socket): the listening socket.
+    """
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(socket.SOMAXCONN)
+    return listener
+
+
+class Client(object):
+    """Client of the unix socket of the model server, keeping a connection open across invocations.
+
+    A client is not thread safe: each thread needs its own client.
+    """
+
+    def __init__(self, path, shared_memory_min_size=SHARED_MEMORY_MIN_SIZE):
+        """
+        Args:
+            path (str): path of the unix socket, see ServingEnv.ipc_socket.
+            shared_memory_min_size (int): payloads of at least this many bytes are sent through shared memory.
+                Payloads are always sent on the socket when the value is 0 or with Python 2.
+        """
+        self.path = path
+        self.shared_memory_min_size = shared_memory_min_size if hasattr(socket.socket, 'sendmsg') else 0
+        self._connection = None
+
+    def invoke(self, payload, content_type=_content_types.JSON, accept=_content_types.JSON):
+        # type: (bytes, str, str) -> (int, str, bytes)
+        """Invoke the model.
+
+        Args:
+            payload (bytes): the request data.
+            content_type (str): the content type of the data.
+            accept (str): the content type expected in the response.
+
+        Returns:
+            (int, str, bytes): the status code, the content type and the body of the response.
+        """
+        if self._connection is None:
+            self._connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._connection.connect(self.path)
+
+        content_type, accept = content_type.encode('utf-8'), accept.encode('utf-8')
+
+        try:
+            if self.shared_memory_min_size and len(payload) >= self.shared_memory_min_size:
+                self._send_shared(payload, content_type, accept)
+            else:
+                self._connection.sendall(REQUEST_HEADER.pack(0, len(content_type), len(accept), len(payload)) +
+                                         content_type + accept + payload)
+
+            status, content_type_size, body_size = RESPONSE_HEADER.unpack(
+                _recv_exactly(self._connection, RESPONSE_HEADER.size))
+            response_content_type = _recv_exactly(self._connection, content_type_size).decode('utf-8')
+            return status, response_content_type, _recv_exactly(self._connection, body_size)
+        except Exception:
+            # the connection is left in an unknown state.
+            self.close()
+            raise
+
+    def close(self):  # type: () -> None
+        """Close the connection."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _send_shared(self, payload, content_type, accept):
+        shared_memory_dir = _memory.SHARED_MEMORY_DIR if os.path.isdir(_memory.SHARED_MEMORY_DIR) else None
+
+        with tempfile.TemporaryFile(dir=shared_memory_dir) as f:
+            f.write(payload)
+            f.flush()
+
+            header = REQUEST_HEADER.pack(SHARED_MEMORY, len(content_type), len(accept), len(payload))
+            fds = array.array('i', [f.fileno()])
+            self._connection.sendmsg([header], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds.tobytes())])
+            self._connection.sendall(content_type + accept)
+
+
+def _accept(listener, connections, *args):
+    while True:
+        # a connection is only accepted once a thread can serve it.
+        connections.acquire()
+        try:
+            connection, _ = listener.accept()
+        except socket.error as e:
+            connections.release()
+            # interrupted by a signal, in Python 2.
+            if e.errno == errno.EINTR:
+                continue
+            raise
+
+        _start_thread(_serve_connection, connection, connections, *args)
+
+
+def _serve_connection(connection, connections, *args):
+    try:
+        _handle(connection, *args)
+    finally:
+        connections.release()
+
+
+def _handle(connection, transform_content, stream_requests, admission, max_payload_size):
+    try:
+        while True:
+            try:
+                request = _read_request(connection, max_payload_size)
+            except _PayloadTooLarge as e:
+                # the payload left on the socket is not received: the connection cannot be used anymore.
+                connection.sendall(_error(http_client.REQUEST_ENTITY_TOO_LARGE, 'RequestEntityTooLarge', str(e)))
+                return
+
+            if request is None:
+                return
+
+            flags, content_type, accept, payload = request
+            try:
+                response = _admitted(transform_content, admission, payload, content_type, accept, stream_requests)
+            finally:
+                # the response is complete, transform_content no longer reads the payload, even as a stream.
+                if isinstance(payload, mmap.mmap):
+                    payload.close()
+
+            connection.sendall(response)
+    except Exception:
+        logger.exception('Unix socket connection failed')
+    finally:
+        connection.close()
+
+
+def _admitted(transform_content, admission, payload, content_type, accept, stream_requests):
+    # type: (function, _admission.AdmissionController, object, str, str, bool) -> bytes
+    if admission and not admission.acquire():
+        return _error(http_client.SERVICE_UNAVAILABLE, 'ServiceUnavailable',
+                      'The model server is overloaded. Retry the request later.')
+
+    _metrics.add('requests_in_flight', 1)
+    try:
+        return _transform(transform_content, _content(payload, content_type, stream_requests), content_type, accept)
+    finally:
+        _metrics.add('requests_in_flight', -1)
+        if admission:
+            admission.release()
+
+
+def _read_request(connection, max_payload_size=None):  # type: (socket.socket, int) -> tuple
+    header, fds = _recv_header(connection)
+    if header is None:
+        return None
+
+    flags, content_type_size, accept_size, payload_size = REQUEST_HEADER.unpack(header)
+    if max_payload_size is not None and payload_size > max_payload_size:
+        for fd in fds:
+            os.close(fd)
+        raise _PayloadTooLarge('The payload of %d bytes is larger than the maximum of %d bytes.'
+                               % (payload_size, max_payload_size))
+
+    content_type = _recv_exactly(connection, content_type_size).decode('utf-8')
+    accept = _recv_exactly(connection, accept_size).decode('utf-8')
+
+    if not flags & SHARED_MEMORY:
+        return flags, content_type, accept, _recv_exactly(connection, payload_size)
+
+    if not fds:
+        raise ValueError('Shared memory request without a file descriptor.')
+    try:
+        payload = mmap.mmap(fds[0], payload_size, access=mmap.ACCESS_READ) if payload_size else b''
+    finally:
+        for fd in fds:
+            os.close(fd)
+    return flags, content_type, accept, payload
+
+
+def _recv_header(connection):  # type: (socket.socket) -> (bytes, list)
+    """Returns:
+        (bytes, list[int]): the header of a request, or None if the client closed the connection, and the file
+            descriptors received with it."""
+    header = b''
+    fds = []
+
+    while len(header) < REQUEST_HEADER.size:
+        if hasattr(connection, 'recvmsg'):
+            data, ancillary, _, _ = connection.recvmsg(REQUEST_HEADER.size - len(header), socket.CMSG_LEN(_FD_SIZE))
+            for level, kind, fd_data in ancillary:
+                if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                    fds += array.array('i', fd_data[:len(fd_data) - len(fd_data) % _FD_SIZE]).tolist()
+        else:
+            data = connection.recv(REQUEST_HEADER.size - len(header))
+
+        if not data:
+            if header:
+                raise EOFError('Connection closed in the middle of a request.')
+            return None, fds
+        header += data
+
+    return header, fds
+
+
+def _recv_exactly(connection, size):  # type: (socket.socket, int) -> bytes
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+
+    while received < size:
+        count = connection.recv_into(view[received:], size - received)
+        if not count:
+            raise EOFError('Connection closed in the middle of a message.')
+        received += count
+
+    return bytes(data)
+
+
+def _content(payload, content_type, stream_requests):  # type: (object, str, bool) -> object
+    # same content as sagemaker_containers._worker.Request.content, or Request.stream in stream mode.
+    if stream_requests:
+        return payload if isinstance(payload, mmap.mmap) else io.BytesIO(payload)
+
+    if isinstance(payload, mmap.mmap):
+        payload = payload[:]
+    return payload.decode('utf-8') if content_type in _content_types.UTF8_TYPES else payload
+
+
+def _transform(transform_content, content, content_type, accept):  # type: (function, object, str, str) -> bytes
+    try:
+        response = transform_content(content, content_type, accept)
+        status, mimetype, body = response.status_code, response.mimetype or '', response.get_data()
+    except Exception as e:
+        logger.exception('Exception on unix socket invocation')
+        return _error(http_client.INTERNAL_SERVER_ERROR, e.__class__.__name__, str(e))
+
+    return _response(status, mimetype, body)
+
+
+def _error(status, error, message):  # type: (int, str, str) -> bytes
+    body = json.dumps({'error': error, 'error-message': message}).encode('utf-8')
+    return _response(status, _content_types.JSON, body)
+
+
+def _response(status, mimetype, body):  # type: (int, str, bytes) -> bytes
+    mimetype = mimetype.encode('utf-8')
+    return RESPONSE_HEADER.pack(status, len(mimetype), len(body)) + mimetype + body
+
+
+def _start_thread(target, *args):
+    thread = threading.Thread(target=target, args=args)
+    thread.daemon = True
+    thread.start()
@@ -0,0 +1,217 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import collections
+import errno
+import fcntl
+import gc
+import os
+import resource
+import shutil
+import tempfile
+
+import numpy as np
+
+from sagemaker_containers import _cache, _env, _logging, _readiness
+
+logger = _logging.get_logger()
+
+MB = 1024 * 1024  # type: int
+
+SHARED_MEMORY_DIR = '/dev/shm'  # type: str
+
+# directory of the arrays of sagemaker_containers._memory.shared_array, with a sub directory per model version.
+ARRAYS_DIR = 'sagemaker-arrays'  # type: str
+
+Usage = collections.namedtuple('Usage', ['shared', 'private'])
+
+
+def rss():  # type: () -> int
+    """The resident set size of the current process.
+
+    Returns:
+        (int): number of bytes of the current process in physical memory. The peak resident set size is
+            returned when /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (IOError, OSError, IndexError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def freeze():  # type: () -> None
+    """Keep the objects tracked by the garbage collector out of its collections, before forking.
+
+    The garbage collector writes to the header of every object it inspects, which makes the memory pages
+    shared with forked processes private. With Python 3.7 or later, the objects are moved to a permanent
+    generation, never inspected again.
+
+    With previous versions, the objects are collected once, which moves them to the oldest generation, and the
+    garbage collector is disabled until the workers are forked, see sagemaker_containers._gunicorn.post_fork. The
+    oldest generation is only inspected by full collections, which run once the objects created after the fork
+    outnumber a quarter of it, so the pages of the objects of the master stay shared until then.
+    """
+    gc.collect()
+
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+    else:
+        gc.disable()
+
+
+def shared_array(name, array, directory=None):  # type: (str, object, str) -> np.memmap
+    """Store an array once per container and map it read-only in the current process.
+
+    The first process calling shared_array with a given name writes the array to
+    <directory>/sagemaker-arrays/<model version>/<name>.npy. Every process, including the first one, then maps
+    the file with numpy.memmap. The pages of the file are shared by all the processes mapping it, so the array
+    occupies physical memory once per container, instead of once per gunicorn worker, and Python reference
+    counting never makes them private.
+
+    The model version is the signature of the files in ServingEnv.model_dir, see _cache.model_version. When the
+    model files change, e.g. before sagemaker_containers._reloader reloads the workers, the array is written
+    again by the first worker loading the new model, which also removes the arrays of the other versions. The
+    workers still mapping them keep their pages until they exit.
+
+    /dev/shm is limited to 64 MB by default in Docker containers. When the default directory does not have
+    enough free space for the array, it is stored in the temporary directory instead, and its pages are still
+    shared through the page cache.
+
+    Examples:
+    >>>from sagemaker_containers.beta.framework import memory
+    >>>
+    >>>def model_fn(model_dir):
+    >>>     weights = memory.shared_array('weights', lambda: np.load(os.path.join(model_dir, 'weights.npy')))
+    >>>     return Model(weights)
+
+    Args:
+        name (str): name of the array, unique in the container.
+        array (np.array or function): the array, or a function returning the array. The function is only called
+            by the process that creates the file.
+        directory (str): directory where the arrays are stored, outside of ServingEnv.model_dir. Defaults to the
+            state directory of the model server, created in /dev/shm for each run of
+            sagemaker_containers._server, or to /dev/shm, or to the temporary directory when /dev/shm does not
+            exist or is full.
+
+    Returns:
+        (np.memmap): the read-only array.
+
+    Raises:
+        (IOError): with errno.ENOSPC when no directory has enough free space for the array.
+    """
+    directories = [directory] if directory else _default_directories()
+    model_version = _cache.model_version(_env.model_dir)
+    paths = [os.path.join(d, ARRAYS_DIR, model_version, '%s.npy' % name) for d in directories]
+    path = _find(paths)
+
+    if path is None:
+        # the version directory itself is locked: a lock file would be recreated by the processes opening it
+        # after its removal.
+        lock_dir = os.path.dirname(paths[0])
+        _makedirs(lock_dir)
+        lock = os.open(lock_dir, os.O_RDONLY)
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # the processes waiting for the lock find the array once they hold it.
+            path = _find(paths)
+            if path is None:
+                array = np.asarray(array() if callable(array) else array)
+                path = _writable_path(paths, array.nbytes)
+                for p in paths:
+                    _remove_other_versions(os.path.dirname(os.path.dirname(p)), os.path.dirname(p))
+                _save(path, array)
+        finally:
+            os.close(lock)
+
+    return np.load(path, mmap_mode='r')
+
+
+def _default_directories():  # type: () -> list
+    directory = _readiness.state_dir() or (SHARED_MEMORY_DIR if os.path.isdir(SHARED_MEMORY_DIR) else None)
+    return [directory, tempfile.gettempdir()] if directory else [tempfile.gettempdir()]
+
+
+def _find(paths):  # type: (list) -> str
+    for path in paths:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _writable_path(paths, size):  # type: (list, int) -> str
+    for path in paths:
+        _makedirs(os.path.dirname(path))
+        stat = os.statvfs(os.path.dirname(path))
+        # the .npy header takes less than a page.
+        if stat.f_bavail * stat.f_frsize >= size + resource.getpagesize():
+            return path
+        logger.warning('Not enough free space to store the array %s of %d bytes in %s.',
+                       os.path.basename(path), size, os.path.dirname(path))
+
+    raise IOError(errno.ENOSPC, 'Not enough free space to store the array %s of %d bytes.'
+                  % (os.path.basename(paths[0]), size))
+
+
+def _makedirs(path):  # type: (str) -> None
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def _remove_other_versions(arrays_dir, version_dir):  # type: (str, str) -> None
+    if not os.path.isdir(arrays_dir):
+        return
+
+    for name in os.listdir(arrays_dir):
+        path = os.path.join(arrays_dir, name)
+        if path != version_dir:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _save(path, array):  # type: (str, object) -> None
+    # the array is renamed only when it is complete, so other processes never map a partial file.
+    tmp_path = '%s.%s.tmp' % (path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.rename(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def usage():  # type: () -> Usage
+    """The memory of the current process shared with other processes, and private to it.
+
+    Returns:
+        (Usage): named tuple with the number of bytes in physical memory shared with other processes, and
+            the number of bytes private to the current process. The shared memory is 0 and all the resident
+            set is considered private when /proc is not available.
+    """
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup' if os.path.exists('/proc/self/smaps_rollup') else '/proc/self/smaps') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key.startswith(('Shared_', 'Private_')) and value.strip().endswith('kB'):
+                    fields[key] = fields.get(key, 0) + int(value.split()[0]) * 1024
+    except (IOError, OSError, ValueError):
+        return Usage(shared=0, private=rss())
+
+    return Usage(shared=fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+                 private=fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0))
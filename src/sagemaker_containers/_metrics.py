@@ -0,0 +1,340 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Latency histograms and counters of the model server, aggregated across workers.
+
+Each worker process records its metrics in a memory-mapped file, <state directory>/metrics/<pid>, in the state
+directory shared by the server and all its workers. See sagemaker_containers._readiness. The /metrics route
+sums the files of all the workers and returns the totals in the Prometheus text format. Gauges only count the
+workers that are alive. The metrics of the workers that exited are added to <state directory>/metrics/exited,
+and their files are removed. The server process records the metrics of its
+children in the same way, see sagemaker_containers._supervisor. Outside of sagemaker_containers._server, the metrics
+of the current process are kept in memory.
+
+Examples:
+>>>from sagemaker_containers import _metrics
+>>>
+>>>with _metrics.timer('predict'):
+>>>     prediction = predict_fn(data, model)
+"""
+from __future__ import absolute_import
+
+import contextlib
+import errno
+import fcntl
+import os
+import threading
+import time
+
+import numpy as np
+
+from sagemaker_containers import _readiness
+
+METRICS_DIR = 'metrics'  # type: str
+
+# file of the metrics of the processes that exited, in the metrics directory.
+EXITED = 'exited'  # type: str
+
+CONTENT_TYPE = 'text/plain; version=0.0.4'  # type: str
+
+# stages of an /invocations request. transform is the whole transform_fn, which includes input, predict and
+# output when transform_fn is not implemented by the user. load is the loading of a model in multi-model mode.
+STAGES = ('queue', 'read', 'load', 'transform', 'input', 'predict', 'output', 'write')
+
+# upper bounds, in seconds, of the histogram buckets. The last bucket is +Inf.
+BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10., 30., 60.)
+
+COUNTERS = (('cache_hits', 'Number of /invocations responses returned from the response cache.'),
+            ('cache_misses', 'Number of /invocations requests not found in the response cache.'),
+            ('requests_coalesced', 'Number of /invocations requests answered with the response of an identical '
+                                   'request in flight.'),
+            ('requests_rejected', 'Number of /invocations requests rejected because the worker was overloaded.'),
+            ('model_loads', 'Number of models loaded in multi-model mode.'),
+            ('model_hits', 'Number of requests invoking a model already loaded in multi-model mode.'),
+            ('model_evictions', 'Number of models evicted to fit the memory budget in multi-model mode.'),
+            ('nginx_restarts', 'Number of times nginx was restarted after it crashed.'),
+            ('gunicorn_restarts', 'Number of times the gunicorn master was restarted after it crashed.'))
+
+# the uptime of a process is the current time minus its start time.
+GAUGES = (('requests_in_flight', 'Number of /invocations requests being served.'),
+          ('nginx_start_time_seconds', 'Start time of the nginx process since the epoch, in seconds.'),
+          ('gunicorn_start_time_seconds', 'Start time of the gunicorn master process since the epoch, in seconds.'))
+
+_COUNTER_NAMES = [name for name, _ in COUNTERS]
+_GAUGE_NAMES = [name for name, _ in GAUGES]
+
+# layout of the metrics of a process: for each stage, the number of observations in each bucket, followed
+# by the sum of the observations. Then the value of each counter, and the value of each gauge.
+_STAGE_SIZE = len(BUCKETS) + 2
+_COUNTERS_OFFSET = len(STAGES) * _STAGE_SIZE
+_GAUGES_OFFSET = _COUNTERS_OFFSET + len(COUNTERS)
+_SIZE = _GAUGES_OFFSET + len(GAUGES)
+
+
+class Metrics(object):
+    """Metrics of the current process."""
+
+    def __init__(self):
+        self._values = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._values_lock = None
+
+    def observe(self, stage, seconds):  # type: (str, float) -> None
+        """Record the time spent by a request in a stage.
+
+        Args:
+            stage (str): one of STAGES.
+            seconds (float): the time spent in the stage.
+        """
+        offset = STAGES.index(stage) * _STAGE_SIZE
+        bucket = int(np.searchsorted(BUCKETS, seconds))
+        values, lock = self._open()
+
+        with lock:
+            values[offset + bucket] += 1
+            values[offset + _STAGE_SIZE - 1] += seconds
+
+    def increment(self, counter, value=1):  # type: (str, int) -> None
+        """Increment a counter.
+
+        Args:
+            counter (str): one of the names in COUNTERS.
+            value (int): the increment.
+        """
+        values, lock = self._open()
+
+        with lock:
+            values[_COUNTERS_OFFSET + _COUNTER_NAMES.index(counter)] += value
+
+    def add(self, gauge, value):  # type: (str, int) -> None
+        """Add a value, positive or negative, to a gauge.
+
+        Args:
+            gauge (str): one of the names in GAUGES.
+            value (int): the value.
+        """
+        values, lock = self._open()
+
+        with lock:
+            values[_GAUGES_OFFSET + _GAUGE_NAMES.index(gauge)] += value
+
+    def set_gauge(self, gauge, value):  # type: (str, float) -> None
+        """Set the value of a gauge.
+
+        Args:
+            gauge (str): one of the names in GAUGES.
+            value (float): the value.
+        """
+        values, lock = self._open()
+
+        with lock:
+            values[_GAUGES_OFFSET + _GAUGE_NAMES.index(gauge)] = value
+
+    def value(self, name):  # type: (str) -> float
+        """Returns:
+            (float): the value of a counter or gauge, summed across the workers."""
+        values = self.collect()
+
+        if name in _GAUGE_NAMES:
+            return float(values[_GAUGES_OFFSET + _GAUGE_NAMES.index(name)])
+        return float(values[_COUNTERS_OFFSET + _COUNTER_NAMES.index(name)])
+
+    def collect(self):  # type: () -> np.array
+        """Returns:
+            (np.array): the sum of the metrics of all the workers."""
+        directory = _metrics_dir()
+
+        if not directory:
+            values, _ = self._open()
+            return np.array(values)
+
+        total = np.zeros(_SIZE)
+        if not os.path.isdir(directory):
+            return total
+
+        exited = []
+        with _locked(directory, fcntl.LOCK_SH):
+            for name in os.listdir(directory):
+                worker_values = _read(os.path.join(directory, name))
+                if worker_values is None:
+                    continue
+
+                if not _alive(name):
+                    worker_values[_GAUGES_OFFSET:] = 0
+                    if name != EXITED:
+                        exited.append(name)
+                total += worker_values
+
+        for name in exited:
+            _remove_exited(directory, name)
+        return total
+
+    def prometheus(self):  # type: () -> str
+        """Returns:
+            (str): the metrics of all the workers in the Prometheus text format."""
+        values = self.collect()
+
+        lines = ['# HELP sagemaker_request_stage_seconds Time spent by /invocations requests in each stage.',
+                 '# TYPE sagemaker_request_stage_seconds histogram']
+
+        for i, stage in enumerate(STAGES):
+            stage_values = values[i * _STAGE_SIZE:(i + 1) * _STAGE_SIZE]
+            counts = np.cumsum(stage_values[:-1])
+
+            for upper_bound, count in zip(BUCKETS + ('+Inf',), counts):
+                lines.append('sagemaker_request_stage_seconds_bucket{stage="%s",le="%s"} %d'
+                             % (stage, upper_bound, count))
+            lines.append('sagemaker_request_stage_seconds_sum{stage="%s"} %r' % (stage, float(stage_values[-1])))
+            lines.append('sagemaker_request_stage_seconds_count{stage="%s"} %d' % (stage, counts[-1]))
+
+        for i, (name, description) in enumerate(COUNTERS):
+            lines += ['# HELP sagemaker_%s_total %s' % (name, description),
+                      '# TYPE sagemaker_%s_total counter' % name,
+                      'sagemaker_%s_total %d' % (name, values[_COUNTERS_OFFSET + i])]
+
+        for i, (name, description) in enumerate(GAUGES):
+            lines += ['# HELP sagemaker_%s %s' % (name, description),
+                      '# TYPE sagemaker_%s gauge' % name,
+                      'sagemaker_%s %d' % (name, values[_GAUGES_OFFSET + i])]
+
+        return '\n'.join(lines) + '\n'
+
+    def _open(self):
+        # the file and its lock are created lazily, in the worker process, after gunicorn forks and the gevent
+        # worker monkey-patches the threading primitives.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._values = _create_values()
+                    self._values_lock = threading.Lock()
+                    self._pid = os.getpid()
+        return self._values, self._values_lock
+
+
+metrics = Metrics()
+
+
+def observe(stage, seconds):  # type: (str, float) -> None
+    """Record the time spent by a request in a stage. See Metrics.observe."""
+    metrics.observe(stage, seconds)
+
+
+def increment(counter, value=1):  # type: (str, int) -> None
+    """Increment a counter. See Metrics.increment."""
+    metrics.increment(counter, value)
+
+
+@contextlib.contextmanager
+def timer(stage):  # type: (str) -> None
+    """Context manager recording the time spent in its block as the time of a stage."""
+    start = time.time()
+    try:
+        yield
+    finally:
+        observe(stage, time.time() - start)
+
+
+def add(gauge, value):  # type: (str, int) -> None
+    """Add a value to a gauge. See Metrics.add."""
+    metrics.add(gauge, value)
+
+
+def set_gauge(gauge, value):  # type: (str, float) -> None
+    """Set the value of a gauge. See Metrics.set_gauge."""
+    metrics.set_gauge(gauge, value)
+
+
+def value(name):  # type: (str) -> float
+    """Returns:
+        (float): the value of a counter or gauge, summed across the workers. See Metrics.value."""
+    return metrics.value(name)
+
+
+def prometheus():  # type: () -> str
+    """Returns:
+        (str): the metrics of all the workers in the Prometheus text format."""
+    return metrics.prometheus()
+
+
+def _metrics_dir():  # type: () -> str
+    state_dir = _readiness.state_dir()
+    return os.path.join(state_dir, METRICS_DIR) if state_dir else None
+
+
+def _alive(pid):  # type: (str) -> bool
+    try:
+        os.kill(int(pid), 0)
+    except ValueError:
+        return False
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+def _create_values():  # type: () -> np.array
+    directory = _metrics_dir()
+    if not directory:
+        return np.zeros(_SIZE)
+
+    try:
+        os.makedirs(directory)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+    # a process reusing the pid of a worker that exited starts with new metrics, and gauges at 0.
+    _remove_exited(directory, str(os.getpid()))
+    return np.memmap(os.path.join(directory, str(os.getpid())), dtype=np.float64, mode='w+', shape=(_SIZE,))
+
+
+def _read(path):  # type: (str) -> np.array
+    try:
+        values = np.fromfile(path, dtype=np.float64)
+    except (IOError, OSError):
+        return None
+    return values if values.shape == (_SIZE,) else None
+
+
+@contextlib.contextmanager
+def _locked(directory, operation):  # type: (str, int) -> None
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, operation)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _remove_exited(directory, pid):  # type: (str, str) -> None
+    # the metrics of the process are added to the EXITED file and its file is removed, so the metrics directory
+    # does not grow with the workers restarted by gunicorn. The directory is locked, so the metrics are added
+    # once when several processes collect them at the same time, and never read twice by collect.
+    path = os.path.join(directory, pid)
+    exited_path = os.path.join(directory, EXITED)
+
+    with _locked(directory, fcntl.LOCK_EX):
+        # the pid may have been reused by a new process since it was found exited.
+        if not os.path.exists(path) or (pid != str(os.getpid()) and _alive(pid)):
+            return
+
+        values = _read(path)
+        if values is not None:
+            values[_GAUGES_OFFSET:] = 0
+            exited_values = _read(exited_path)
+            if exited_values is not None:
+                values += exited_values
+
+            tmp_path = '%s.%s.tmp' % (exited_path, os.getpid())
+            values.tofile(tmp_path)
+            os.rename(tmp_path, exited_path)
+        os.remove(path)
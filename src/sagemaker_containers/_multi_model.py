@@ -0,0 +1,184 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Multi-model serving.
+
+Each subdirectory of the model directory contains a model. A model is loaded by model_fn, with its
+subdirectory as model_dir, the first time it is invoked. The least recently used models are evicted when the
+memory used by the loaded models exceeds a budget.
+"""
+from __future__ import absolute_import
+
+import collections
+import gc
+import os
+import sys
+import threading
+import time
+
+import six
+
+from sagemaker_containers import _errors, _logging, _memory, _metrics
+
+logger = _logging.get_logger()
+
+
+class ModelNotFoundError(_errors.ClientError):
+    """Raised when the invoked model does not exist in the model directory."""
+
+    def __init__(self, name):
+        message = 'Model %s not found.' % name if name else 'The model to invoke is not specified.'
+        super(ModelNotFoundError, self).__init__(message)
+
+
+class _Loading(object):
+    """A model being loaded, waited for by the concurrent requests invoking it."""
+
+    def __init__(self):
+        self.model = None
+        self.exc_info = None
+        self.done = threading.Event()
+
+    def result(self):
+        self.done.wait()
+
+        if self.exc_info:
+            six.reraise(*self.exc_info)
+        return self.model
+
+
+class ModelCache(object):
+    """Loads models lazily and keeps the most recently used ones in memory.
+
+    The memory used by a model is estimated as the growth of the resident set size of the process while
+    model_fn loads it.
+
+    Examples:
+    >>>models = ModelCache(model_fn, '/opt/ml/model', memory_budget=4 * 1024 ** 3)
+    >>>model = models.get('customer-1')
+    """
+
+    def __init__(self, model_fn, model_dir, memory_budget=0):
+        """
+        Args:
+            model_fn (fn): Function responsible to load a model from its directory.
+            model_dir (str): directory containing one subdirectory per model.
+            memory_budget (int): maximum number of bytes used by the loaded models. The model being invoked is
+                never evicted. There is no limit when the value is 0.
+        """
+        self.model_fn = model_fn
+        self.model_dir = model_dir
+        self.memory_budget = memory_budget
+        self._models = collections.OrderedDict()
+        self._loading = {}
+        self._lock = None
+        self._pid = None
+        self._pid_lock = threading.Lock()
+
+    @property
+    def models(self):  # type: () -> list
+        """Returns:
+            (list[str]): names of the loaded models, from the least to the most recently used."""
+        return list(self._models)
+
+    @property
+    def memory(self):  # type: () -> int
+        """Returns:
+            (int): estimated number of bytes used by the loaded models."""
+        return sum(size for _, size in self._models.values())
+
+    def get(self, name):  # type: (str) -> object
+        """Returns the model, loading it if it is not loaded yet. Concurrent requests for a model being loaded
+        wait for it to be loaded once.
+
+        Args:
+            name (str): name of the model, i.e. the name of its subdirectory in the model directory.
+
+        Returns:
+            (obj): the model returned by model_fn.
+        """
+        lock = self._get_lock()
+
+        with lock:
+            if name in self._models:
+                self._models[name] = self._models.pop(name)
+                _metrics.increment('model_hits')
+                return self._models[name][0]
+
+            loading = self._loading.get(name)
+            owner = loading is None
+            if owner:
+                loading = self._loading[name] = _Loading()
+
+        if not owner:
+            return loading.result()
+
+        evicted = False
+        try:
+            loading.model, size = self._load(name)
+        except Exception:
+            loading.exc_info = sys.exc_info()
+            raise
+        finally:
+            with lock:
+                if loading.exc_info is None:
+                    self._models[name] = (loading.model, size)
+                    evicted = self._evict(keep=name)
+                del self._loading[name]
+            loading.done.set()
+
+        if evicted:
+            gc.collect()
+        return loading.model
+
+    def _load(self, name):  # type: (str) -> (object, int)
+        if not name or name in ('.', '..') or os.path.basename(name) != name:
+            raise ModelNotFoundError(name)
+
+        path = os.path.join(self.model_dir, name)
+        if not os.path.isdir(path):
+            raise ModelNotFoundError(name)
+
+        rss_before = _memory.rss()
+        start = time.time()
+
+        model = self.model_fn(path)
+
+        seconds = time.time() - start
+        size = max(_memory.rss() - rss_before, 0)
+
+        _metrics.observe('load', seconds)
+        _metrics.increment('model_loads')
+        logger.info('Model %s loaded in %.2f seconds, using %s MB.', name, seconds, size // _memory.MB)
+        return model, size
+
+    def _evict(self, keep):  # type: (str) -> bool
+        evicted = False
+
+        while self.memory_budget and self.memory > self.memory_budget and next(iter(self._models)) != keep:
+            name, _ = self._models.popitem(last=False)
+            evicted = True
+
+            _metrics.increment('model_evictions')
+            logger.info('Model %s evicted.', name)
+
+        return evicted
+
+    def _get_lock(self):
+        # the lock is created lazily, in the worker process, after gunicorn forks and the gevent worker
+        # monkey-patches the threading primitives.
+        if self._pid != os.getpid():
+            with self._pid_lock:
+                if self._pid != os.getpid():
+                    self._lock = threading.Lock()
+                    self._pid = os.getpid()
+        return self._lock
@@ -33,6 +33,43 @@ MODEL_SERVER_WORKERS_ENV = 'SAGEMAKER_MODEL_SERVER_WORKERS'  # type: str
 MODEL_SERVER_TIMEOUT_ENV = 'SAGEMAKER_MODEL_SERVER_TIMEOUT'  # type: str
 USE_NGINX_ENV = 'SAGEMAKER_USE_NGINX'  # type: str
 FRAMEWORK_SERVING_MODULE_ENV = 'SAGEMAKER_SERVING_MODULE'  # type: str
+MAX_BATCH_SIZE_ENV = 'SAGEMAKER_MODEL_SERVER_MAX_BATCH_SIZE'  # type: str
+MAX_BATCH_DELAY_ENV = 'SAGEMAKER_MODEL_SERVER_MAX_BATCH_DELAY'  # type: str
+PRELOAD_MODEL_ENV = 'SAGEMAKER_MODEL_SERVER_PRELOAD_MODEL'  # type: str
+SERVER_STATE_DIR_ENV = 'SAGEMAKER_SERVER_STATE_DIR'  # type: str
+IPC_SOCKET_FD_ENV = 'SAGEMAKER_IPC_SOCKET_FD'  # type: str
+CPU_AFFINITY_WORKERS_ENV = 'SAGEMAKER_CPU_AFFINITY_WORKERS'  # type: str
+MODEL_SERVER_WORKER_CLASS_ENV = 'SAGEMAKER_MODEL_SERVER_WORKER_CLASS'  # type: str
+MODEL_SERVER_THREADS_ENV = 'SAGEMAKER_MODEL_SERVER_THREADS'  # type: str
+NGINX_WORKER_PROCESSES_ENV = 'SAGEMAKER_NGINX_WORKER_PROCESSES'  # type: str
+NGINX_WORKER_CONNECTIONS_ENV = 'SAGEMAKER_NGINX_WORKER_CONNECTIONS'  # type: str
+NGINX_KEEPALIVE_TIMEOUT_ENV = 'SAGEMAKER_NGINX_KEEPALIVE_TIMEOUT'  # type: str
+NGINX_UPSTREAM_KEEPALIVE_ENV = 'SAGEMAKER_NGINX_UPSTREAM_KEEPALIVE'  # type: str
+NGINX_PROXY_BUFFERING_ENV = 'SAGEMAKER_NGINX_PROXY_BUFFERING'  # type: str
+RESPONSE_CACHE_SIZE_ENV = 'SAGEMAKER_MODEL_SERVER_CACHE_SIZE'  # type: str
+RESPONSE_CACHE_TTL_ENV = 'SAGEMAKER_MODEL_SERVER_CACHE_TTL'  # type: str
+RESPONSE_CACHE_BACKEND_ENV = 'SAGEMAKER_MODEL_SERVER_CACHE_BACKEND'  # type: str
+MAX_CONCURRENT_REQUESTS_ENV = 'SAGEMAKER_MODEL_SERVER_MAX_CONCURRENT_REQUESTS'  # type: str
+MAX_QUEUED_REQUESTS_ENV = 'SAGEMAKER_MODEL_SERVER_MAX_QUEUED_REQUESTS'  # type: str
+RETRY_AFTER_ENV = 'SAGEMAKER_MODEL_SERVER_RETRY_AFTER'  # type: str
+STREAM_REQUESTS_ENV = 'SAGEMAKER_MODEL_SERVER_STREAM_REQUESTS'  # type: str
+MULTI_MODEL_ENV = 'SAGEMAKER_MULTI_MODEL'  # type: str
+MULTI_MODEL_MEMORY_BUDGET_ENV = 'SAGEMAKER_MULTI_MODEL_MEMORY_BUDGET'  # type: str
+MODEL_SERVER_MIN_WORKERS_ENV = 'SAGEMAKER_MODEL_SERVER_MIN_WORKERS'  # type: str
+MODEL_SERVER_MAX_WORKERS_ENV = 'SAGEMAKER_MODEL_SERVER_MAX_WORKERS'  # type: str
+MODEL_SERVER_CPU_AFFINITY_ENV = 'SAGEMAKER_MODEL_SERVER_CPU_AFFINITY'  # type: str
+MODEL_SERVER_RELOAD_INTERVAL_ENV = 'SAGEMAKER_MODEL_SERVER_RELOAD_INTERVAL'  # type: str
+FAST_PING_ENV = 'SAGEMAKER_MODEL_SERVER_FAST_PING'  # type: str
+RESPONSE_COMPRESSION_ENV = 'SAGEMAKER_MODEL_SERVER_RESPONSE_COMPRESSION'  # type: str
+RESPONSE_COMPRESSION_MIN_SIZE_ENV = 'SAGEMAKER_MODEL_SERVER_RESPONSE_COMPRESSION_MIN_SIZE'  # type: str
+MAX_DECOMPRESSED_REQUEST_SIZE_ENV = 'SAGEMAKER_MODEL_SERVER_MAX_DECOMPRESSED_REQUEST_SIZE'  # type: str
+PIPELINE_THREADS_ENV = 'SAGEMAKER_MODEL_SERVER_PIPELINE_THREADS'  # type: str
+IPC_SOCKET_ENV = 'SAGEMAKER_MODEL_SERVER_IPC_SOCKET'  # type: str
+IPC_MAX_PAYLOAD_SIZE_ENV = 'SAGEMAKER_MODEL_SERVER_IPC_MAX_PAYLOAD_SIZE'  # type: str
+RECORD_SPLIT_THREADS_ENV = 'SAGEMAKER_MODEL_SERVER_RECORD_SPLIT_THREADS'  # type: str
+REQUEST_COALESCING_ENV = 'SAGEMAKER_MODEL_SERVER_REQUEST_COALESCING'  # type: str
+PREDICTION_CACHE_DIR_ENV = 'SAGEMAKER_PREDICTION_CACHE_DIR'  # type: str
+PREDICTION_CACHE_SIZE_ENV = 'SAGEMAKER_PREDICTION_CACHE_SIZE'  # type: str
 FRAMEWORK_TRAINING_MODULE_ENV = 'SAGEMAKER_TRAINING_MODULE'  # type: str
 SAGEMAKER_HYPERPARAMETERS = (
     USER_PROGRAM_PARAM, SUBMIT_DIR_PARAM, ENABLE_METRICS_PARAM, REGION_NAME_PARAM, LOG_LEVEL_PARAM, JOB_NAME_PARAM,
@@ -0,0 +1,139 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Pipelined execution of the stages of a request.
+
+Each stage runs in its own threads and the stages are connected by bounded queues, so the stages of
+consecutive requests overlap: request N+1 is decoded by input_fn while request N is predicted, and request N-1
+is encoded by output_fn. A stage blocks when the queue of the next stage is full, which bounds the requests in
+the pipeline and slows down the requests entering it.
+"""
+from __future__ import absolute_import
+
+import collections
+import os
+import sys
+import threading
+
+import six
+from six.moves import queue
+
+# a stage of a Pipeline: fn is called with the value returned by the previous stage, in one of its threads.
+Stage = collections.namedtuple('Stage', ['name', 'fn', 'threads'])
+
+
+class Final(object):
+    """Returned by a stage to end the pipeline of a request early, with value as its result."""
+
+    def __init__(self, value):
+        self.value = value
+
+
+class _Job(object):
+    """A request going through the stages of a pipeline."""
+
+    def __init__(self, value):
+        self.value = value
+        self.exc_info = None
+        self.done = threading.Event()
+
+    def result(self):
+        self.done.wait()
+
+        if self.exc_info:
+            six.reraise(*self.exc_info)
+        return self.value
+
+
+class Pipeline(object):
+    """Runs values through a sequence of stages, each stage in its own threads.
+
+    Under the gevent worker used by sagemaker_containers._server, the threading primitives are monkey-patched by
+    gunicorn and the stages run as greenlets, so they only overlap while a stage waits for I/O. The gthread
+    worker class runs the stages in threads, which overlap while the stages release the GIL.
+
+    Examples:
+    >>>pipeline = Pipeline([Stage('decode', decode, 2), Stage('predict', predict, 1), Stage('encode', encode, 2)])
+    >>>result = pipeline.run(content)
+    """
+
+    def __init__(self, stages, queue_size):
+        """
+        Args:
+            stages (list[Stage]): the stages, in order.
+            queue_size (int): maximum number of values waiting for each stage.
+        """
+        self.stages = stages
+        self.queue_size = queue_size
+        self._queues = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def run(self, value):  # type: (object) -> object
+        """Run a value through all the stages and wait for the result.
+
+        Args:
+            value (obj): the value passed to the first stage.
+
+        Returns:
+            (obj): the value returned by the last stage, or by the stage that returned a Final.
+        """
+        self._start()
+
+        job = _Job(value)
+        self._queues[0].put(job)
+        return job.result()
+
+    def _start(self):
+        # the queues and the threads are created lazily, in the worker process, after gunicorn forks and the
+        # gevent worker monkey-patches the threading primitives.
+        if self._pid == os.getpid():
+            return
+
+        threads = []
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queues = [queue.Queue(self.queue_size) for _ in self.stages]
+                self._pid = os.getpid()
+
+                for index, stage in enumerate(self.stages):
+                    for _ in range(stage.threads):
+                        thread = threading.Thread(target=self._work, args=(index,), name='pipeline-%s' % stage.name)
+                        thread.daemon = True
+                        threads.append(thread)
+
+        for thread in threads:
+            thread.start()
+
+    def _work(self, index):  # type: (int) -> None
+        fn = self.stages[index].fn
+        is_last = index == len(self.stages) - 1
+
+        while True:
+            job = self._queues[index].get()
+
+            try:
+                value = fn(job.value)
+            except Exception:
+                job.exc_info = sys.exc_info()
+                job.done.set()
+                continue
+
+            if isinstance(value, Final):
+                job.value = value.value
+                job.done.set()
+            elif is_last:
+                job.value = value
+                job.done.set()
+            else:
+                job.value = value
+                self._queues[index + 1].put(job)
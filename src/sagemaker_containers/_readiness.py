@@ -0,0 +1,138 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Readiness of the model server workers.
+
+sagemaker_containers._server.start creates a state directory, shared by the server and all its workers, and
+exports its location in the environment variable SAGEMAKER_SERVER_STATE_DIR. Each worker records itself in the
+state directory once it is initialized and warmed up. When all the workers are ready, the file 'ready' is
+created and the container starts reporting itself as healthy. The gunicorn master removes the workers that
+exit, see sagemaker_containers._gunicorn.child_exit, and the file 'ready' is removed when no ready worker is
+left running.
+
+When ServingEnv.fast_ping is True, /ping is answered from the 'ready' file without entering a worker by nginx.
+When nginx is not used, the workers still answer /ping.
+"""
+from __future__ import absolute_import
+
+import errno
+import os
+
+from sagemaker_containers import _files, _params
+
+WORKERS_DIR = 'workers'  # type: str
+READY_FILE = 'ready'  # type: str
+
+
+def state_dir():  # type: () -> str
+    """Returns:
+        (str): the state directory of the model server, or None when the worker is not running under
+            sagemaker_containers._server."""
+    return os.environ.get(_params.SERVER_STATE_DIR_ENV)
+
+
+def mark_ready(workers):  # type: (int) -> None
+    """Record that the current worker process is ready to receive requests. The container becomes ready when
+    the number of ready workers reaches workers.
+
+    Args:
+        workers (int): number of workers expected to be ready.
+    """
+    path = state_dir()
+    if not path:
+        return
+
+    workers_dir = os.path.join(path, WORKERS_DIR)
+    try:
+        os.makedirs(workers_dir)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+    _files.write_file(os.path.join(workers_dir, str(os.getpid())), '')
+
+    if len(ready_workers()) >= workers:
+        _files.write_file(os.path.join(path, READY_FILE), '')
+
+
+def remove_worker(pid):  # type: (int) -> None
+    """Forget a worker that exited. The container reports itself as unhealthy when no ready worker is left.
+
+    Args:
+        pid (int): pid of the worker.
+    """
+    path = state_dir()
+    if not path:
+        return
+
+    _remove(os.path.join(path, WORKERS_DIR, str(pid)))
+    if not ready_workers():
+        _remove(os.path.join(path, READY_FILE))
+
+
+def reset():  # type: () -> None
+    """Forget the ready workers, e.g. when the gunicorn master is restarted with new workers. The container
+    reports itself as unhealthy until the new workers are ready."""
+    path = state_dir()
+    if not path:
+        return
+
+    _remove(os.path.join(path, READY_FILE))
+    for name in _worker_names(path):
+        _remove(os.path.join(path, WORKERS_DIR, name))
+
+
+def ready_file():  # type: () -> str
+    """Returns:
+        (str): the file created when all the workers are ready, or None when the worker is not running under
+            sagemaker_containers._server."""
+    path = state_dir()
+    return os.path.join(path, READY_FILE) if path else None
+
+
+def is_ready():  # type: () -> bool
+    """Returns:
+        (bool): whether all the workers are ready. Always True when the worker is not running under
+            sagemaker_containers._server."""
+    path = ready_file()
+    return path is None or os.path.exists(path)
+
+
+def ready_workers():  # type: () -> set
+    """Returns:
+        (set[int]): the pids of the running workers that are ready."""
+    path = state_dir()
+    if not path:
+        return set()
+    return {int(name) for name in _worker_names(path) if name.isdigit() and _alive(int(name))}
+
+
+def _worker_names(path):  # type: (str) -> list
+    workers_dir = os.path.join(path, WORKERS_DIR)
+    return os.listdir(workers_dir) if os.path.isdir(workers_dir) else []
+
+
+def _alive(pid):  # type: (int) -> bool
+    # a worker killed before the gunicorn master removed it.
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+def _remove(path):  # type: (str) -> None
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
@@ -0,0 +1,148 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Splitting of batch transform input files into records.
+
+The split types are the ones of the SageMaker batch transform SplitType: None, Line and RecordIO.
+"""
+from __future__ import absolute_import
+
+import io
+import struct
+
+NONE = 'None'  # type: str
+LINE = 'Line'  # type: str
+RECORDIO = 'RecordIO'  # type: str
+
+SPLIT_TYPES = (NONE, LINE, RECORDIO)
+
+# MXNet RecordIO: each record part is preceded by a magic number and a header containing its continuation flag
+# and length, and is padded to a multiple of 4 bytes.
+RECORDIO_MAGIC = 0xced7230a  # type: int
+
+_RECORDIO_HEADER = struct.Struct('<II')
+_RECORDIO_LENGTH_MASK = (1 << 29) - 1
+
+
+def split(data, split_type):  # type: (bytes, str) -> list
+    """Split the content of a file into records.
+
+    Args:
+        data (bytes): the content of the file.
+        split_type (str): one of SPLIT_TYPES. None returns the whole content as a single record, Line returns
+            its non-empty lines, without line terminators, and RecordIO returns the payloads of its records.
+
+    Returns:
+        (list[bytes]): the records.
+    """
+    if split_type == NONE:
+        return [data] if data else []
+
+    if split_type == LINE:
+        return [line for line in data.splitlines() if line.strip()]
+
+    if split_type == RECORDIO:
+        return list(recordio_records(data))
+
+    raise ValueError('Invalid split type %s. Valid split types are: %s' % (split_type, ', '.join(SPLIT_TYPES)))
+
+
+def read(f, split_type):  # type: (file, str) -> generator
+    """Read the records of a file incrementally, so only the current record is held in memory.
+
+    Args:
+        f (file): the file, opened in binary mode.
+        split_type (str): one of SPLIT_TYPES. The records are the same as the ones returned by split, except that
+            Line does not split on a carriage return alone.
+
+    Returns:
+        (generator[bytes]): the records.
+    """
+    if split_type == NONE:
+        data = f.read()
+        if data:
+            yield data
+    elif split_type == LINE:
+        for line in f:
+            line = line.rstrip(b'\r\n')
+            if line.strip():
+                yield line
+    elif split_type == RECORDIO:
+        for record in recordio_read(f):
+            yield record
+    else:
+        raise ValueError('Invalid split type %s. Valid split types are: %s' % (split_type, ', '.join(SPLIT_TYPES)))
+
+
+def recordio_records(data):  # type: (bytes) -> generator
+    """Yield the payloads of the MXNet RecordIO records in data. See recordio_read.
+
+    Args:
+        data (bytes): RecordIO encoded records.
+
+    Returns:
+        (generator[bytes]): the payloads of the records.
+    """
+    return recordio_read(io.BytesIO(data))
+
+
+def recordio_read(f):  # type: (file) -> generator
+    """Read the payloads of the MXNet RecordIO records of a file, one record at a time. The parts of a record
+    split in several parts are joined with the magic number, as MXNet does.
+
+    Args:
+        f (file): the file, opened in binary mode.
+
+    Returns:
+        (generator[bytes]): the payloads of the records.
+    """
+    offset = 0
+    parts = []
+
+    while True:
+        header = f.read(_RECORDIO_HEADER.size)
+        if not header:
+            break
+        if len(header) < _RECORDIO_HEADER.size:
+            raise ValueError('Truncated RecordIO header at offset %d' % offset)
+
+        magic, header = _RECORDIO_HEADER.unpack(header)
+        if magic != RECORDIO_MAGIC:
+            raise ValueError('Invalid RecordIO magic number at offset %d' % offset)
+
+        flag, length = header >> 29, header & _RECORDIO_LENGTH_MASK
+        # the padding of the last record may be missing.
+        payload = f.read((length + 3) // 4 * 4)
+        if len(payload) < length:
+            raise ValueError('Truncated RecordIO record at offset %d' % offset)
+
+        parts.append(payload[:length])
+        offset += _RECORDIO_HEADER.size + len(payload)
+
+        # flag 0 is a whole record, 1 the first part of a record, 2 a middle part and 3 the last part.
+        if flag in (0, 3):
+            yield struct.pack('<I', RECORDIO_MAGIC).join(parts)
+            parts = []
+
+    if parts:
+        raise ValueError('Truncated RecordIO record at the end of the data')
+
+
+def recordio_encode(records):  # type: (list) -> bytes
+    """Returns:
+        (bytes): the records encoded as MXNet RecordIO, each record in a single part."""
+    encoded = []
+    for record in records:
+        encoded.append(_RECORDIO_HEADER.pack(RECORDIO_MAGIC, len(record)))
+        encoded.append(record)
+        encoded.append(b'\x00' * (-len(record) % 4))
+    return b''.join(encoded)
@@ -0,0 +1,172 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Model hot reload without downtime.
+
+The reloader runs in sagemaker_containers._server, next to the gunicorn master. It reloads the model when the
+server receives SIGHUP or, when ServingEnv.model_server_reload_interval is set, when the files in the model
+directory change.
+
+The workers are replaced one at a time: a new worker is added with the signal TTIN, it loads the new model and
+runs the warmup requests, and once it is ready the oldest worker is removed with the signal TTOU. gunicorn stops
+the old worker gracefully, after its requests in flight are served. At most one worker more than usual is in
+memory during the reload, and /ping keeps reporting the container as ready. The reload succeeds once the old
+workers have exited.
+
+Both the reloader and sagemaker_containers._autoscaler add and remove workers with TTIN and TTOU, so the
+autoscaler is paused during a reload.
+"""
+from __future__ import absolute_import
+
+import os
+import signal
+import threading
+import time
+
+from sagemaker_containers import _autoscaler, _cache, _logging, _readiness
+
+logger = _logging.get_logger()
+
+# maximum time in seconds that a new worker has to load the model and become ready.
+READY_TIMEOUT = 600  # type: int
+
+# maximum time in seconds that the old workers have to serve their requests in flight and exit. gunicorn kills
+# them after its graceful timeout, 30 seconds by default.
+STOP_TIMEOUT = 60  # type: int
+
+_POLL_INTERVAL = .5
+
+
+class Reloader(object):
+    """Reloads the model of the workers of a gunicorn master, one worker at a time."""
+
+    def __init__(self, master_pid, model_dir, interval=0, preload_model=False, autoscaler=None):
+        """
+        Args:
+            master_pid (int): pid of the gunicorn master.
+            model_dir (str): the model directory.
+            interval (int): time in seconds between checks of the files in the model directory. The model is
+                only reloaded on SIGHUP when the value is 0.
+            preload_model (bool): whether the model is preloaded in the gunicorn master. The workers forked by
+                the master inherit its model, so the model cannot be reloaded worker by worker.
+            autoscaler (sagemaker_containers._autoscaler.Autoscaler): the autoscaler of the gunicorn master, paused
+                during the reloads.
+        """
+        self.master_pid = master_pid
+        self.model_dir = model_dir
+        self.interval = interval
+        self.preload_model = preload_model
+        self.autoscaler = autoscaler
+        self.reloads = 0
+        self._requested = threading.Event()
+        self._version = _cache.model_version(model_dir)
+
+    def start(self):  # type: () -> None
+        """Install the SIGHUP handler and start watching the model directory in a daemon thread. Must be called
+        from the main thread."""
+        signal.signal(signal.SIGHUP, lambda signo, frame: self._requested.set())
+
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def reload(self):  # type: () -> bool
+        """Replace every worker by a new one, loading the current model.
+
+        Returns:
+            (bool): whether all the workers were replaced.
+        """
+        if self.preload_model:
+            logger.warning('The model cannot be reloaded when it is preloaded in the gunicorn master. Restart the '
+                           'model server to load the new model.')
+            return False
+
+        if self.autoscaler:
+            self.autoscaler.pause()
+        try:
+            return self._replace_workers()
+        finally:
+            if self.autoscaler:
+                self.autoscaler.resume()
+
+    def _replace_workers(self):  # type: () -> bool
+        old_workers = set(_autoscaler._children(self.master_pid))
+        logger.info('Reloading the model of %d workers.', len(old_workers))
+
+        for i in range(len(old_workers)):
+            ready = _readiness.ready_workers()
+
+            os.kill(self.master_pid, signal.SIGTTIN)
+            if not self._wait_for_new_worker(ready):
+                # the old workers keep serving the previous model, next to the new worker.
+                logger.error('The new worker was not ready after %d seconds. Reload aborted after replacing %d of '
+                             '%d workers.', READY_TIMEOUT, i, len(old_workers))
+                return False
+
+            os.kill(self.master_pid, signal.SIGTTOU)
+
+        running = self._wait_for_old_workers(old_workers)
+        if running:
+            logger.error('Workers %s were still running the previous model %d seconds after being removed.',
+                         ', '.join(str(pid) for pid in sorted(running)), STOP_TIMEOUT)
+            return False
+
+        self.reloads += 1
+        logger.info('Model reloaded.')
+        return True
+
+    def _wait_for_new_worker(self, ready):  # type: (set) -> bool
+        deadline = time.time() + READY_TIMEOUT
+
+        while time.time() < deadline:
+            children = set(_autoscaler._children(self.master_pid))
+            if (_readiness.ready_workers() - ready) & children:
+                return True
+            time.sleep(_POLL_INTERVAL)
+
+        return False
+
+    def _wait_for_old_workers(self, old_workers):  # type: (set) -> set
+        """Returns:
+            (set[int]): the old workers still running after STOP_TIMEOUT seconds."""
+        deadline = time.time() + STOP_TIMEOUT
+
+        running = old_workers & set(_autoscaler._children(self.master_pid))
+        while running and time.time() < deadline:
+            time.sleep(_POLL_INTERVAL)
+            running = old_workers & set(_autoscaler._children(self.master_pid))
+
+        return running
+
+    def _run(self):
+        while True:
+            self._requested.wait(self.interval or None)
+
+            if not self._requested.is_set() and not self._model_changed():
+                continue
+
+            self._requested.clear()
+            self._version = _cache.model_version(self.model_dir)
+            try:
+                self.reload()
+            except Exception:
+                logger.exception('Model reload failed')
+
+    def _model_changed(self):  # type: () -> bool
+        version = _cache.model_version(self.model_dir)
+        if version == self._version:
+            return False
+
+        # the new model may still be copied into the model directory: it is reloaded once its files stop
+        # changing between two checks.
+        time.sleep(self.interval)
+        return _cache.model_version(self.model_dir) == version
@@ -14,59 +14,194 @@ from __future__ import absolute_import
 
 import os
 import signal
-import subprocess
+import tempfile
 
 import pkg_resources
 
 import sagemaker_containers
-from sagemaker_containers import _env
+from sagemaker_containers import (_affinity, _autoscaler, _env, _files, _gunicorn, _ipc, _logging, _memory,
+                                  _params, _readiness, _reloader, _supervisor)
+
+logger = _logging.get_logger()
 
 UNIX_SOCKET_BIND = 'unix:/tmp/gunicorn.sock'
 HTTP_BIND = '0.0.0.0:8080'
 
+NGINX_CONFIG_FILE = '/tmp/nginx.conf'
+NGINX_CONFIG_TEMPLATE = '/etc/nginx.conf.template'
+
+# fits the 5 MB limit of the InvokeEndpoint requests, so nginx does not write their body to a temporary file.
+CLIENT_BODY_BUFFER_SIZE = '6m'
+
+# /ping answered by nginx from the ready file of the state directory, without a gunicorn worker.
+# See ServingEnv.fast_ping.
+NGINX_PING_LOCATION = '''
+    location = /ping {
+      if (-f %s) {
+        return 200;
+      }
+      return 503;
+    }
+'''
+
+# responses compressed by nginx, see ServingEnv.response_compression. The responses already compressed by the
+# worker, e.g. with zstd, are left unchanged.
+NGINX_GZIP = '''
+  gzip on;
+  gzip_min_length %d;
+  gzip_proxied any;
+  gzip_types *;
+  gzip_vary on;
+'''
+
+# nginx does not retry requests, such as POST /invocations, sent on an upstream keepalive connection closed by
+# gunicorn. gunicorn keeps the idle connections open longer than nginx needs them.
+GUNICORN_KEEPALIVE = 3600
+
+# model server worker classes and their gunicorn worker class. See ServingEnv.model_server_worker_class.
+WORKER_CLASSES = {'gevent': 'gevent',
+                  'sync': 'sync',
+                  'gthread': 'gthread',
+                  'asgi': 'uvicorn.workers.UvicornWorker'}
+
+
+def _create_nginx_config(env):  # type: (_env.ServingEnv) -> str
+    """Render the nginx configuration from the serving environment.
+
+    Args:
+        env (ServingEnv): the serving environment.
+
+    Returns:
+        (str): path of the nginx configuration file.
+    """
+    template_file = pkg_resources.resource_filename(sagemaker_containers.__name__, NGINX_CONFIG_TEMPLATE)
+
+    with open(template_file) as f:
+        template = f.read()
+
+    upstream_keepalive = 'keepalive %s;' % env.nginx_upstream_keepalive if env.nginx_upstream_keepalive else ''
+    gzip = NGINX_GZIP % env.response_compression_min_size if env.response_compression else ''
+    ping_location = NGINX_PING_LOCATION % _readiness.ready_file() if env.fast_ping else ''
+
+    config = template % dict(worker_processes=env.nginx_worker_processes,
+                             worker_connections=env.nginx_worker_connections,
+                             keepalive_timeout=env.nginx_keepalive_timeout,
+                             upstream_keepalive=upstream_keepalive,
+                             client_body_buffer_size=CLIENT_BODY_BUFFER_SIZE,
+                             ping_location=ping_location,
+                             gzip=gzip,
+                             proxy_buffering='on' if env.nginx_proxy_buffering else 'off')
+
+    _files.write_file(NGINX_CONFIG_FILE, config)
+    return NGINX_CONFIG_FILE
+
+
+def _set_cpu_affinity_env(workers):  # type: (int) -> None
+    """Set the number of threads of the math libraries loaded by the gunicorn master, before forking the workers,
+    and log the cpus of each worker. See sagemaker_containers._affinity."""
+    cpus = _affinity.available_cpus()
+    shares = _affinity.layout(cpus, workers)
+
+    os.environ.update(_affinity.threads_env(min(len(share) for share in shares)))
+    os.environ[_params.CPU_AFFINITY_WORKERS_ENV] = str(workers)
 
-def _add_sigterm_handler(nginx, gunicorn):
-    def _terminate(signo, frame):
-        if nginx:
-            try:
-                os.kill(nginx.pid, signal.SIGQUIT)
-            except OSError:
-                pass
+    logger.info('CPU affinity: %d cpus split among %d workers: %s', len(cpus), workers,
+                ' '.join(','.join(str(cpu) for cpu in share) for share in shares))
 
-        try:
-            os.kill(gunicorn.pid, signal.SIGTERM)
-        except OSError:
-            pass
 
-    signal.signal(signal.SIGTERM, _terminate)
+def _create_state_dir():  # type: () -> str
+    """Create the directory of the state shared between the server and the workers, e.g. which workers are
+    ready or the shared response cache. See _readiness and _cache.
+
+    Returns:
+        (str): the path of the directory, in shared memory when /dev/shm exists.
+    """
+    shared_memory_dir = _memory.SHARED_MEMORY_DIR if os.path.isdir(_memory.SHARED_MEMORY_DIR) else None
+    path = tempfile.mkdtemp(prefix='sagemaker-server-', dir=shared_memory_dir)
+    # mkdtemp creates the directory readable by its owner only, the nginx workers need to read the ready file.
+    os.chmod(path, 0o755)
+    return path
 
 
 def start(module_app):
     env = _env.ServingEnv()
     gunicorn_bind_address = HTTP_BIND
 
-    nginx = None
+    if env.model_server_worker_class not in WORKER_CLASSES:
+        raise ValueError('Invalid model server worker class %s. Valid worker classes are: %s'
+                         % (env.model_server_worker_class, ', '.join(sorted(WORKER_CLASSES))))
+    if env.model_server_worker_class == 'asgi' and env.max_concurrent_requests > 0:
+        raise ValueError('max_concurrent_requests is not supported by the asgi model server worker class.')
+
+    os.environ[_params.SERVER_STATE_DIR_ENV] = _create_state_dir()
+
+    children = []
 
     if env.use_nginx:
         gunicorn_bind_address = UNIX_SOCKET_BIND
-        nginx_config_file = pkg_resources.resource_filename(sagemaker_containers.__name__,
-                                                            '/etc/nginx.conf')
-        nginx = subprocess.Popen(['nginx', '-c', nginx_config_file])
-
-    gunicorn = subprocess.Popen(['gunicorn',
-                                 '--timeout', str(env.model_server_timeout),
-                                 '-k', 'gevent',
-                                 '-b', gunicorn_bind_address,
-                                 '--worker-connections', str(1000 * env.model_server_workers),
-                                 '-w', str(env.model_server_workers),
-                                 '--log-level', 'info',
-                                 module_app])
-
-    _add_sigterm_handler(nginx, gunicorn)
-
-    # wait for child processes. if either exit, so do we.
-    pids = {c.pid for c in [nginx, gunicorn] if c}
-    while True:
-        pid, _ = os.wait()
-        if pid in pids:
-            break
+        nginx_config_file = _create_nginx_config(env)
+        children.append(_supervisor.Child('nginx', ['nginx', '-c', nginx_config_file], stop_signal=signal.SIGQUIT))
+    elif env.fast_ping:
+        logger.warning('fast_ping ignored: /ping is answered by the workers without nginx.')
+
+    gunicorn_args = ['gunicorn',
+                     '--timeout', str(env.model_server_timeout),
+                     '-k', WORKER_CLASSES[env.model_server_worker_class],
+                     '-b', gunicorn_bind_address]
+
+    if env.model_server_worker_class == 'gevent':
+        gunicorn_args += ['--worker-connections', str(1000 * env.model_server_workers)]
+    elif env.model_server_worker_class == 'gthread':
+        gunicorn_args += ['--threads', str(env.model_server_threads)]
+
+    if env.use_nginx and env.nginx_upstream_keepalive:
+        gunicorn_args += ['--keep-alive', str(GUNICORN_KEEPALIVE)]
+
+    gunicorn_args += ['-w', str(env.model_server_workers),
+                      '--log-level', 'info',
+                      '-c', 'python:%s' % _gunicorn.__name__]
+
+    if env.model_server_cpu_affinity:
+        _set_cpu_affinity_env(env.model_server_workers)
+
+    if env.preload_model:
+        # the application, and the model loaded by its initialize function, are created in the master process
+        # and shared copy-on-write with the forked workers.
+        gunicorn_args.append('--preload')
+
+    pass_fds = ()
+    if env.ipc_socket and not env.preload_model:
+        # the unix socket is created once, and inherited by all the workers, which accept its connections in
+        # turn. It outlives the restarts of gunicorn. See sagemaker_containers._ipc.
+        ipc_socket = _ipc.listen(env.ipc_socket)
+        os.environ[_params.IPC_SOCKET_FD_ENV] = str(ipc_socket.fileno())
+        pass_fds = (ipc_socket.fileno(),)
+
+    gunicorn = _supervisor.Child('gunicorn', gunicorn_args + [module_app], pass_fds=pass_fds)
+    children.append(gunicorn)
+
+    # nginx and gunicorn are restarted when they crash. See sagemaker_containers._supervisor.
+    supervisor = _supervisor.Supervisor(children)
+    supervisor.start()
+
+    autoscaler = None
+    if env.model_server_min_workers != env.model_server_max_workers:
+        concurrency = env.model_server_threads if env.model_server_worker_class == 'gthread' else 1
+        autoscaler = _autoscaler.Autoscaler(gunicorn.pid, env.model_server_workers, env.model_server_min_workers,
+                                            env.model_server_max_workers, concurrency)
+        autoscaler.start()
+
+    reloader = _reloader.Reloader(gunicorn.pid, _env.model_dir, env.model_server_reload_interval,
+                                  env.preload_model, autoscaler)
+    reloader.start()
+
+    def _follow(child):  # type: (_supervisor.Child) -> None
+        # a restarted gunicorn master starts new workers, which load the model again.
+        _readiness.reset()
+        reloader.master_pid = child.pid
+        if autoscaler:
+            autoscaler.follow(child.pid, env.model_server_workers)
+
+    gunicorn.on_start = _follow
+
+    supervisor.run()
@@ -0,0 +1,128 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Parallel transformation of the records of a multi-record request.
+
+A CSV or JSON Lines request holding many records, e.g. a mini-batch sent by batch transform, is split on line
+boundaries into chunks of consecutive records, and the chunks are decoded, predicted and encoded by a pool of
+threads. The encoded chunks are joined in the order of the records, so the response is the same as without
+splitting, as long as input_fn, predict_fn and output_fn handle each record independently of the others. CSV
+requests with quoted fields, which can hold line terminators, are not split.
+
+The threads run in parallel while the functions release the GIL, e.g. in numpy or in the framework runtime.
+Under the gevent worker class the threads are greenlets, which do not run in parallel.
+"""
+from __future__ import absolute_import
+
+from multiprocessing import pool
+import os
+import threading
+
+import six
+from six.moves import http_client
+
+from sagemaker_containers import _content_types, _worker
+
+SPLIT_TYPES = (_content_types.CSV, _content_types.JSONLINES)
+
+# requests are only split in chunks of at least MIN_CHUNK_RECORDS records: smaller chunks spend more time in the
+# threads than in the functions, and a chunk of a single CSV record decodes to an array of a different shape.
+MIN_CHUNK_RECORDS = 64  # type: int
+
+
+class Splitter(object):
+    """Splits the content of multi-record requests into chunks transformed in parallel.
+
+    Examples:
+    >>>splitter = Splitter(transform_fn, threads=4)
+    >>>response = splitter.transform(model, content, 'text/csv', 'text/csv')
+    """
+
+    def __init__(self, transform_fn, threads, min_chunk_records=MIN_CHUNK_RECORDS):
+        """
+        Args:
+            transform_fn (function): transforms a chunk: called with the model, the content, the content type and
+                the accept, returns a Response.
+            threads (int): number of threads, and maximum number of chunks of a request.
+            min_chunk_records (int): minimum number of records in each chunk.
+        """
+        self.transform_fn = transform_fn
+        self.threads = threads
+        self.min_chunk_records = min_chunk_records
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def chunks(self, content, content_type=_content_types.CSV):  # type: (str or bytes, str) -> list
+        """Split content into chunks of consecutive records, one record per line. The chunks are slices of
+        content, joined they are content: empty records are kept, so the chunks hold as many rows as content.
+
+        A quoted CSV field can hold line terminators, so CSV content holding a quote is not split.
+
+        Returns:
+            (list[str or bytes]): the chunks, or a list holding only content if it is too small to be split.
+        """
+        text = isinstance(content, six.text_type)
+        separator, quote = (u'\n', u'"') if text else (b'\n', b'"')
+        if content_type == _content_types.CSV and quote in content:
+            return [content]
+
+        lines = content.split(separator)
+        # each record keeps its line terminator. A final line terminator does not start a new record.
+        records = [line + separator for line in lines[:-1]] + ([lines[-1]] if lines[-1] else [])
+        count = min(self.threads, len(records) // self.min_chunk_records)
+        if count < 2:
+            return [content]
+
+        empty = u'' if text else b''
+        return [empty.join(records[i * len(records) // count:(i + 1) * len(records) // count])
+                for i in range(count)]
+
+    def transform(self, model, content, content_type, accept):  # type: (object, object, str, str) -> _worker.Response
+        """Transform the chunks of content in parallel and join their responses.
+
+        Content that is a stream, or whose content type or accept is not one of SPLIT_TYPES, is transformed in
+        the calling thread.
+
+        Returns:
+            (Response): the joined response, or the response of the first chunk that failed.
+        """
+        if content_type not in SPLIT_TYPES or accept not in SPLIT_TYPES or hasattr(content, 'read'):
+            return self.transform_fn(model, content, content_type, accept)
+
+        chunks = self.chunks(content, content_type)
+        if len(chunks) == 1:
+            return self.transform_fn(model, content, content_type, accept)
+
+        responses = self._threads().map(lambda chunk: self.transform_fn(model, chunk, content_type, accept), chunks)
+
+        for response in responses:
+            if response.status_code != http_client.OK:
+                return response
+
+        return _worker.Response(response=_join([response.get_data() for response in responses]), accept=accept)
+
+    def _threads(self):  # type: () -> pool.ThreadPool
+        # the pool is created lazily, in the worker process, after gunicorn forks and the gevent worker
+        # monkey-patches the threading primitives.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pool = pool.ThreadPool(self.threads)
+                    self._pid = os.getpid()
+        return self._pool
+
+
+def _join(bodies):  # type: (list) -> bytes
+    # each encoded chunk ends with a line terminator, except maybe the last one.
+    return b''.join(body if body.endswith(b'\n') or i == len(bodies) - 1 else body + b'\n'
+                    for i, body in enumerate(bodies))
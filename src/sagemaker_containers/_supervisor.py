@@ -0,0 +1,213 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Supervision of the processes of the model server, nginx and the gunicorn master.
+
+A child that crashes, i.e. exits with an error or is killed by a signal, is restarted on its own, after a
+delay that doubles with each crash in a row: the other children keep running, so an nginx crash does not
+reload the models of the gunicorn workers. A child that crashes MAX_FAILURES times in a row, without running
+for STABLE_UPTIME seconds in between, is considered broken and the model server stops. A child that exits
+without error is stopping on purpose, and the model server stops with it.
+
+SIGTERM and SIGINT stop the children gracefully, and SIGUSR1 is forwarded to all the children, which reopen
+their log files. The number of restarts and the start time of each child are exposed by the /metrics route of
+the workers, see sagemaker_containers._metrics.
+"""
+from __future__ import absolute_import
+
+import errno
+import os
+import signal
+import subprocess
+import time
+
+import six
+
+from sagemaker_containers import _logging, _metrics
+
+logger = _logging.get_logger()
+
+# delay in seconds before restarting a child that crashed, doubled for each crash in a row, up to
+# MAX_RESTART_DELAY.
+RESTART_DELAY = 1  # type: int
+MAX_RESTART_DELAY = 30  # type: int
+
+# a child running for STABLE_UPTIME seconds is considered healthy again: its next crash is restarted after
+# RESTART_DELAY.
+STABLE_UPTIME = 60  # type: int
+MAX_FAILURES = 5  # type: int
+
+STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+FORWARDED_SIGNALS = (signal.SIGUSR1,)
+
+_POLL_INTERVAL = .1
+
+
+class Child(object):
+    """A process supervised by a Supervisor.
+
+    Attributes:
+        process (subprocess.Popen): the current process of the child.
+        restarts (int): number of times the child was restarted.
+        started (float): time when the current process was started.
+        status (int): the exit status of the last process of the child, as returned by os.wait.
+    """
+
+    def __init__(self, name, args, stop_signal=signal.SIGTERM, on_start=None, pass_fds=()):
+        """
+        Args:
+            name (str): name of the child, one of 'nginx' and 'gunicorn', used by the metrics.
+            args (list[str]): the command starting the child.
+            stop_signal (int): the signal stopping the child gracefully.
+            on_start (function): called with the child after its process is started, including restarts.
+            pass_fds (tuple[int]): file descriptors inherited by the child. Python 2 children inherit all the
+                file descriptors.
+        """
+        self.name = name
+        self.args = args
+        self.stop_signal = stop_signal
+        self.on_start = on_start
+        self.pass_fds = pass_fds
+        self.process = None
+        self.restarts = 0
+        self.started = None
+        self.status = None
+        self._failures = 0
+
+    @property
+    def pid(self):  # type: () -> int
+        """Returns:
+            (int): the pid of the current process of the child, or None if it is not started."""
+        return self.process.pid if self.process is not None else None
+
+    def start(self):  # type: () -> None
+        """Start the process of the child."""
+        if self.pass_fds and six.PY3:
+            self.process = subprocess.Popen(self.args, pass_fds=self.pass_fds)
+        else:
+            self.process = subprocess.Popen(self.args)
+        self.started = time.time()
+        _metrics.set_gauge('%s_start_time_seconds' % self.name, self.started)
+
+        if self.on_start:
+            self.on_start(self)
+
+    def signal(self, signo):  # type: (int) -> None
+        """Send a signal to the current process of the child, ignoring a process that already exited."""
+        if not self.pid or self.pid < 0:
+            # os.kill would signal a group of processes.
+            return
+        try:
+            os.kill(self.pid, signo)
+        except OSError:
+            pass
+
+
+class Supervisor(object):
+    """Starts child processes, restarts them when they crash, and forwards them signals."""
+
+    def __init__(self, children):
+        """
+        Args:
+            children (list[Child]): the children, started in order.
+        """
+        self.children = children
+        self._running = {}
+        self._stopping = False
+
+    def start(self):  # type: () -> None
+        """Start the children and install the signal handlers. Must be called from the main thread."""
+        for child in self.children:
+            child.start()
+            self._running[child.pid] = child
+
+        for signo in STOP_SIGNALS:
+            signal.signal(signo, lambda signo, frame: self.stop())
+        for signo in FORWARDED_SIGNALS:
+            signal.signal(signo, lambda signo, frame: self._forward(signo))
+
+    def stop(self):  # type: () -> None
+        """Stop the children gracefully. See run."""
+        self._stopping = True
+
+        for child in list(self._running.values()):
+            child.signal(child.stop_signal)
+
+    def run(self):  # type: () -> None
+        """Supervise the children until they all exit, after stop was called, or after a child exited without
+        error or crashed MAX_FAILURES times in a row."""
+        while self._running:
+            pid, status = _wait()
+
+            child = self._running.pop(pid, None)
+            if child is None:
+                continue
+
+            child.status = status
+            if self._stopping:
+                continue
+
+            if status == 0:
+                logger.info('%s exited. Stopping the model server.', child.name)
+                self.stop()
+            elif not self._restart(child, status):
+                self.stop()
+
+    def _restart(self, child, status):  # type: (Child, int) -> bool
+        if time.time() - child.started >= STABLE_UPTIME:
+            child._failures = 0
+        child._failures += 1
+
+        if child._failures >= MAX_FAILURES:
+            logger.error('%s crashed %d times in a row (%s). Stopping the model server.', child.name,
+                         child._failures, _describe(status))
+            return False
+
+        delay = min(RESTART_DELAY * 2 ** (child._failures - 1), MAX_RESTART_DELAY)
+        logger.warning('%s crashed (%s). Restarting it in %s seconds.', child.name, _describe(status), delay)
+
+        if not self._sleep(delay):
+            return True
+
+        child.restarts += 1
+        _metrics.increment('%s_restarts' % child.name)
+
+        child.start()
+        self._running[child.pid] = child
+        return True
+
+    def _sleep(self, seconds):  # type: (float) -> bool
+        # sleeps in short steps, so stop interrupts the delay before a restart.
+        deadline = time.time() + seconds
+        while not self._stopping and time.time() < deadline:
+            time.sleep(min(_POLL_INTERVAL, max(deadline - time.time(), 0)))
+        return not self._stopping
+
+    def _forward(self, signo):  # type: (int) -> None
+        for child in list(self._running.values()):
+            child.signal(signo)
+
+
+def _wait():  # type: () -> (int, int)
+    while True:
+        try:
+            return os.wait()
+        except OSError as e:
+            # interrupted by a signal, e.g. SIGHUP, in Python 2.
+            if e.errno != errno.EINTR:
+                raise
+
+
+def _describe(status):  # type: (int) -> str
+    if os.WIFSIGNALED(status):
+        return 'killed by signal %d' % os.WTERMSIG(status)
+    return 'exit status %d' % os.WEXITSTATUS(status)
@@ -14,11 +14,20 @@ from __future__ import absolute_import
 
 import json
 import textwrap
+import threading
 import traceback
 
+import flask
 from six.moves import http_client
 
-from sagemaker_containers import _encoders, _env, _errors, _functions, _worker
+from sagemaker_containers import (_batching, _cache, _encoders, _env, _errors, _functions, _logging, _memory,
+                                  _metrics, _multi_model, _pipeline, _splitting, _worker)
+
+logger = _logging.get_logger()
+
+# maximum number of requests waiting for each stage of the pipeline, per thread of the stage. See
+# ServingEnv.pipeline_threads.
+PIPELINE_QUEUE_SIZE = 2  # type: int
 
 
 def default_model_fn(model_dir):
@@ -48,6 +57,9 @@ def default_input_fn(input_data, content_type):
 
         The input_fn is responsible to take the request data and pre-process it before prediction.
 
+        When ServingEnv.stream_requests is True, input_data is a file-like stream of the request body, which is
+        decoded incrementally for CSV and JSON Lines.
+
     Args:
         input_data (obj): the request data.
         content_type (str): the request Content-Type.
@@ -55,6 +67,8 @@ def default_input_fn(input_data, content_type):
     Returns:
         (obj): data ready for prediction.
     """
+    if hasattr(input_data, 'read'):
+        return _encoders.decode_stream(input_data, content_type)
     return _encoders.decode(input_data, content_type)
 
 
@@ -77,6 +91,9 @@ def default_predict_fn(data, model):
 def default_output_fn(prediction, accept):
     """Function responsible to serialize the prediction for the response.
 
+    When predict_fn returns an iterator, for example a generator yielding the prediction in batches, the
+    response is streamed: each batch is serialized and sent to the client as soon as it is available.
+
     Args:
         prediction (obj): prediction returned by predict_fn .
         accept (str): accept content-type expected by the client.
@@ -88,6 +105,8 @@ def default_output_fn(prediction, accept):
                 response: the serialized data to return
                 accept: the content-type that the data was transformed to.
     """
+    if _encoders._is_iterator(prediction):
+        return _worker.Response(_encoders.encode_chunks(prediction, accept), accept)
     return _worker.Response(_encoders.encode(prediction, accept), accept)
 
 
@@ -115,10 +134,35 @@ class Transformer(object):
     """
 
     def __init__(self, model_fn=None, input_fn=None, predict_fn=None, output_fn=None,
-                 transform_fn=None, error_class=_errors.ClientError):
+                 transform_fn=None, error_class=_errors.ClientError, thread_safe=True):
         """Default constructor. Wraps the any non default framework function in an error class to isolate
         framework from user errors.
 
+        When ServingEnv.max_batch_size is greater than 1, concurrent calls to predict_fn are merged in
+        batches. See sagemaker_containers._batching.Batcher.
+
+        When ServingEnv.response_cache_size is greater than 0, successful responses are cached and returned
+        without calling transform_fn for requests with the same content, content type, accept and model
+        version. See sagemaker_containers._cache.
+
+        When ServingEnv.request_coalescing is True, a request identical to a request in flight waits for its
+        response instead of calling transform_fn again. See sagemaker_containers._cache.SingleFlight.
+
+        When ServingEnv.stream_requests is True, input_fn, or transform_fn, receives a file-like stream of the
+        request body instead of its content.
+
+        When ServingEnv.multi_model is True, each request invokes the model named by Request.target_model,
+        loaded by model_fn from its subdirectory of the model directory. See sagemaker_containers._multi_model.
+
+        When ServingEnv.pipeline_threads is greater than 0, input_fn, predict_fn and output_fn run in the
+        stages of a pipeline, so the requests of a worker are decoded and encoded while the model predicts other
+        requests. See sagemaker_containers._pipeline. The pipeline is not used with transform_fn, or when the
+        functions are not thread safe.
+
+        When ServingEnv.record_split_threads is greater than 1, CSV and JSON Lines requests holding many records
+        are split in chunks transformed in parallel, see sagemaker_containers._splitting. Requests are not split
+        with transform_fn, or when the functions are not thread safe.
+
         Args:
             model_fn (fn): Function responsible to load the model.
             input_fn (fn): Takes request data and de-serializes the data into an object for prediction.
@@ -128,6 +172,9 @@ class Transformer(object):
                 as a serialized response. This function takes the place of ``input_fn``,
                 ``predict_fn``, and ``output_fn``.
             error_class (Exception): Error class used to separate framework and user errors.
+            thread_safe (bool): Whether the functions above are safe to call from several threads at the same
+                time. When False and the model server uses the gthread worker class, requests are transformed
+                one at a time in each worker process. The threads of a process always share a single model.
         """
         self._model = None
         self._model_fn = _functions.error_wrapper(model_fn, error_class) if model_fn else default_model_fn
@@ -144,6 +191,78 @@ class Transformer(object):
         self._predict_fn = _functions.error_wrapper(predict_fn, error_class) if predict_fn else default_predict_fn
         self._output_fn = _functions.error_wrapper(output_fn, error_class) if output_fn else default_output_fn
         self._error_class = error_class
+        self._thread_safe = thread_safe
+
+        if _worker.env.max_batch_size > 1:
+            batcher = _batching.Batcher(self._predict_fn, _worker.env.max_batch_size, _worker.env.max_batch_delay)
+            self._predict_fn = batcher.predict
+
+        # the request stream cannot be hashed without reading it.
+        self._cache = None if _worker.env.stream_requests else _cache.response_cache(_worker.env)
+        self._model_version = None
+
+        self._pipeline = None
+        self._models = None
+        self._single_flight = None
+        self._wrap_transform_fn(transform_fn is None)
+
+    def _wrap_transform_fn(self, default_transform_fn):  # type: (bool) -> None
+        """Wrap transform_fn with the request handling configured by ServingEnv: synchronization, pipeline,
+        splitting, multi-model serving and request coalescing.
+
+        Args:
+            default_transform_fn (bool): whether transform_fn is the default implementation, calling input_fn,
+                predict_fn and output_fn.
+        """
+        if not self._thread_safe and _worker.env.model_server_worker_class == 'gthread':
+            self._transform_fn = _synchronized(self._transform_fn)
+
+        if _worker.env.pipeline_threads > 0 and default_transform_fn:
+            if self._thread_safe:
+                self._pipeline = self._create_pipeline(_worker.env.pipeline_threads)
+                self._transform_fn = self._pipelined_transform_fn
+            else:
+                logger.warning('Requests are not pipelined: the transformer functions are not thread safe.')
+
+        if _worker.env.record_split_threads > 1 and default_transform_fn:
+            if self._thread_safe:
+                splitter = _splitting.Splitter(_responding(self._transform_fn), _worker.env.record_split_threads)
+                self._transform_fn = splitter.transform
+            else:
+                logger.warning('Requests are not split: the transformer functions are not thread safe.')
+
+        if _worker.env.multi_model:
+            self._models = _multi_model.ModelCache(self._model_fn, _env.model_dir,
+                                                   _worker.env.multi_model_memory_budget)
+
+        if _worker.env.request_coalescing and not _worker.env.stream_requests:
+            self._single_flight = _cache.SingleFlight()
+
+    @property
+    def thread_safe(self):  # type: () -> bool
+        """Returns:
+            bool: whether the transformer functions are safe to call from several threads at the same time."""
+        return self._thread_safe
+
+    @property
+    def cache(self):  # type: () -> object
+        """Returns:
+            (MemoryCache or SharedCache): the response cache, or None if responses are not cached. Its hits and
+                misses attributes count the requests answered from the cache and the ones that were not."""
+        return self._cache
+
+    @property
+    def single_flight(self):  # type: () -> _cache.SingleFlight
+        """Returns:
+            (SingleFlight): the coalescing of identical requests in flight, or None if it is disabled. Its
+                deduplicated attribute counts the requests answered with the response of another request."""
+        return self._single_flight
+
+    @property
+    def models(self):  # type: () -> _multi_model.ModelCache
+        """Returns:
+            (ModelCache): the models loaded in multi-model mode, or None if multi-model mode is disabled."""
+        return self._models
 
     def initialize(self):  # type: () -> None
         """Execute any initialization necessary to start making predictions with the Transformer.
@@ -151,11 +270,23 @@ class Transformer(object):
         This function is called by sagemaker_containers.beta.framework.worker.Worker,
         before starting the Flask application.
         The gunicorn server forks multiple workers, executing multiple Flask applications in parallel.
-        This function will be called once per each worker.
+        This function will be called once per each worker, or once in the gunicorn master when
+        ServingEnv.preload_model is True. All the threads of a gthread worker share the loaded model.
         It does not have return type or arguments.
+        The memory of the process shared with other workers, for example arrays created with
+        sagemaker_containers.beta.framework.memory.shared_array, and private to it is logged after loading the model.
+        In multi-model mode, see ServingEnv.multi_model, the models are loaded by transform, the first time they
+        are invoked, and initialize does nothing.
         """
+        if self._models is not None:
+            return
+
         self._model = self._model_fn(_env.model_dir)
 
+        usage = _memory.usage()
+        logger.info('Model loaded. Shared memory: %d MB, private memory: %d MB',
+                    usage.shared // _memory.MB, usage.private // _memory.MB)
+
     def transform(self):  # type: () -> _worker.Response
         """Take a request with input data, deserialize it, make a prediction, and return a
         serialized response.
@@ -166,15 +297,106 @@ class Transformer(object):
 
                 * response: the serialized data to return
                 * accept: the content type that the data was serialized into
+
+            The response is streamed with chunked transfer encoding when output_fn or transform_fn return a
+            generator or iterator of serialized chunks, or a Response wrapping one. An error raised while
+            iterating happens after the status code was sent, so it interrupts the response.
         """
         request = _worker.Request()
-        result = self._transform_fn(self._model, request.content, request.content_type, request.accept)
 
-        if isinstance(result, tuple):
-            # transforms tuple in Response for backwards compatibility
-            return _worker.Response(response=result[0], accept=result[1])
+        if _worker.env.stream_requests:
+            content = request.stream
+        else:
+            with _metrics.timer('read'):
+                content = request.content
 
-        return result
+        return self.transform_content(content, request.content_type, request.accept, request.target_model)
+
+    def transform_content(self, content, content_type, accept, target_model=None):
+        # type: (object, str, str, str) -> _worker.Response
+        """Deserialize the data, make a prediction, and return a serialized response, without a request.
+        Used by transform, and by sagemaker_containers._batch_transform to transform records offline.
+
+        Args:
+            content (obj): the data, as returned by Request.content, or a file-like stream of the data when
+                ServingEnv.stream_requests is True.
+            content_type (str): the content type of the data.
+            accept (str): the content type to serialize the prediction into.
+            target_model (str): the model to invoke in multi-model mode.
+
+        Returns:
+            sagemaker_containers.beta.framework.worker.Response: a Flask response object. See transform.
+        """
+        if self._models is None:
+            model = self._model
+        else:
+            try:
+                model = self._models.get(target_model)
+            except _multi_model.ModelNotFoundError as e:
+                return self._error_response(e, http_client.NOT_FOUND)
+
+        if self._cache is None and self._single_flight is None:
+            return self._transform(model, content, content_type, accept)
+
+        key = self._cache_key(content, content_type, accept, target_model)
+
+        if self._cache is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                _metrics.increment('cache_hits')
+                return _cached_response(cached)
+
+            _metrics.increment('cache_misses')
+
+        if self._single_flight is None:
+            return self._transform_and_cache(key, model, content, content_type, accept)
+
+        return self._coalesced_transform(key, model, content, content_type, accept)
+
+    def _transform(self, model, content, content_type, accept):
+        with _metrics.timer('transform'):
+            result = self._transform_fn(model, content, content_type, accept)
+
+        return _response(result, accept)
+
+    def _transform_and_cache(self, key, model, content, content_type, accept):
+        response = self._transform(model, content, content_type, accept)
+        if self._cache is not None:
+            self._cache_response(key, response)
+        return response
+
+    def _coalesced_transform(self, key, model, content, content_type, accept):
+        # the requests waiting for the request in flight receive copies of its response, taken before the worker
+        # sends, or compresses, it.
+        (response, frozen), shared = self._single_flight.do(
+            key, lambda: _frozen(self._transform_and_cache(key, model, content, content_type, accept)))
+
+        if not shared:
+            return response
+
+        if frozen is None:
+            # a streamed response is consumed once.
+            return self._transform_and_cache(key, model, content, content_type, accept)
+
+        _metrics.increment('requests_coalesced')
+        return _cached_response(frozen)
+
+    def _cache_key(self, content, content_type, accept, target_model=None):  # type: (object, str, str, str) -> str
+        if self._model_version is None:
+            self._model_version = _cache.model_version(_env.model_dir)
+
+        return _cache.key(self._model_version, target_model or '', content_type, accept, content)
+
+    def _cache_response(self, key, response):  # type: (str, flask.Response) -> None
+        # streamed responses are consumed once, and errors are not cached.
+        if response.status_code != http_client.OK or response.is_streamed:
+            return
+
+        _, frozen = _frozen(response)
+        body, _, headers = frozen
+        size = len(body) + sum(len(name) + len(value) for name, value in headers)
+
+        self._cache.put(key, frozen, size)
 
     def _default_transform_fn(self, model, content, content_type, accept):
         """Make predictions against the model and return a serialized response.
@@ -188,21 +410,105 @@ class Transformer(object):
                 a tuple of the form (response_data, content_type)
         """
         try:
-            data = self._input_fn(content, content_type)
+            with _metrics.timer('input'):
+                data = self._input_fn(content, content_type)
         except _errors.UnsupportedFormatError as e:
             return self._error_response(e, http_client.UNSUPPORTED_MEDIA_TYPE)
 
-        prediction = self._predict_fn(data, model)
+        with _metrics.timer('predict'):
+            prediction = self._predict_fn(data, model)
 
         try:
-            result = self._output_fn(prediction, accept)
+            with _metrics.timer('output'):
+                result = self._output_fn(prediction, accept)
         except _errors.UnsupportedFormatError as e:
             return self._error_response(e, http_client.NOT_ACCEPTABLE)
 
         return result
 
+    def _create_pipeline(self, threads):  # type: (int) -> _pipeline.Pipeline
+        # predict_fn runs in a single thread, so the model is never called concurrently. With batching, the
+        # predict stage has a thread per request of a batch, waiting for the thread of the Batcher.
+        predict_threads = max(_worker.env.max_batch_size, 1)
+        stages = [_pipeline.Stage('input', self._decode, threads),
+                  _pipeline.Stage('predict', self._predict, predict_threads),
+                  _pipeline.Stage('output', self._encode, threads)]
+        return _pipeline.Pipeline(stages, queue_size=PIPELINE_QUEUE_SIZE * threads)
+
+    def _pipelined_transform_fn(self, model, content, content_type, accept):
+        """Same as _default_transform_fn, running each function in a stage of the pipeline."""
+        return self._pipeline.run((model, content, content_type, accept))
+
+    def _decode(self, request):  # type: (tuple) -> object
+        model, content, content_type, accept = request
+        try:
+            with _metrics.timer('input'):
+                return model, self._input_fn(content, content_type), accept
+        except _errors.UnsupportedFormatError as e:
+            return _pipeline.Final(self._error_response(e, http_client.UNSUPPORTED_MEDIA_TYPE))
+
+    def _predict(self, request):  # type: (tuple) -> object
+        model, data, accept = request
+        with _metrics.timer('predict'):
+            return self._predict_fn(data, model), accept
+
+    def _encode(self, request):  # type: (tuple) -> object
+        prediction, accept = request
+        try:
+            with _metrics.timer('output'):
+                return self._output_fn(prediction, accept)
+        except _errors.UnsupportedFormatError as e:
+            return self._error_response(e, http_client.NOT_ACCEPTABLE)
+
     def _error_response(self, error, status_code):
         body = json.dumps({'error': error.__class__.__name__,
                            'error-message': str(error),
                            'stack-trace': traceback.format_exc()})
         return _worker.Response(response=body, status=status_code)
+
+
+def _response(result, accept):  # type: (object, str) -> _worker.Response
+    """Convert the result of transform_fn into a Response."""
+    if isinstance(result, tuple):
+        # transforms tuple in Response for backwards compatibility
+        return _worker.Response(response=result[0], accept=result[1])
+
+    if _encoders._is_iterator(result):
+        # a generator or iterator of serialized chunks, streamed to the client.
+        return _worker.Response(response=result, accept=accept)
+
+    return result
+
+
+def _responding(transform_fn):  # type: (function) -> function
+    """Wraps transform_fn so it always returns a Response."""
+
+    def wrapper(model, content, content_type, accept):
+        return _response(transform_fn(model, content, content_type, accept), accept)
+
+    return wrapper
+
+
+def _frozen(response):  # type: (flask.Response) -> (flask.Response, tuple)
+    """Returns:
+        (flask.Response, tuple): the response, and its body, status code and headers, or None if the response is
+            streamed."""
+    if response.is_streamed:
+        return response, None
+    return response, (response.get_data(), response.status_code, list(response.headers))
+
+
+def _cached_response(cached):  # type: (tuple) -> flask.Response
+    body, status, headers = cached
+    return flask.Response(response=body, status=status, headers=headers)
+
+
+def _synchronized(fn):  # type: (function) -> function
+    """Wraps function fn in a lock, so it is never executed by more than one thread at the same time."""
+    lock = threading.Lock()
+
+    def wrapper(*args, **kwargs):
+        with lock:
+            return fn(*args, **kwargs)
+
+    return wrapper
@@ -12,13 +12,27 @@
 # language governing permissions and limitations under the License.
 from __future__ import absolute_import
 
+import glob
+import json
+import os
+import time
+
 import flask
 from six.moves import http_client
+from werkzeug import utils, wsgi
 
-from sagemaker_containers import _content_types, _env, _logging, _mapping
+from sagemaker_containers import (_admission, _compression, _content_types, _env, _ipc, _logging, _mapping,
+                                  _memory, _metrics, _readiness)
 
 env = _env.ServingEnv()
 
+logger = _logging.get_logger()
+
+TARGET_MODEL_HEADER = 'X-Amzn-SageMaker-Target-Model'  # type: str
+
+WARMUP_FILE = 'warmup'  # type: str
+_WARMUP_CONTENT_TYPES = {'.json': _content_types.JSON, '.csv': _content_types.CSV, '.npy': _content_types.NPY}
+
 
 def default_healthcheck_fn():  # type: () -> Response
     """Ping is default health-check handler. Returns 200 with no content.
@@ -35,15 +49,30 @@ def default_healthcheck_fn():  # type: () -> Response
     While the minimum bar is for the container to return a static 200, a container developer can use this functionality
     to perform deeper checks. The request timeout on /ping attempts is 2 seconds.
 
+    Under sagemaker_containers._server, the container is reported as healthy only after every worker has been
+    initialized and warmed up. Until then, the status code 503 is returned.
+
     More information on how health-check works can be found here:
     https://docs.aws.amazon.com/sagemaker/latest/dg/your-algorithms-inference-code.html#your-algorithms-inference-algo-ping-requests
 
     Returns:
-        (flask.Response): with status code 200
+        (flask.Response): with status code 200, or 503 while the workers are not ready.
     """
+    if not _readiness.is_ready():
+        return Response(status=http_client.SERVICE_UNAVAILABLE)
     return Response(status=http_client.OK)
 
 
+def default_metrics_fn():  # type: () -> Response
+    """Returns the latency histograms of the /invocations request stages and the counters of the model server,
+    aggregated across all the workers, in the Prometheus text format. See sagemaker_containers._metrics.
+
+    Returns:
+        (flask.Response): with status code 200 and the metrics.
+    """
+    return Response(response=_metrics.prometheus(), accept=_metrics.CONTENT_TYPE)
+
+
 class Worker(flask.Flask):
     """Flask application that receives predictions from a Transformer ready for inferences."""
 
@@ -57,8 +86,11 @@ class Worker(flask.Flask):
                     `sagemaker_containers.transformers.TransformSpec`: named tuple with prediction data.
 
 
-            initialize_fn (function, optional): this function is called when the Flask application starts.
-                It doest not have return type or arguments.
+            initialize_fn (function, optional): this function is called when the Flask application is created,
+                i.e. when the gunicorn worker boots, before the sample requests are replayed by warmup.
+                It doest not have return type or arguments. When ServingEnv.preload_model is True, the
+                application is created in the gunicorn master process and the model is shared copy-on-write
+                with the workers.
 
             healthcheck_fn (function, optional): function that will be used for healthcheck calls when the containers
                 starts, if not specified, it will use ping as the default healthcheck call. Signature:
@@ -68,6 +100,21 @@ class Worker(flask.Flask):
 
             module_name (str): the module name which implements the worker. If not specified, it will use
                                     sagemaker_containers.ServingEnv().module_name as the default module name.
+
+        When ServingEnv.max_concurrent_requests is set, /invocations requests beyond the limit wait in a bounded
+        queue, and requests beyond the queue are rejected immediately with the status code 503 and a Retry-After
+        header. See sagemaker_containers._admission.AdmissionController.
+
+        The route /metrics returns the latency of the /invocations request stages, and the number of requests in
+        flight, in the Prometheus text format.
+
+        When ServingEnv.multi_model is True, the route /models/<model name>/invoke invokes the named model.
+
+        Request bodies compressed with gzip or zstd are decompressed while they are read. When
+        ServingEnv.response_compression is True, the responses are compressed, see compress.
+
+        When ServingEnv.ipc_socket is set and transform_fn is the method transform of a Transformer, the worker
+        also receives invocations on the unix socket, see sagemaker_containers._ipc.
         """
         super(Worker, self).__init__(module_name or env.module_name)
 
@@ -75,14 +122,204 @@ class Worker(flask.Flask):
         # configure logging at import time.
         _logging.configure_logger(env.log_level)
 
-        if initialize_fn:
-            self.before_first_request(initialize_fn)
+        transformer = getattr(transform_fn, '__self__', None)
+
+        if env.response_compression:
+            transform_fn = _compressed(transform_fn)
+
+        transform_fn = _timed(transform_fn)
+
+        if env.max_concurrent_requests > 0:
+            self.admission = _admission.AdmissionController(env.max_concurrent_requests, env.max_queued_requests)
+            transform_fn = _admitted(transform_fn, self.admission)
+        else:
+            self.admission = None
+
+        transform_fn = _counted(transform_fn)
 
         self.add_url_rule(rule='/invocations', endpoint='invocations', view_func=transform_fn, methods=["POST"])
+
+        if env.multi_model:
+            self.add_url_rule(rule='/models/<model_name>/invoke', endpoint='invoke',
+                              view_func=lambda model_name: transform_fn(), methods=["POST"])
         self.add_url_rule(rule='/ping', endpoint='ping', view_func=healthcheck_fn or default_healthcheck_fn)
+        self.add_url_rule(rule='/metrics', endpoint='metrics', view_func=default_metrics_fn)
 
         self.request_class = Request
 
+        if initialize_fn:
+            if env.preload_model:
+                _preload(initialize_fn)
+            else:
+                initialize_fn()
+
+        self.warmup()
+
+        if env.ipc_socket:
+            _serve_ipc(transformer, self.admission)
+
+        # in preload mode, the application is created in the gunicorn master, and every worker forked by gunicorn
+        # inherits it initialized and warmed up: each worker is marked ready by _gunicorn.post_worker_init.
+        if not env.preload_model:
+            _readiness.mark_ready(env.model_server_workers)
+
+    def warmup(self):  # type: () -> None
+        """Replay sample requests through /invocations, so lazy framework initialization and JIT compilation
+        happen before the worker receives real requests.
+
+        The sample requests are read from the files warmup.json, warmup.csv and warmup.npy in the model
+        directory. Each file is sent with its content type as both Content-Type and Accept.
+        """
+        with self.test_client() as client:
+            for path, data, content_type in warmup_requests():
+                response = client.post('/invocations', data=data, content_type=content_type,
+                                       headers={'Accept': content_type})
+
+                if response.status_code != http_client.OK:
+                    logger.warning('Warmup request %s failed with status code %s: %s', path, response.status_code,
+                                   response.get_data(as_text=True))
+                else:
+                    logger.info('Warmup request %s completed.', path)
+
+
+def warmup_requests():  # type: () -> list
+    """The sample requests shipped with the model: the files warmup.json, warmup.csv and warmup.npy in the
+    model directory.
+
+    Returns:
+        (list[tuple]): the path, the data and the content type of each sample request.
+    """
+    requests = []
+
+    for path in sorted(glob.glob(os.path.join(env.model_dir, WARMUP_FILE + '.*'))):
+        content_type = _WARMUP_CONTENT_TYPES.get(os.path.splitext(path)[1])
+
+        if not content_type:
+            logger.warning('Ignoring warmup file %s with unknown content type.', path)
+            continue
+
+        with open(path, 'rb') as f:
+            requests.append((path, f.read(), content_type))
+
+    return requests
+
+
+def compress(response, accept_encoding):  # type: (flask.Response, str) -> flask.Response
+    """Compress a response with the encoding preferred by the client, when it is at least
+    ServingEnv.response_compression_min_size bytes. In nginx mode, gzip is left to nginx, which compresses the
+    responses not compressed by the worker. See sagemaker_containers._compression.
+
+    Args:
+        response (flask.Response): the response.
+        accept_encoding (str): the header Accept-Encoding of the request.
+
+    Returns:
+        (flask.Response): the response.
+    """
+    encodings = [e for e in _compression.encodings() if not (env.use_nginx and e == _compression.GZIP)]
+    encoding = _compression.negotiate(accept_encoding, encodings)
+    return _compression.compress_response(response, encoding, env.response_compression_min_size)
+
+
+def _compressed(transform_fn):  # type: (function) -> function
+    """Wraps transform_fn, compressing its responses. See compress."""
+
+    def invocations():
+        response = transform_fn()
+
+        if isinstance(response, flask.Response):
+            return compress(response, flask.request.headers.get('Accept-Encoding'))
+        return response
+
+    return invocations
+
+
+def _timed(transform_fn):  # type: (function) -> function
+    """Wraps transform_fn, recording the time spent writing its response to the client."""
+
+    def invocations():
+        response = transform_fn()
+
+        if isinstance(response, flask.Response):
+            start = time.time()
+            response.call_on_close(lambda: _metrics.observe('write', time.time() - start))
+        return response
+
+    return invocations
+
+
+def _counted(transform_fn):  # type: (function) -> function
+    """Wraps transform_fn, counting the requests in flight until their response is written. The count is used
+    by sagemaker_containers._autoscaler."""
+
+    def invocations():
+        _metrics.add('requests_in_flight', 1)
+        try:
+            response = transform_fn()
+        except Exception:
+            _metrics.add('requests_in_flight', -1)
+            raise
+
+        if isinstance(response, flask.Response):
+            response.call_on_close(lambda: _metrics.add('requests_in_flight', -1))
+        else:
+            _metrics.add('requests_in_flight', -1)
+        return response
+
+    return invocations
+
+
+def _admitted(transform_fn, admission):  # type: (function, _admission.AdmissionController) -> function
+    """Wraps transform_fn, so it is only called for the requests admitted by admission. The other requests are
+    rejected with the status code 503. A request holds its admission until its response is written."""
+
+    def invocations():
+        if not admission.acquire():
+            body = json.dumps({'error': 'ServiceUnavailable',
+                               'error-message': 'The model server is overloaded. Retry the request later.'})
+            return Response(response=body, status=http_client.SERVICE_UNAVAILABLE,
+                            headers={'Retry-After': str(env.retry_after)})
+        try:
+            response = transform_fn()
+        except Exception:
+            admission.release()
+            raise
+
+        if isinstance(response, flask.Response):
+            response.call_on_close(admission.release)
+        else:
+            admission.release()
+        return response
+
+    return invocations
+
+
+def _serve_ipc(transformer, admission):  # type: (object, _admission.AdmissionController) -> None
+    if not hasattr(transformer, 'transform_content'):
+        logger.warning('Invocations on the unix socket %s require a Worker created with the method transform of a '
+                       'Transformer. The unix socket is disabled.', env.ipc_socket)
+    elif env.preload_model:
+        # the threads accepting the connections would not survive the fork of the workers.
+        logger.warning('Invocations on the unix socket %s are not supported when the model is preloaded. The unix '
+                       'socket is disabled.', env.ipc_socket)
+    else:
+        _ipc.serve(transformer.transform_content, env.ipc_socket, env.stream_requests, admission,
+                   env.ipc_max_payload_size)
+
+
+def _preload(initialize_fn):  # type: (function) -> None
+    """Call initialize_fn in the current process and freeze the garbage collector, so the memory pages of the
+    model stay shared with the workers forked by gunicorn."""
+    rss_before = _memory.rss()
+
+    initialize_fn()
+    _memory.freeze()
+
+    model_size = max(_memory.rss() - rss_before, 0)
+    logger.info('Model preloaded in %s MB. Sharing it saves %s MB per worker, %s MB for %s workers.',
+                model_size // _memory.MB, model_size // _memory.MB,
+                model_size * (env.model_server_workers - 1) // _memory.MB, env.model_server_workers)
+
 
 class Response(flask.Response):
     default_mimetype = _content_types.JSON
@@ -121,6 +358,17 @@ class Request(flask.Request, _mapping.MappingMixin):
     def __init__(self, environ=None):
         super(Request, self).__init__(environ=environ or flask.request.environ)
 
+    @utils.cached_property
+    def stream(self):  # type: () -> object
+        """The request body stream, decompressed while it is read when the request has the header
+        Content-Encoding gzip or zstd. See sagemaker_containers._compression.
+
+        Raises:
+            werkzeug.exceptions.UnsupportedMediaType: if the content encoding is not supported.
+        """
+        return _compression.decompress_stream(wsgi.get_input_stream(self.environ), self.headers.get('Content-Encoding'),
+                                              env.max_decompressed_request_size)
+
     @property
     def content_type(self):  # type () -> str
         """The request's content-type.
@@ -141,6 +389,19 @@ class Request(flask.Request, _mapping.MappingMixin):
         """
         return self.headers.get('Accept', _content_types.JSON)
 
+    @property
+    def target_model(self):  # type: () -> str
+        """The model invoked in multi-model mode.
+
+        Returns:
+            (str): The model name in the path /models/<model name>/invoke, or the value of the header
+                'X-Amzn-SageMaker-Target-Model'. None if the model is not specified.
+        """
+        parts = self.path.strip('/').split('/')
+        if len(parts) == 3 and parts[0] == 'models' and parts[2] == 'invoke':
+            return parts[1]
+        return self.headers.get(TARGET_MODEL_HEADER)
+
     @property
     def content(self):  # type: () -> object
         """The request incoming data.
@@ -14,21 +14,30 @@
 from __future__ import absolute_import
 
 # flake8: noqa ignore=F401 imported but unused
+import six
+
 import sagemaker_containers
+from sagemaker_containers import _batch_transform as batch_transform
 from sagemaker_containers import _content_types as content_types
 from sagemaker_containers import _encoders as encoders
 from sagemaker_containers import _errors as errors
 from sagemaker_containers import _env as env
 from sagemaker_containers import _functions as functions
+from sagemaker_containers import _ipc as ipc
 from sagemaker_containers import _logging as logging
 from sagemaker_containers import _mapping as mapping
+from sagemaker_containers import _memory as memory
 from sagemaker_containers import _modules as modules
 from sagemaker_containers import _params as params
+from sagemaker_containers import _records as records
 from sagemaker_containers import _server as server
 from sagemaker_containers import _trainer as trainer
 from sagemaker_containers import _transformer as transformer
 from sagemaker_containers import _worker as worker
 
+if six.PY3:
+    from sagemaker_containers import _asgi as asgi
+
 def training_env(resource_config=None, input_data_config=None, hyperparameters=None):
 
     resource_config = resource_config or env.read_resource_config()
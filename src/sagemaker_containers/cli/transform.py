@@ -0,0 +1,42 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import argparse
+
+from sagemaker_containers.beta.framework import batch_transform, records
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Transform the records of the files in a directory offline, '
+                                                 'without starting the model server.')
+    parser.add_argument('input_dir', help='directory containing the input files')
+    parser.add_argument('output_dir', help='directory where the output files are written')
+    parser.add_argument('--transformer', help="the framework transformer, as 'module:attribute'. Defaults to "
+                                              "the functions implemented by the user module")
+    parser.add_argument('--content-type', default='application/json')
+    parser.add_argument('--accept', help='defaults to the content type')
+    parser.add_argument('--split-type', default=records.LINE, choices=records.SPLIT_TYPES)
+    parser.add_argument('--assemble-with', default=records.LINE, choices=batch_transform.ASSEMBLE_WITH)
+    parser.add_argument('--processes', type=int, help='defaults to the number of cpus')
+    parser.add_argument('--cache-dir', help='directory where the responses of the records are cached across runs')
+    parser.add_argument('--cache-size', type=int, help='maximum number of bytes of the cache')
+
+    args = parser.parse_args(args)
+
+    batch_transform.run(args.input_dir, args.output_dir, transformer=args.transformer,
+                        content_type=args.content_type, accept=args.accept, split_type=args.split_type,
+                        assemble_with=args.assemble_with, processes=args.processes, cache_dir=args.cache_dir,
+                        cache_size=args.cache_size)
+
+
+if __name__ == "__main__":
+    main()
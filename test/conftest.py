@@ -20,6 +20,7 @@ import socket
 
 from mock import patch
 import pytest
+import six
 
 from sagemaker_containers import _env
 
@@ -29,6 +30,9 @@ logging.getLogger('botocore').setLevel(logging.WARN)
 
 DEFAULT_REGION = 'us-west-2'
 
+# the asgi model server requires Python 3.5 or later.
+collect_ignore = ['unit/test_asgi.py'] if six.PY2 else []
+
 
 def _write_json(obj, path):  # type: (object, str) -> None
     with open(path, 'w') as f:
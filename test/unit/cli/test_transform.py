@@ -0,0 +1,32 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from mock import patch
+
+from sagemaker_containers.cli import transform
+
+
+@patch('sagemaker_containers._batch_transform.run')
+def test_entry_point(run):
+    transform.main(['input', 'output', '--content-type', 'text/csv', '--split-type', 'RecordIO', '--processes', '2'])
+
+    run.assert_called_with('input', 'output', transformer=None, content_type='text/csv', accept=None,
+                           split_type='RecordIO', assemble_with='Line', processes=2, cache_dir=None, cache_size=None)
+
+
+@patch('sagemaker_containers._batch_transform.run')
+def test_entry_point_with_cache(run):
+    transform.main(['input', 'output', '--cache-dir', '/opt/ml/cache', '--cache-size', '1024'])
+
+    run.assert_called_with('input', 'output', transformer=None, content_type='application/json', accept=None,
+                           split_type='Line', assemble_with='Line', processes=None, cache_dir='/opt/ml/cache',
+                           cache_size=1024)
@@ -0,0 +1,56 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import threading
+import time
+
+from sagemaker_containers import _admission
+
+
+def test_admission_controller_admits_requests_in_flight():
+    admission = _admission.AdmissionController(max_in_flight=2, max_queued=0)
+
+    assert admission.acquire()
+    assert admission.acquire()
+    assert not admission.acquire()
+
+    assert (admission.in_flight, admission.admitted, admission.rejected) == (2, 2, 1)
+
+    admission.release()
+    assert admission.acquire()
+    assert admission.in_flight == 2
+
+
+def test_admission_controller_queues_requests():
+    admission = _admission.AdmissionController(max_in_flight=1, max_queued=1)
+    assert admission.acquire()
+
+    admitted = []
+    thread = threading.Thread(target=lambda: admitted.append(admission.acquire()))
+    thread.start()
+
+    while admission.queued == 0:
+        time.sleep(.01)
+
+    assert not admission.acquire()
+    assert admission.rejected == 1
+
+    time.sleep(.05)
+    admission.release()
+    thread.join()
+
+    assert admitted == [True]
+    assert (admission.in_flight, admission.queued, admission.admitted) == (1, 0, 2)
+    assert admission.max_queue_time >= .05
+    assert admission.queue_time >= admission.max_queue_time
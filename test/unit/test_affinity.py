@@ -0,0 +1,100 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import os
+
+from mock import MagicMock, patch
+import pytest
+
+from sagemaker_containers import _affinity, _params
+
+
+@pytest.mark.parametrize('cpus, workers, expected', [
+    ([0, 1, 2, 3], 1, [[0, 1, 2, 3]]),
+    ([0, 1, 2, 3], 2, [[0, 1], [2, 3]]),
+    ([0, 1, 2, 3, 4], 2, [[0, 1, 2], [3, 4]]),
+    ([0, 1], 3, [[0], [1], [0]])])
+def test_layout(cpus, workers, expected):
+    assert _affinity.layout(cpus, workers) == expected
+
+
+def test_available_cpus_ordered_by_core():
+    topology = {(0, 'core_id'): 0, (1, 'core_id'): 1, (2, 'core_id'): 0, (3, 'core_id'): 1}
+
+    with patch('os.sched_getaffinity', lambda pid: {0, 1, 2, 3}), \
+            patch('sagemaker_containers._affinity._topology', lambda cpu, name: topology.get((cpu, name), 0)):
+        assert _affinity.available_cpus() == [0, 2, 1, 3]
+
+
+def test_threads_env():
+    assert _affinity.threads_env(2) == {'OMP_NUM_THREADS': '2', 'MKL_NUM_THREADS': '2', 'OPENBLAS_NUM_THREADS': '2'}
+
+
+def test_pre_fork_assigns_free_slots():
+    server = MagicMock(WORKERS={})
+
+    workers = []
+    for pid in range(3):
+        worker = MagicMock(spec=[])
+        _affinity.pre_fork(server, worker)
+        server.WORKERS[pid] = worker
+        workers.append(worker)
+
+    assert [w.cpu_slot for w in workers] == [0, 1, 2]
+
+    del server.WORKERS[1]
+    worker = MagicMock(spec=[])
+    _affinity.pre_fork(server, worker)
+
+    assert worker.cpu_slot == 1
+
+
+@patch('sagemaker_containers._affinity.available_cpus', lambda: [0, 1, 2, 3])
+@patch('os.sched_setaffinity')
+def test_post_fork(sched_setaffinity):
+    server = MagicMock(num_workers=2)
+    worker = MagicMock(cpu_slot=1)
+
+    with patch.dict('os.environ'):
+        _affinity.post_fork(server, worker)
+
+        assert os.environ['OMP_NUM_THREADS'] == '2'
+        assert os.environ['OPENBLAS_NUM_THREADS'] == '2'
+
+    sched_setaffinity.assert_called_with(0, [2, 3])
+
+
+@patch('sagemaker_containers._affinity.available_cpus', lambda: [0, 1, 2, 3])
+@patch('os.sched_setaffinity')
+def test_post_fork_with_configured_workers(sched_setaffinity):
+    # the autoscaler started a third worker, the cpus are still split between the 2 configured workers.
+    server = MagicMock(num_workers=3)
+    worker = MagicMock(cpu_slot=1)
+
+    with patch.dict('os.environ', {_params.CPU_AFFINITY_WORKERS_ENV: '2'}):
+        _affinity.post_fork(server, worker)
+
+    sched_setaffinity.assert_called_with(0, [2, 3])
+
+
+@patch('sagemaker_containers._affinity.available_cpus', lambda: [0, 1, 2, 3])
+@patch('os.sched_setaffinity')
+def test_post_fork_beyond_configured_workers(sched_setaffinity):
+    server = MagicMock(num_workers=3)
+    worker = MagicMock(cpu_slot=2)
+
+    with patch.dict('os.environ', {_params.CPU_AFFINITY_WORKERS_ENV: '2'}):
+        _affinity.post_fork(server, worker)
+
+        assert os.environ['OMP_NUM_THREADS'] == '2'
+
+    assert not sched_setaffinity.called
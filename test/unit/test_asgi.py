@@ -0,0 +1,284 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import asyncio
+import gzip
+import json
+import os
+
+from mock import MagicMock, patch, PropertyMock
+import pytest
+from six.moves import http_client
+
+from sagemaker_containers import _asgi, _content_types, _env, _errors, _worker
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def request(app, method='POST', path='/invocations', body=b'', headers=None):
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path,
+             'headers': [[k.encode(), v.encode()] for k, v in (headers or {}).items()]}
+    run(app(scope, receive, send))
+
+    start, body = sent[0], b''.join(message['body'] for message in sent[1:])
+    return start['status'], dict((k.decode(), v.decode()) for k, v in start['headers']), body
+
+
+async def async_model_fn(model_dir):
+    return 'model'
+
+
+async def async_input_fn(content, content_type):
+    return json.loads(content)
+
+
+async def async_predict_fn(data, model):
+    return [x * 2 for x in data]
+
+
+def test_transform_async_with_coroutine_functions():
+    transformer = _asgi.Transformer(model_fn=async_model_fn, input_fn=async_input_fn, predict_fn=async_predict_fn)
+
+    run(transformer.initialize_async())
+    response = run(transformer.transform_async('[1, 2]', _content_types.JSON, _content_types.JSON))
+
+    assert response.status_code == http_client.OK
+    assert response.get_data(as_text=True) == '[2, 4]'
+
+
+def test_transform_async_with_regular_functions():
+    model = MagicMock()
+    predict_fn = MagicMock(return_value=[42])
+
+    transformer = _asgi.Transformer(model_fn=lambda model_dir: model, predict_fn=predict_fn)
+    run(transformer.initialize_async())
+    response = run(transformer.transform_async('[1]', _content_types.JSON, _content_types.CSV))
+
+    assert response.get_data(as_text=True) == '42\n'
+    assert predict_fn.call_args[0][1] == model
+
+
+def test_transform_async_with_transform_fn():
+    async def transform_fn(model, content, content_type, accept):
+        return '%s %s' % (model, content), accept
+
+    transformer = _asgi.Transformer(model_fn=async_model_fn, transform_fn=transform_fn)
+    run(transformer.initialize_async())
+    response = run(transformer.transform_async('42', _content_types.JSON, _content_types.CSV))
+
+    assert response.get_data(as_text=True) == 'model 42'
+    assert response.headers['accept'] == _content_types.CSV
+
+
+def test_transform_async_with_client_error():
+    async def predict_fn(data, model):
+        raise ValueError('Failed')
+
+    transformer = _asgi.Transformer(model_fn=async_model_fn, predict_fn=predict_fn)
+
+    with pytest.raises(_errors.ClientError) as e:
+        run(transformer.transform_async('42', _content_types.JSON, _content_types.JSON))
+
+    assert str(e.value.args[0]) == 'Failed'
+
+
+def test_transform_async_with_unsupported_content_type():
+    transformer = _asgi.Transformer(model_fn=async_model_fn, predict_fn=async_predict_fn)
+    response = run(transformer.transform_async('42', 'fake/content-type', _content_types.JSON))
+
+    assert response.status_code == http_client.UNSUPPORTED_MEDIA_TYPE
+
+
+@patch.object(_env.ServingEnv, 'multi_model', PropertyMock(return_value=True))
+def test_transformer_with_multi_model():
+    with pytest.raises(ValueError):
+        _asgi.Transformer(model_fn=async_model_fn)
+
+
+@patch.object(_env.ServingEnv, 'pipeline_threads', PropertyMock(return_value=2))
+@patch.object(_env.ServingEnv, 'record_split_threads', PropertyMock(return_value=2))
+@patch.object(_env.ServingEnv, 'request_coalescing', PropertyMock(return_value=True))
+@patch('sagemaker_containers._splitting.Splitter')
+@patch('sagemaker_containers._asgi.logger')
+def test_transformer_with_unsupported_settings(logger, splitter):
+    transformer = _asgi.Transformer(model_fn=async_model_fn)
+
+    assert transformer._pipeline is None
+    assert transformer.single_flight is None
+    splitter.assert_not_called()
+
+    logger.warning.assert_called_with('%s ignored: not supported by the asgi model server worker class.',
+                                      'pipeline_threads, record_split_threads, request_coalescing')
+
+
+def test_worker_invocations():
+    transformer = _asgi.Transformer(model_fn=async_model_fn, input_fn=async_input_fn, predict_fn=async_predict_fn)
+    app = _asgi.Worker(transformer)
+
+    status, headers, body = request(app, body=b'[1, 2, 3]', headers={'Content-Type': _content_types.JSON,
+                                                                     'Accept': _content_types.CSV})
+
+    assert status == http_client.OK
+    assert headers['content-type'].startswith(_content_types.CSV)
+    assert body == b'2\n4\n6\n'
+
+
+@patch.object(_env.ServingEnv, 'max_decompressed_request_size', PropertyMock(return_value=1024 ** 2))
+def test_worker_invocations_decompression_bomb():
+    transformer = _asgi.Transformer(model_fn=async_model_fn, input_fn=async_input_fn, predict_fn=async_predict_fn)
+    app = _asgi.Worker(transformer)
+
+    status, headers, body = request(app, body=gzip.compress(b'\x00' * 64 * 1024 ** 2),
+                                    headers={'Content-Type': _content_types.JSON, 'Content-Encoding': 'gzip'})
+
+    assert status == http_client.REQUEST_ENTITY_TOO_LARGE
+
+
+@patch.object(_env.ServingEnv, 'response_compression', PropertyMock(return_value=True))
+@patch.object(_env.ServingEnv, 'response_compression_min_size', PropertyMock(return_value=0))
+@patch.object(_env.ServingEnv, 'use_nginx', PropertyMock(return_value=False))
+def test_worker_invocations_compressed():
+    transformer = _asgi.Transformer(model_fn=async_model_fn, input_fn=async_input_fn, predict_fn=async_predict_fn)
+    app = _asgi.Worker(transformer)
+
+    status, headers, body = request(app, body=gzip.compress(b'[1, 2, 3]'),
+                                    headers={'Content-Type': _content_types.JSON, 'Accept': _content_types.CSV,
+                                             'Content-Encoding': 'gzip', 'Accept-Encoding': 'gzip'})
+
+    assert status == http_client.OK
+    assert headers['content-encoding'] == 'gzip'
+    assert gzip.decompress(body) == b'2\n4\n6\n'
+
+    status, _, _ = request(app, body=b'[1, 2, 3]', headers={'Content-Encoding': 'br'})
+    assert status == http_client.UNSUPPORTED_MEDIA_TYPE
+
+
+@pytest.mark.parametrize('ready, expected_status', [(True, http_client.OK),
+                                                    (False, http_client.SERVICE_UNAVAILABLE)])
+def test_worker_ping(ready, expected_status):
+    app = _asgi.Worker(_asgi.Transformer(model_fn=async_model_fn))
+
+    with patch('sagemaker_containers._readiness.is_ready', lambda: ready):
+        status, _, _ = request(app, method='GET', path='/ping')
+
+    assert status == expected_status
+
+
+def test_worker_custom_ping():
+    async def healthcheck_fn():
+        return _worker.Response(response='pong', status=http_client.ACCEPTED)
+
+    app = _asgi.Worker(_asgi.Transformer(model_fn=async_model_fn), healthcheck_fn=healthcheck_fn)
+
+    status, _, body = request(app, method='GET', path='/ping')
+
+    assert status == http_client.ACCEPTED
+    assert body == b'pong'
+
+
+def test_worker_invocations_streamed():
+    def transform_fn(model, content, content_type, accept):
+        return _worker.Response(response=iter(['1\n', '2\n']), accept=accept)
+
+    app = _asgi.Worker(_asgi.Transformer(model_fn=async_model_fn, transform_fn=transform_fn))
+
+    status, headers, body = request(app, body=b'[1, 2]', headers={'Accept': _content_types.CSV})
+
+    assert status == http_client.OK
+    assert 'content-length' not in headers
+    assert body == b'1\n2\n'
+
+
+def test_worker_metrics():
+    app = _asgi.Worker(_asgi.Transformer(model_fn=async_model_fn))
+
+    status, headers, body = request(app, method='GET', path='/metrics')
+
+    assert status == http_client.OK
+    assert headers['content-type'].startswith('text/plain')
+    assert b'sagemaker_request_stage_seconds_count{stage="predict"}' in body
+
+
+def test_worker_not_found():
+    app = _asgi.Worker(_asgi.Transformer(model_fn=async_model_fn))
+
+    status, _, body = request(app, method='GET', path='/invocations')
+
+    assert status == http_client.NOT_FOUND
+    assert body == b'{}'
+
+
+def test_worker_internal_server_error():
+    app = _asgi.Worker(_asgi.Transformer(model_fn=async_model_fn))
+
+    status, _, _ = request(app, body=b'42')
+
+    assert status == http_client.INTERNAL_SERVER_ERROR
+
+
+@patch('sagemaker_containers._readiness.mark_ready')
+def test_worker_lifespan(mark_ready):
+    with open(os.path.join(_env.model_dir, 'warmup.json'), 'w') as f:
+        f.write('[21]')
+
+    predictions = []
+
+    async def predict_fn(data, model):
+        predictions.append(data)
+        return data
+
+    app = _asgi.Worker(_asgi.Transformer(model_fn=async_model_fn, predict_fn=predict_fn))
+
+    messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    run(app({'type': 'lifespan'}, receive, send))
+
+    assert sent == [{'type': 'lifespan.startup.complete'}, {'type': 'lifespan.shutdown.complete'}]
+    assert [list(p) for p in predictions] == [[21]]
+    mark_ready.assert_called_with(_worker.env.model_server_workers)
+
+
+def test_worker_lifespan_startup_failed():
+    app = _asgi.Worker(_asgi.Transformer())
+
+    messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    run(app({'type': 'lifespan'}, receive, send))
+
+    assert sent[0]['type'] == 'lifespan.startup.failed'
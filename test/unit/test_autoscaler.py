@@ -0,0 +1,149 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import os
+import signal
+
+from mock import call, patch
+import pytest
+
+from sagemaker_containers import _autoscaler
+
+
+@pytest.fixture(name='kill')
+def fixture_kill():
+    with patch('os.kill') as kill, patch('time.sleep'):
+        yield kill
+
+
+def sample(autoscaler, in_flight, cpu_utilization=.5, times=1):
+    return [autoscaler.sample(in_flight, cpu_utilization) for _ in range(times)][-1]
+
+
+def test_scale_up(kill):
+    autoscaler = _autoscaler.Autoscaler(42, workers=2, min_workers=1, max_workers=8)
+
+    assert sample(autoscaler, 2, times=_autoscaler.SCALE_UP_WINDOW - 1) == 0
+    assert sample(autoscaler, 3) == 1
+
+    kill.assert_called_once_with(42, signal.SIGTTIN)
+    assert autoscaler.workers == 3
+
+
+def test_scale_up_to_requests_in_flight(kill):
+    autoscaler = _autoscaler.Autoscaler(42, workers=2, min_workers=1, max_workers=8)
+
+    assert sample(autoscaler, 20, times=_autoscaler.SCALE_UP_WINDOW) == 2
+    assert sample(autoscaler, 20, times=_autoscaler.SCALE_UP_WINDOW) == 4
+    assert sample(autoscaler, 20, times=_autoscaler.SCALE_UP_WINDOW) == 0
+
+    assert autoscaler.workers == 8
+    assert kill.call_args_list == [call(42, signal.SIGTTIN)] * 6
+
+
+def test_no_scale_up_when_cpus_are_saturated(kill):
+    autoscaler = _autoscaler.Autoscaler(42, workers=2, min_workers=1, max_workers=8)
+
+    assert sample(autoscaler, 20, cpu_utilization=.95, times=_autoscaler.SCALE_UP_WINDOW) == 0
+    kill.assert_not_called()
+
+
+def test_scale_up_with_concurrency(kill):
+    autoscaler = _autoscaler.Autoscaler(42, workers=2, min_workers=1, max_workers=8, concurrency=4)
+    assert sample(autoscaler, 7, times=_autoscaler.SCALE_UP_WINDOW) == 0
+
+    autoscaler = _autoscaler.Autoscaler(42, workers=2, min_workers=1, max_workers=8, concurrency=4)
+    assert sample(autoscaler, 8, times=_autoscaler.SCALE_UP_WINDOW) == 1
+
+
+def test_scale_down(kill):
+    autoscaler = _autoscaler.Autoscaler(42, workers=4, min_workers=2, max_workers=8)
+
+    assert sample(autoscaler, 1, times=_autoscaler.SCALE_DOWN_WINDOW - 1) == 0
+    assert sample(autoscaler, 1) == -1
+    assert sample(autoscaler, 1, times=_autoscaler.SCALE_DOWN_WINDOW) == 0
+
+    kill.assert_called_once_with(42, signal.SIGTTOU)
+    assert autoscaler.workers == 3
+
+
+def test_scale_down_interrupted_by_load(kill):
+    autoscaler = _autoscaler.Autoscaler(42, workers=4, min_workers=2, max_workers=8)
+
+    sample(autoscaler, 0, times=_autoscaler.SCALE_DOWN_WINDOW - 1)
+    assert sample(autoscaler, 3) == 0
+
+
+def test_pause(kill):
+    autoscaler = _autoscaler.Autoscaler(42, workers=2, min_workers=1, max_workers=8)
+
+    autoscaler.pause()
+    assert sample(autoscaler, 20, times=_autoscaler.SCALE_UP_WINDOW) == 0
+    kill.assert_not_called()
+
+    autoscaler.resume()
+    assert sample(autoscaler, 20, times=_autoscaler.SCALE_UP_WINDOW - 1) == 0
+    assert sample(autoscaler, 20) == 2
+
+
+def test_configure(kill):
+    autoscaler = _autoscaler.Autoscaler(42, workers=2, min_workers=1, max_workers=8)
+
+    status = autoscaler.configure(min_workers=4)
+
+    assert status['min_workers'] == 4
+    assert status['max_workers'] == 8
+    assert sample(autoscaler, 0) == 2
+    assert autoscaler.configure(min_workers=1, max_workers=3)['max_workers'] == 3
+    assert sample(autoscaler, 0) == -1
+
+    with pytest.raises(ValueError):
+        autoscaler.configure(min_workers=4)
+
+
+def test_follow(kill):
+    autoscaler = _autoscaler.Autoscaler(42, workers=2, min_workers=1, max_workers=8)
+    sample(autoscaler, 2)
+
+    autoscaler.follow(43, 2)
+
+    assert autoscaler.master_pid == 43
+    assert autoscaler.status()['workers'] == 2
+    assert not autoscaler._samples
+
+
+@pytest.mark.parametrize('min_workers, max_workers', [(0, 2), (3, 2)])
+def test_invalid_range(min_workers, max_workers):
+    with pytest.raises(ValueError):
+        _autoscaler.Autoscaler(42, 2, min_workers, max_workers)
+
+
+def test_control_socket(tmpdir):
+    path = str(tmpdir.join('control.sock'))
+    autoscaler = _autoscaler.Autoscaler(os.getpid(), workers=2, min_workers=1, max_workers=8)
+
+    with patch('sagemaker_containers._autoscaler.Autoscaler._run'):
+        autoscaler.start(path)
+
+    assert _autoscaler.control(path) == autoscaler.status()
+    assert _autoscaler.control(path, max_workers=4)['max_workers'] == 4
+    assert autoscaler.max_workers == 4
+    assert 'Invalid range of workers' in _autoscaler.control(path, min_workers=5)['error']
+    assert 'Unknown settings: workers' in _autoscaler.control(path, workers=5)['error']
+
+
+def test_cpu_utilization():
+    autoscaler = _autoscaler.Autoscaler(os.getppid(), workers=1, min_workers=1, max_workers=2)
+
+    assert os.getpid() in _autoscaler._children(os.getppid())
+    assert _autoscaler._cpu_time(os.getpid()) > 0
+    assert autoscaler._measure_cpu_utilization() >= 0
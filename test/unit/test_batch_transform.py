@@ -0,0 +1,160 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import os
+
+from mock import patch, PropertyMock
+import pytest
+from six.moves import http_client
+
+from sagemaker_containers import _batch_transform, _content_types, _env, _records, _transformer, _worker
+
+TRANSFORMER = 'test.unit.test_batch_transform:create_transformer'
+
+
+def create_transformer():
+    def transform_fn(model, content, content_type, accept):
+        if content == 'fail':
+            return _worker.Response(response='failed', status=http_client.BAD_REQUEST)
+        return _worker.Response(response='%s-%s-%d' % (model, content, os.getpid() != model_pid), mimetype=accept)
+
+    model_pid = os.getpid()
+    return _transformer.Transformer(model_fn=lambda model_dir: 'model', transform_fn=transform_fn)
+
+
+@pytest.fixture(name='input_dir')
+def fixture_input_dir(tmpdir):
+    input_dir = tmpdir.mkdir('input')
+    input_dir.join('a.csv').write('1\n2\n3\n')
+    input_dir.join('empty.csv').write('')
+    input_dir.mkdir('b').join('c.csv').write('4\n5\n')
+    return input_dir
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_run(input_dir, tmpdir, processes):
+    output_dir = tmpdir.join('output')
+
+    stats = _batch_transform.run(str(input_dir), str(output_dir), transformer=TRANSFORMER,
+                                 content_type=_content_types.CSV, processes=processes)
+
+    forked = int(processes > 1)
+    assert output_dir.join('a.csv.out').read() == 'model-1-{0}\nmodel-2-{0}\nmodel-3-{0}\n'.format(forked)
+    assert output_dir.join('b', 'c.csv.out').read() == 'model-4-{0}\nmodel-5-{0}\n'.format(forked)
+    assert output_dir.join('empty.csv.out').read() == ''
+
+    assert stats.files == 3
+    assert stats.records == 5
+    assert stats.bytes_in == 10
+    assert stats.bytes_out == 50
+    assert stats.cached == 0
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_run_with_cache(input_dir, tmpdir, processes):
+    cache_dir = str(tmpdir.join('cache'))
+
+    def run(output):
+        return _batch_transform.run(str(input_dir), str(tmpdir.join(output)), transformer=TRANSFORMER,
+                                    content_type=_content_types.CSV, processes=processes, cache_dir=cache_dir)
+
+    assert run('first').cached == 0
+
+    input_dir.join('b', 'c.csv').write('4\n6\n')
+    stats = run('second')
+
+    assert (stats.records, stats.cached) == (5, 4)
+    forked = int(processes > 1)
+    assert tmpdir.join('second', 'a.csv.out').read() == tmpdir.join('first', 'a.csv.out').read()
+    assert tmpdir.join('second', 'b', 'c.csv.out').read() == 'model-4-{0}\nmodel-6-{0}\n'.format(forked)
+
+
+@patch('sagemaker_containers._cache.model_version')
+def test_run_with_cache_and_new_model(model_version, input_dir, tmpdir):
+    model_version.return_value = 'version-1'
+    _batch_transform.run(str(input_dir), str(tmpdir.join('output')), transformer=TRANSFORMER,
+                         content_type=_content_types.CSV, processes=1, cache_dir=str(tmpdir.join('cache')))
+
+    model_version.return_value = 'version-2'
+    stats = _batch_transform.run(str(input_dir), str(tmpdir.join('output')), transformer=TRANSFORMER,
+                                 content_type=_content_types.CSV, processes=1, cache_dir=str(tmpdir.join('cache')))
+
+    assert stats.cached == 0
+
+
+def test_run_without_split(input_dir, tmpdir):
+    output_dir = tmpdir.join('output')
+
+    _batch_transform.run(str(input_dir), str(output_dir), transformer=TRANSFORMER, content_type=_content_types.CSV,
+                         split_type=_records.NONE, assemble_with=_records.NONE, processes=1)
+
+    assert output_dir.join('a.csv.out').read() == 'model-1\n2\n3\n-0'
+
+
+def test_run_with_failed_record(tmpdir):
+    input_dir = tmpdir.mkdir('input')
+    input_dir.join('a.csv').write('1\nfail\n')
+
+    with pytest.raises(_batch_transform.TransformRecordError) as e:
+        _batch_transform.run(str(input_dir), str(tmpdir.join('output')), transformer=TRANSFORMER,
+                             content_type=_content_types.CSV, processes=1)
+
+    assert 'Record 1 of a.csv failed with status code 400: failed' in str(e.value)
+
+
+@patch('sagemaker_containers._batch_transform.READ_AHEAD', 4)
+@patch('sagemaker_containers._batch_transform.CHUNK_SIZE', 2)
+@pytest.mark.parametrize('processes', [1, 2])
+def test_run_with_read_ahead(tmpdir, processes):
+    input_dir = tmpdir.mkdir('input')
+    input_dir.join('a.csv').write(''.join('%d\n' % i for i in range(100)))
+
+    read_ahead = _batch_transform._ReadAhead(processes * 4)
+    with patch('sagemaker_containers._batch_transform._ReadAhead', return_value=read_ahead):
+        stats = _batch_transform.run(str(input_dir), str(tmpdir.join('output')), transformer=TRANSFORMER,
+                                     content_type=_content_types.CSV, processes=processes)
+
+    assert stats.records == 100
+    assert tmpdir.join('output', 'a.csv.out').read().splitlines()[-1] == 'model-99-%d' % int(processes > 1)
+    # all the slots are released, and the one released by close.
+    assert all(read_ahead._slots.acquire(False) for _ in range(processes * 4 + 1))
+    assert not read_ahead._slots.acquire(False)
+
+
+def test_run_with_failed_record_and_read_ahead(tmpdir):
+    input_dir = tmpdir.mkdir('input')
+    input_dir.join('a.csv').write('fail\n' + ''.join('%d\n' % i for i in range(1000)))
+
+    with pytest.raises(_batch_transform.TransformRecordError):
+        _batch_transform.run(str(input_dir), str(tmpdir.join('output')), transformer=TRANSFORMER,
+                             content_type=_content_types.CSV, processes=2)
+
+
+def test_run_invalid_split_type(tmpdir):
+    with pytest.raises(ValueError):
+        _batch_transform.run(str(tmpdir), str(tmpdir), split_type='TFRecord')
+
+
+@patch.object(_env.ServingEnv, 'module_name', PropertyMock(return_value='user_script'))
+@patch('sagemaker_containers._modules.import_module')
+def test_load_transformer_from_user_module(import_module):
+    def predict_fn(data, model):
+        return data
+
+    import_module.return_value.mock_add_spec(['predict_fn'])
+    import_module.return_value.predict_fn = predict_fn
+
+    with patch('sagemaker_containers._transformer.Transformer') as transformer:
+        _batch_transform.load_transformer()
+
+    transformer.assert_called_with(model_fn=None, input_fn=None, predict_fn=predict_fn, output_fn=None,
+                                   transform_fn=None)
@@ -0,0 +1,145 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import threading
+
+from mock import MagicMock
+import numpy as np
+import pytest
+
+from sagemaker_containers import _batching, _encoders
+
+
+def predict_in_threads(batcher, inputs, model=None):
+    results = [None] * len(inputs)
+    errors = [None] * len(inputs)
+
+    def predict(i):
+        try:
+            results[i] = batcher.predict(inputs[i], model)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=predict, args=(i,)) for i in range(len(inputs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results, errors
+
+
+def test_batcher_merges_concurrent_requests():
+    predict_fn = MagicMock(side_effect=lambda data, model: data * 2)
+    batcher = _batching.Batcher(predict_fn, max_batch_size=4, max_batch_delay=500)
+
+    inputs = [np.array(data) for data in [[[1, 2]], [[3, 4], [5, 6]], [[7, 8]], [[9, 10]]]]
+    results, errors = predict_in_threads(batcher, inputs)
+
+    assert errors == [None] * 4
+    for data, result in zip(inputs, results):
+        np.testing.assert_array_equal(result, data * 2)
+
+    assert predict_fn.call_count == 1
+    assert len(predict_fn.call_args[0][0]) == 5
+
+
+def test_batcher_respects_max_batch_size():
+    predict_fn = MagicMock(side_effect=lambda data, model: data)
+    batcher = _batching.Batcher(predict_fn, max_batch_size=2, max_batch_delay=500)
+
+    results, errors = predict_in_threads(batcher, [np.array([[i]]) for i in range(1, 5)])
+
+    assert errors == [None] * 4
+    assert [result.tolist() for result in results] == [[[1]], [[2]], [[3]], [[4]]]
+    assert predict_fn.call_count == 2
+
+
+def test_batcher_merges_single_row_requests():
+    predict_fn = MagicMock(side_effect=lambda data, model: data.sum(axis=1))
+    batcher = _batching.Batcher(predict_fn, max_batch_size=3, max_batch_delay=500)
+
+    inputs = [_encoders.csv_to_numpy('1,2,3'), _encoders.csv_to_numpy('4,5,6'),
+              _encoders.csv_to_numpy('7,8,9\n1,1,1')]
+    results, errors = predict_in_threads(batcher, inputs)
+
+    assert errors == [None] * 3
+    assert [np.asarray(result).tolist() for result in results] == [6, 15, [24, 3]]
+    assert predict_fn.call_count == 1
+    assert predict_fn.call_args[0][0].shape == (4, 3)
+
+
+def test_batcher_predicts_mixed_shapes_separately():
+    predict_fn = MagicMock(side_effect=lambda data, model: data * 2)
+    batcher = _batching.Batcher(predict_fn, max_batch_size=4, max_batch_delay=500)
+
+    inputs = [np.array([1., 2.]), np.array([[3., 4., 5.]]), np.array([[6., 7.]]), np.array([[8., 9., 10.]])]
+    results, errors = predict_in_threads(batcher, inputs)
+
+    assert errors == [None] * 4
+    for data, result in zip(inputs, results):
+        np.testing.assert_array_equal(result, data * 2)
+    assert sorted(call[0][0].shape for call in predict_fn.call_args_list) == [(2, 2), (2, 3)]
+
+
+def test_batcher_single_request_is_not_merged():
+    model = MagicMock()
+    predict_fn = MagicMock(return_value='prediction')
+    batcher = _batching.Batcher(predict_fn, max_batch_size=8, max_batch_delay=0)
+
+    assert batcher.predict(42, model) == 'prediction'
+    predict_fn.assert_called_with(42, model)
+
+
+def test_batcher_predicts_one_by_one_when_data_is_not_an_array():
+    predict_fn = MagicMock(side_effect=lambda data, model: data)
+    batcher = _batching.Batcher(predict_fn, max_batch_size=2, max_batch_delay=500)
+
+    results, errors = predict_in_threads(batcher, [['a', 'b'], [{'c': 1}]])
+
+    assert errors == [None, None]
+    assert results == [['a', 'b'], [{'c': 1}]]
+    assert predict_fn.call_count == 2
+
+
+def test_batcher_propagates_errors_to_every_request():
+    predict_fn = MagicMock(side_effect=ValueError('Failed'))
+    batcher = _batching.Batcher(predict_fn, max_batch_size=2, max_batch_delay=500)
+
+    _, errors = predict_in_threads(batcher, [np.array([1]), np.array([2])])
+
+    assert [str(e) for e in errors] == ['Failed', 'Failed']
+
+
+def test_batcher_propagates_errors_only_to_failed_requests():
+    def predict_fn(data, model):
+        if (data < 0).any():
+            raise ValueError('Negative input')
+        return data * 2
+
+    predict_fn = MagicMock(side_effect=predict_fn)
+    batcher = _batching.Batcher(predict_fn, max_batch_size=3, max_batch_delay=500)
+
+    results, errors = predict_in_threads(batcher, [np.array([[1]]), np.array([[-1]]), np.array([[2]])])
+
+    assert [str(e) if e else None for e in errors] == [None, 'Negative input', None]
+    assert [result.tolist() if result is not None else None for result in results] == [[[2]], None, [[4]]]
+    assert predict_fn.call_count == 4
+
+
+def test_split_with_wrong_number_of_rows():
+    with pytest.raises(ValueError) as e:
+        _batching._split(np.asarray([1, 2]), [1, 2])
+
+    assert 'predict_fn returned 2 rows for a batch of 3 rows' in str(e.value)
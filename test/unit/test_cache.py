@@ -0,0 +1,329 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import os
+import threading
+import time
+
+from mock import MagicMock, patch
+import pytest
+
+from sagemaker_containers import _cache, _params
+
+
+def test_memory_cache():
+    cache = _cache.MemoryCache(max_size=10)
+
+    assert cache.get('a') is None
+    cache.put('a', 'value-a', 4)
+
+    assert cache.get('a') == 'value-a'
+    assert (cache.hits, cache.misses, cache.size) == (1, 1, 4)
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = _cache.MemoryCache(max_size=10)
+
+    cache.put('a', 'value-a', 4)
+    cache.put('b', 'value-b', 4)
+    cache.get('a')
+    cache.put('c', 'value-c', 4)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'value-a'
+    assert cache.get('c') == 'value-c'
+    assert cache.size == 8
+
+
+def test_memory_cache_does_not_cache_values_larger_than_max_size():
+    cache = _cache.MemoryCache(max_size=10)
+
+    cache.put('a', 'value-a', 11)
+
+    assert cache.get('a') is None
+    assert cache.size == 0
+
+
+@patch('time.time')
+def test_memory_cache_ttl(time):
+    cache = _cache.MemoryCache(max_size=10, ttl=60)
+
+    time.return_value = 100
+    cache.put('a', 'value-a', 4)
+
+    time.return_value = 160
+    assert cache.get('a') == 'value-a'
+
+    time.return_value = 161
+    assert cache.get('a') is None
+    assert cache.size == 0
+
+
+def test_shared_cache(tmpdir):
+    cache = _cache.SharedCache(str(tmpdir), max_size=1024)
+    other_worker_cache = _cache.SharedCache(str(tmpdir), max_size=1024)
+
+    assert cache.get('a') is None
+    cache.put('a', (b'body', 200, [('Content-Type', 'text/csv')]), 4)
+
+    assert other_worker_cache.get('a') == (b'body', 200, [('Content-Type', 'text/csv')])
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert (other_worker_cache.hits, other_worker_cache.misses) == (1, 0)
+
+
+def test_shared_cache_evicts_least_recently_used(tmpdir):
+    cache = _cache.SharedCache(str(tmpdir), max_size=1024)
+    cache.put('a', b'a' * 400, 400)
+    cache.put('b', b'b' * 400, 400)
+
+    os.utime(str(tmpdir.join('a')), (1, 1))
+    os.utime(str(tmpdir.join('b')), (2, 2))
+    cache.get('a')
+
+    cache.put('c', b'c' * 400, 400)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == b'a' * 400
+    assert cache.get('c') == b'c' * 400
+    assert cache.size <= 1024
+
+
+def test_shared_cache_lists_directory_only_over_budget(tmpdir):
+    cache = _cache.SharedCache(str(tmpdir), max_size=1024)
+    cache.put('a', b'a' * 100, 100)
+
+    with patch('os.listdir', side_effect=os.listdir) as listdir:
+        cache.put('b', b'b' * 100, 100)
+        assert not listdir.called
+
+        cache.put('c', b'c' * 900, 900)
+        listdir.assert_called_once_with(str(tmpdir))
+
+    assert cache.size <= 1024 * _cache.EVICTION_TARGET
+
+
+def test_shared_cache_does_not_cache_values_larger_than_max_size(tmpdir):
+    cache = _cache.SharedCache(str(tmpdir), max_size=100)
+
+    cache.put('a', b'a' * 200, 200)
+
+    assert cache.get('a') is None
+    assert os.listdir(str(tmpdir)) == []
+
+
+@patch('time.time')
+def test_shared_cache_ttl(time, tmpdir):
+    cache = _cache.SharedCache(str(tmpdir), max_size=1024, ttl=60)
+
+    time.return_value = 100
+    cache.put('a', 'value-a', 7)
+
+    time.return_value = 161
+    assert cache.get('a') is None
+    assert not tmpdir.join('a').check()
+
+
+def test_response_cache_disabled():
+    assert _cache.response_cache(MagicMock(response_cache_size=0)) is None
+
+
+def test_response_cache_memory():
+    cache = _cache.response_cache(MagicMock(response_cache_size=10, response_cache_ttl=5,
+                                            response_cache_backend='memory'))
+
+    assert isinstance(cache, _cache.MemoryCache)
+    assert (cache.max_size, cache.ttl) == (10, 5)
+
+
+def test_response_cache_shared(tmpdir):
+    env = MagicMock(response_cache_size=10, response_cache_ttl=5, response_cache_backend='shared')
+
+    with patch.dict('os.environ', {_params.SERVER_STATE_DIR_ENV: str(tmpdir)}):
+        cache = _cache.response_cache(env)
+
+    assert isinstance(cache, _cache.SharedCache)
+    assert cache.directory == str(tmpdir.join('cache'))
+    assert tmpdir.join('cache').check(dir=1)
+
+
+def test_response_cache_invalid_backend():
+    with pytest.raises(ValueError) as e:
+        _cache.response_cache(MagicMock(response_cache_size=10, response_cache_backend='redis'))
+
+    assert 'Invalid response cache backend redis' in str(e.value)
+
+
+def test_key():
+    assert _cache.key('a', b'b', 1) == _cache.key(b'a', 'b', '1')
+    assert _cache.key('ab', 'c') != _cache.key('a', 'bc')
+    assert len(_cache.key('a')) == 64
+
+
+def test_model_version(tmpdir):
+    tmpdir.join('model.bin').write('weights')
+    version = _cache.model_version(str(tmpdir))
+
+    assert _cache.model_version(str(tmpdir)) == version
+
+    tmpdir.join('model.bin').write('new weights')
+    assert _cache.model_version(str(tmpdir)) != version
+
+
+def test_single_flight():
+    single_flight = _cache.SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        assert release.wait(5)
+        return 42
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(single_flight.do('key', fn)))
+    leader.start()
+    assert started.wait(5)
+
+    followers = [threading.Thread(target=lambda: results.append(single_flight.do('key', fn))) for _ in range(3)]
+    for follower in followers:
+        follower.start()
+    while single_flight.deduplicated < 3:
+        time.sleep(.01)
+
+    assert single_flight.do('other-key', lambda: 7) == (7, False)
+
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert calls == [1]
+    assert sorted(results) == [(42, False), (42, True), (42, True), (42, True)]
+    assert single_flight.in_flight == 0
+
+    # a call after the call in flight completes calls the function again.
+    assert single_flight.do('key', lambda: 43) == (43, False)
+
+
+def test_single_flight_with_error():
+    single_flight = _cache.SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def fn():
+        started.set()
+        time.sleep(.1)
+        raise ValueError('failed')
+
+    def call():
+        try:
+            single_flight.do('key', fn)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    assert started.wait(5)
+    threads.append(threading.Thread(target=call))
+    threads[1].start()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == ['failed', 'failed']
+    assert single_flight.in_flight == 0
+
+
+def test_single_flight_after_fork():
+    single_flight = _cache.SingleFlight()
+    single_flight.do('key', lambda: 1)
+    single_flight._calls['stale'] = _cache._Call()
+
+    with patch('os.getpid', lambda: -1):
+        assert single_flight.do('stale', lambda: 2) == (2, False)
+
+
+def test_disk_cache(tmpdir):
+    cache = _cache.DiskCache(str(tmpdir), max_size=1024)
+
+    assert cache.get('a') is None
+    cache.put('a', b'value-a')
+    cache.put('b', {'value': 'b'})
+
+    assert cache.get('a') == b'value-a'
+    assert cache.get('b') == {'value': 'b'}
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    cache.put('a', b'new-value-a')
+    assert cache.get('a') == b'new-value-a'
+
+
+def test_disk_cache_persists(tmpdir):
+    cache = _cache.DiskCache(str(tmpdir), max_size=1024)
+    cache.put('a', b'value-a')
+    cache.close()
+
+    cache = _cache.DiskCache(str(tmpdir), max_size=1024)
+    assert cache.get('a') == b'value-a'
+
+    cache.put('b', b'value-b')
+    cache.close()
+
+    cache = _cache.DiskCache(str(tmpdir), max_size=1024)
+    assert (cache.get('a'), cache.get('b')) == (b'value-a', b'value-b')
+    assert len(os.listdir(str(tmpdir))) == 1
+
+
+def test_disk_cache_evicts_oldest_segments(tmpdir):
+    cache = _cache.DiskCache(str(tmpdir), max_size=1000, segment_size=250)
+
+    for i in range(20):
+        cache.put(str(i), b'x' * 50)
+
+    assert cache.size <= 1000
+    assert cache.get('0') is None
+    assert cache.get('19') == b'x' * 50
+    assert len(os.listdir(str(tmpdir))) == len(cache._segments) <= 4
+
+    # the evicted segments are not loaded again.
+    cache.close()
+    assert _cache.DiskCache(str(tmpdir), max_size=1000, segment_size=250).get('0') is None
+
+
+def test_disk_cache_does_not_cache_large_values(tmpdir):
+    cache = _cache.DiskCache(str(tmpdir), max_size=1000, segment_size=100)
+    cache.put('a', b'x' * 200)
+
+    assert cache.get('a') is None
+    assert cache.size == 0
+
+
+def test_disk_cache_ignores_truncated_entry(tmpdir):
+    cache = _cache.DiskCache(str(tmpdir), max_size=1024)
+    cache.put('a', b'value-a')
+    cache.put('b', b'value-b')
+    cache.close()
+
+    path = str(tmpdir.join('00000000' + _cache.SEGMENT_SUFFIX))
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 3)
+
+    cache = _cache.DiskCache(str(tmpdir), max_size=1024)
+    assert (cache.get('a'), cache.get('b')) == (b'value-a', None)
+
+    # the truncated entry is overwritten.
+    cache.put('c', b'value-c')
+    cache.close()
+    cache = _cache.DiskCache(str(tmpdir), max_size=1024)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (b'value-a', None, b'value-c')
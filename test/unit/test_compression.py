@@ -0,0 +1,136 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import gzip
+import io
+
+from mock import patch
+import pytest
+from werkzeug import exceptions
+
+from sagemaker_containers import _compression, _worker
+
+
+def gzip_compress(data):
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as f:
+        f.write(data)
+    return buffer.getvalue()
+
+
+def test_decompress_stream_gzip():
+    data = b'1,2,3\n' * 100000
+    stream = _compression.decompress_stream(io.BytesIO(gzip_compress(data)), 'gzip')
+
+    assert stream.readline() == b'1,2,3\n'
+    assert stream.read(6) == b'1,2,3\n'
+    assert stream.read() == data[12:]
+
+
+def test_decompress_max_size():
+    data = gzip_compress(b'a' * 1000)
+
+    assert _compression.decompress(data, 'gzip', max_size=1000) == b'a' * 1000
+    with pytest.raises(exceptions.RequestEntityTooLarge):
+        _compression.decompress(data, 'gzip', max_size=999)
+
+
+def test_decompress_gzip_members():
+    assert _compression.decompress(gzip_compress(b'a') + gzip_compress(b'b'), 'GZIP') == b'ab'
+
+
+@pytest.mark.parametrize('content_encoding', [None, '', 'identity'])
+def test_decompress_identity(content_encoding):
+    stream = io.BytesIO(b'42')
+
+    assert _compression.decompress_stream(stream, content_encoding) is stream
+    assert _compression.decompress(b'42', content_encoding) == b'42'
+
+
+def test_decompress_unsupported_encoding():
+    with pytest.raises(exceptions.UnsupportedMediaType):
+        _compression.decompress(b'42', 'br')
+
+
+@patch('sagemaker_containers._compression.zstandard', None)
+def test_decompress_zstd_not_installed():
+    with pytest.raises(exceptions.UnsupportedMediaType):
+        _compression.decompress(b'42', 'zstd')
+
+
+@pytest.mark.parametrize('data', [b'not gzip', gzip_compress(b'42' * 1000)[:-4]])
+def test_decompress_invalid_gzip(data):
+    with pytest.raises(exceptions.BadRequest):
+        _compression.decompress(data, 'gzip')
+
+
+def test_zstd_roundtrip():
+    zstandard = pytest.importorskip('zstandard')
+
+    data = b'{"instances": [1, 2, 3]}' * 1000
+    compressed = zstandard.ZstdCompressor().compress(data)
+
+    assert _compression.decompress(compressed, 'zstd') == data
+
+    response = _compression.compress_response(_worker.Response(response=data), 'zstd')
+    assert zstandard.ZstdDecompressor().decompress(response.get_data()) == data
+
+
+@pytest.mark.parametrize('accept_encoding, supported, expected', [
+    (None, None, None),
+    ('gzip', None, 'gzip'),
+    ('gzip, deflate', ['gzip'], 'gzip'),
+    ('br', None, None),
+    ('gzip;q=0.5, zstd', ['zstd', 'gzip'], 'zstd'),
+    ('gzip, zstd;q=0.5', ['zstd', 'gzip'], 'gzip'),
+    ('*', ['zstd', 'gzip'], 'zstd'),
+    ('gzip', [], None)
+])
+def test_negotiate(accept_encoding, supported, expected):
+    assert _compression.negotiate(accept_encoding, supported) == expected
+
+
+def test_compress_response():
+    data = b'{"predictions": [0.5]}' * 100
+    response = _compression.compress_response(_worker.Response(response=data), 'gzip', min_size=1024)
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert int(response.headers['Content-Length']) == len(response.get_data()) < len(data)
+    assert gzip.GzipFile(fileobj=io.BytesIO(response.get_data())).read() == data
+
+
+def test_compress_response_below_min_size():
+    response = _compression.compress_response(_worker.Response(response=b'42'), 'gzip', min_size=1024)
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == b'42'
+
+
+@pytest.mark.parametrize('encoding, headers', [(None, None), ('gzip', {'Content-Encoding': 'br'})])
+def test_compress_response_not_compressed(encoding, headers):
+    response = _compression.compress_response(_worker.Response(response=b'42', headers=headers), encoding)
+
+    assert response.get_data() == b'42'
+
+
+def test_compress_response_streamed():
+    response = _worker.Response(response=(b'%d\n' % i for i in range(3)))
+    response = _compression.compress_response(response, 'gzip', min_size=1024)
+
+    chunks = list(response.iter_encoded())
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(chunks) == 3
+    assert gzip.GzipFile(fileobj=io.BytesIO(b''.join(chunks))).read() == b'0\n1\n2\n'
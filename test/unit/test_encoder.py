@@ -13,7 +13,7 @@
 from mock import Mock, patch
 import numpy as np
 import pytest
-from six import BytesIO
+from six import BytesIO, StringIO
 
 from sagemaker_containers import _content_types, _encoders, _errors
 
@@ -128,3 +128,117 @@ def test_decode(content_type):
         _encoders.decode(42, content_type)
 
         decoder.assert_called_once_with(42)
+
+
+@pytest.mark.parametrize(
+    'target, expected', [([42, 6, 9], '42\n6\n9\n'),
+                         ([[1, 2], [3, 4]], '[1, 2]\n[3, 4]\n'),
+                         ([{'a': 1}, {'b': [2]}], '{"a": 1}\n{"b": [2]}\n'),
+                         (42, '42\n')]
+)
+def test_array_to_jsonlines(target, expected):
+    assert _encoders.array_to_jsonlines(target) == expected
+
+
+def test_jsonlines_to_numpy():
+    np.testing.assert_equal(_encoders.jsonlines_to_numpy('[1, 2]\n[3, 4]\n\n'), np.array([[1, 2], [3, 4]]))
+    np.testing.assert_equal(_encoders.jsonlines_to_numpy('1\n2', dtype=float), np.array([1., 2.]))
+
+
+def test_array_to_csv_chunks():
+    array = np.arange(10).reshape(5, 2)
+
+    chunks = list(_encoders.array_to_csv_chunks(array, rows=2))
+
+    assert chunks == ['0,1\n2,3\n', '4,5\n6,7\n', '8,9\n']
+    assert ''.join(chunks) == _encoders.array_to_csv(array)
+
+
+def test_array_to_csv_chunks_with_iterator():
+    batches = iter([[[1, 2]], [[3, 4], [5, 6]]])
+
+    assert list(_encoders.array_to_csv_chunks(batches)) == ['1,2\n', '3,4\n5,6\n']
+
+
+def test_array_to_jsonlines_chunks():
+    chunks = list(_encoders.array_to_jsonlines_chunks(np.arange(5), rows=3))
+
+    assert chunks == ['0\n1\n2\n', '3\n4\n']
+
+
+@pytest.mark.parametrize('target', (np.arange(10).reshape(5, 2), np.arange(5.), iter([[1, 2], [3]]), 42, ['a', 'bc']))
+def test_array_to_npy_chunks(target):
+    expected = np.concatenate([[1, 2], [3]]) if _encoders._is_iterator(target) else np.asarray(target)
+
+    chunks = list(_encoders.array_to_npy_chunks(target, rows=2))
+
+    np.testing.assert_equal(np.load(BytesIO(b''.join(chunks))), expected)
+
+
+def test_array_to_npy_chunks_streams_rows():
+    chunks = list(_encoders.array_to_npy_chunks(np.arange(10).reshape(5, 2), rows=2))
+
+    assert len(chunks) == 4
+
+
+@pytest.mark.parametrize(
+    'content_type', [_content_types.CSV, _content_types.JSONLINES, _content_types.NPY]
+)
+def test_encode_chunks(content_type):
+    encoder = Mock()
+    with patch.dict(_encoders._chunk_encoders_map, {content_type: encoder}, clear=True):
+        _encoders.encode_chunks(42, content_type)
+
+        encoder.assert_called_once_with(42)
+
+
+def test_encode_chunks_in_a_single_chunk():
+    assert list(_encoders.encode_chunks(iter([[1, 2], [3]]), _content_types.JSON)) == ['[1, 2, 3]']
+
+
+def test_encode_chunks_error():
+    with pytest.raises(_errors.UnsupportedFormatError):
+        _encoders.encode_chunks(42, _content_types.OCTET_STREAM)
+
+
+def test_csv_to_numpy_chunks():
+    stream = BytesIO(b'1,2\n3,4\n\n5,6\n')
+
+    chunks = list(_encoders.csv_to_numpy_chunks(stream, rows=2))
+
+    assert len(chunks) == 2
+    np.testing.assert_equal(chunks[0], np.array([[1., 2.], [3., 4.]]))
+    np.testing.assert_equal(chunks[1], np.array([[5., 6.]]))
+
+
+def test_jsonlines_to_numpy_chunks():
+    stream = StringIO(u'[1, 2]\n[3, 4]\n[5, 6]')
+
+    chunks = list(_encoders.jsonlines_to_numpy_chunks(stream, rows=2))
+
+    np.testing.assert_equal(chunks[0], np.array([[1, 2], [3, 4]]))
+    np.testing.assert_equal(chunks[1], np.array([[5, 6]]))
+
+
+@pytest.mark.parametrize(
+    'data, content_type', [(b'1,2\n3,4\n', _content_types.CSV),
+                           (b'1\n2\n3\n', _content_types.CSV),
+                           (b'1,2,3\n', _content_types.CSV),
+                           (b'42', _content_types.CSV),
+                           (b'[1, 2]\n[3, 4]\n', _content_types.JSONLINES),
+                           (b'[[1, 2], [3, 4]]', _content_types.JSON)]
+)
+def test_decode_stream(data, content_type):
+    expected = _encoders.decode(data.decode('utf-8'), content_type)
+
+    np.testing.assert_equal(_encoders.decode_stream(BytesIO(data), content_type), expected)
+
+
+def test_decode_stream_npy():
+    data = _encoders.array_to_npy([1, 2])
+
+    np.testing.assert_equal(_encoders.decode_stream(BytesIO(data), _content_types.NPY), [1, 2])
+
+
+def test_decode_stream_empty():
+    assert _encoders.decode_stream(BytesIO(b''), _content_types.CSV).size == 0
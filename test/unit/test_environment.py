@@ -208,6 +208,40 @@ def test_serving_env(serving_env):
     assert serving_env.model_server_workers == 8
     assert serving_env.module_name == 'main'
     assert serving_env.framework_module is None
+    assert serving_env.max_batch_size == 1
+    assert serving_env.max_batch_delay == 10
+    assert serving_env.preload_model is False
+    assert serving_env.model_server_worker_class == 'gevent'
+    assert serving_env.model_server_threads == 1
+    assert serving_env.nginx_worker_processes == 8
+    assert serving_env.nginx_worker_connections == 2048
+    assert serving_env.nginx_keepalive_timeout == 3
+    assert serving_env.nginx_upstream_keepalive == 32
+    assert serving_env.nginx_proxy_buffering is True
+    assert serving_env.response_cache_size == 0
+    assert serving_env.response_cache_ttl == 300
+    assert serving_env.response_cache_backend == 'memory'
+    assert serving_env.max_concurrent_requests == 0
+    assert serving_env.max_queued_requests == 0
+    assert serving_env.retry_after == 1
+    assert serving_env.stream_requests is False
+    assert serving_env.multi_model is False
+    assert serving_env.multi_model_memory_budget == 0
+    assert serving_env.model_server_min_workers == serving_env.model_server_workers
+    assert serving_env.model_server_max_workers == serving_env.model_server_workers
+    assert serving_env.model_server_cpu_affinity is False
+    assert serving_env.model_server_reload_interval == 0
+    assert not serving_env.fast_ping
+    assert not serving_env.response_compression
+    assert serving_env.response_compression_min_size == 1024
+    assert serving_env.max_decompressed_request_size == 100 * 1024 * 1024
+    assert serving_env.pipeline_threads == 0
+    assert serving_env.ipc_socket is None
+    assert serving_env.ipc_max_payload_size == 100 * 1024 * 1024
+    assert serving_env.record_split_threads == 0
+    assert serving_env.request_coalescing is False
+    assert serving_env.prediction_cache_dir is None
+    assert serving_env.prediction_cache_size == 1024 ** 3
 
 
 def test_env_mapping_properties(training_env):
@@ -219,15 +253,39 @@ def test_env_mapping_properties(training_env):
 
 
 def test_serving_env_properties(serving_env):
-    assert serving_env.properties() == ['current_host', 'framework_module', 'log_level', 'model_dir',
-                                        'model_server_timeout', 'model_server_workers', 'module_dir', 'module_name',
-                                        'num_cpus', 'num_gpus', 'use_nginx']
+    assert serving_env.properties() == ['current_host', 'fast_ping', 'framework_module', 'ipc_max_payload_size',
+                                        'ipc_socket', 'log_level', 'max_batch_delay', 'max_batch_size',
+                                        'max_concurrent_requests', 'max_decompressed_request_size',
+                                        'max_queued_requests', 'model_dir', 'model_server_cpu_affinity',
+                                        'model_server_max_workers', 'model_server_min_workers',
+                                        'model_server_reload_interval', 'model_server_threads', 'model_server_timeout',
+                                        'model_server_worker_class', 'model_server_workers', 'module_dir',
+                                        'module_name', 'multi_model', 'multi_model_memory_budget',
+                                        'nginx_keepalive_timeout', 'nginx_proxy_buffering', 'nginx_upstream_keepalive',
+                                        'nginx_worker_connections', 'nginx_worker_processes', 'num_cpus', 'num_gpus',
+                                        'pipeline_threads', 'prediction_cache_dir', 'prediction_cache_size',
+                                        'preload_model', 'record_split_threads', 'request_coalescing',
+                                        'response_cache_backend', 'response_cache_size', 'response_cache_ttl',
+                                        'response_compression', 'response_compression_min_size', 'retry_after',
+                                        'stream_requests', 'use_nginx']
 
 
 def test_request_properties(serving_env):
-    assert serving_env.properties() == ['current_host', 'framework_module', 'log_level', 'model_dir',
-                                        'model_server_timeout', 'model_server_workers', 'module_dir', 'module_name',
-                                        'num_cpus', 'num_gpus', 'use_nginx']
+    assert serving_env.properties() == ['current_host', 'fast_ping', 'framework_module', 'ipc_max_payload_size',
+                                        'ipc_socket', 'log_level', 'max_batch_delay', 'max_batch_size',
+                                        'max_concurrent_requests', 'max_decompressed_request_size',
+                                        'max_queued_requests', 'model_dir', 'model_server_cpu_affinity',
+                                        'model_server_max_workers', 'model_server_min_workers',
+                                        'model_server_reload_interval', 'model_server_threads', 'model_server_timeout',
+                                        'model_server_worker_class', 'model_server_workers', 'module_dir',
+                                        'module_name', 'multi_model', 'multi_model_memory_budget',
+                                        'nginx_keepalive_timeout', 'nginx_proxy_buffering', 'nginx_upstream_keepalive',
+                                        'nginx_worker_connections', 'nginx_worker_processes', 'num_cpus', 'num_gpus',
+                                        'pipeline_threads', 'prediction_cache_dir', 'prediction_cache_size',
+                                        'preload_model', 'record_split_threads', 'request_coalescing',
+                                        'response_cache_backend', 'response_cache_size', 'response_cache_ttl',
+                                        'response_compression', 'response_compression_min_size', 'retry_after',
+                                        'stream_requests', 'use_nginx']
 
 
 @patch('sagemaker_containers._env.num_cpus', lambda: 8)
@@ -0,0 +1,61 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import gc
+
+from mock import call, MagicMock, patch
+import pytest
+
+from sagemaker_containers import _gunicorn, _params
+
+
+@patch('sagemaker_containers._affinity.post_fork')
+def test_post_fork(post_fork):
+    gc.disable()
+    try:
+        with patch.dict('os.environ', clear=True):
+            _gunicorn.post_fork(MagicMock(), MagicMock())
+
+        assert gc.isenabled()
+    finally:
+        gc.enable()
+    post_fork.assert_not_called()
+
+
+@patch('sagemaker_containers._affinity.pre_fork')
+@patch('sagemaker_containers._affinity.post_fork')
+def test_hooks_with_cpu_affinity(post_fork, pre_fork):
+    server, worker = MagicMock(), MagicMock()
+
+    with patch.dict('os.environ', {_params.CPU_AFFINITY_WORKERS_ENV: '2'}):
+        _gunicorn.pre_fork(server, worker)
+        _gunicorn.post_fork(server, worker)
+
+    pre_fork.assert_called_with(server, worker)
+    post_fork.assert_called_with(server, worker)
+
+
+@pytest.mark.parametrize('preload_app', [True, False])
+@patch('sagemaker_containers._readiness.mark_ready')
+def test_post_worker_init(mark_ready, preload_app):
+    _gunicorn.post_worker_init(MagicMock(cfg=MagicMock(preload_app=preload_app)))
+
+    assert mark_ready.call_args_list == ([call(1)] if preload_app else [])
+
+
+@patch('sagemaker_containers._readiness.remove_worker')
+def test_child_exit(remove_worker):
+    _gunicorn.child_exit(MagicMock(), MagicMock(pid=42))
+
+    remove_worker.assert_called_with(42)
@@ -0,0 +1,209 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import json
+import os
+import socket
+import struct
+import time
+
+from mock import MagicMock, patch
+import numpy as np
+import pytest
+import six
+from six.moves import http_client
+
+from sagemaker_containers import _content_types, _encoders, _ipc, _params, _transformer, _worker
+
+
+@pytest.fixture(name='path')
+def fixture_path(tmpdir):
+    return str(tmpdir.join('model.sock'))
+
+
+def serve(path, stream_requests=False, ipc_kwargs=None, **kwargs):
+    kwargs.setdefault('predict_fn', lambda data, model: data * 2)
+    transformer = _transformer.Transformer(model_fn=MagicMock(), **kwargs)
+    transformer.initialize()
+    return _ipc.serve(transformer.transform_content, path, stream_requests, **(ipc_kwargs or {}))
+
+
+def test_invoke(path):
+    serve(path)
+
+    client = _ipc.Client(path)
+    for _ in range(3):
+        status, content_type, body = client.invoke(b'[[1, 2]]', _content_types.JSON, _content_types.CSV)
+
+        assert status == http_client.OK
+        assert content_type == _content_types.CSV
+        assert body == b'2,4\n'
+    client.close()
+
+
+def test_invoke_unsupported_accept(path):
+    serve(path)
+
+    status, content_type, body = _ipc.Client(path).invoke(b'[1]', _content_types.JSON, 'application/unknown')
+
+    assert status == http_client.NOT_ACCEPTABLE
+    assert content_type == _content_types.JSON
+    assert json.loads(body.decode('utf-8'))['error'] == 'UnsupportedFormatError'
+
+
+def test_invoke_error(path):
+    serve(path, predict_fn=MagicMock(side_effect=ValueError('bad model')))
+
+    client = _ipc.Client(path)
+    status, _, body = client.invoke(b'[1]')
+
+    assert status == http_client.INTERNAL_SERVER_ERROR
+    assert json.loads(body.decode('utf-8')) == {'error': 'ClientError', 'error-message': 'bad model'}
+
+    # the connection is still usable.
+    assert client.invoke(b'[1]')[0] == http_client.INTERNAL_SERVER_ERROR
+
+
+@pytest.mark.skipif(six.PY2, reason='file descriptors are only passed by Python 3')
+@pytest.mark.parametrize('stream_requests', [False, True])
+def test_invoke_with_shared_memory(path, stream_requests):
+    streams = []
+
+    def input_fn(stream, content_type):
+        streams.append(stream)
+        return _encoders.decode(stream.read(), content_type)
+
+    serve(path, stream_requests, **({'input_fn': input_fn} if stream_requests else {}))
+
+    data = np.arange(1000, dtype=np.float64)
+    client = _ipc.Client(path, shared_memory_min_size=1024)
+
+    with patch.object(_ipc.Client, '_send_shared', autospec=True, side_effect=_ipc.Client._send_shared) as send_shared:
+        status, content_type, body = client.invoke(_encoders.array_to_npy(data), _content_types.NPY,
+                                                   _content_types.NPY)
+    assert send_shared.called
+
+    assert status == http_client.OK
+    assert content_type == _content_types.NPY
+    np.testing.assert_array_equal(_encoders.npy_to_numpy(body), data * 2)
+    # the shared memory is unmapped once the response is sent.
+    assert len(streams) == (1 if stream_requests else 0)
+    assert all(stream.closed for stream in streams)
+
+
+def test_invoke_with_stream_requests(path):
+    serve(path, stream_requests=True, input_fn=lambda stream, content_type: json.loads(stream.read().decode('utf-8')))
+
+    status, _, body = _ipc.Client(path).invoke(b'[3]')
+
+    assert status == http_client.OK
+    assert json.loads(body.decode('utf-8')) == [3, 3]
+
+
+def test_frames(path):
+    serve(path)
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(path)
+
+    content_type, accept, payload = b'application/json', b'application/json', b'[7]'
+    connection.sendall(struct.pack('>BHHI', 0, len(content_type), len(accept), len(payload)))
+    connection.sendall(content_type + accept + payload)
+
+    status, content_type_size, body_size = struct.unpack('>HHI', _ipc._recv_exactly(connection, 8))
+    assert status == http_client.OK
+    assert _ipc._recv_exactly(connection, content_type_size) == b'application/json'
+    assert _ipc._recv_exactly(connection, body_size) == b'[14]'
+
+    connection.close()
+
+
+def test_payload_too_large(path):
+    serve(path, ipc_kwargs={'max_payload_size': 16})
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(path)
+    connection.sendall(struct.pack('>BHHI', 0, 0, 0, 2 ** 32 - 1))
+
+    status, content_type_size, body_size = struct.unpack('>HHI', _ipc._recv_exactly(connection, 8))
+    assert status == http_client.REQUEST_ENTITY_TOO_LARGE
+    _ipc._recv_exactly(connection, content_type_size + body_size)
+    assert connection.recv(1) == b''
+
+    connection.close()
+    assert _ipc.Client(path).invoke(b'[2]')[2] == b'[4]'
+
+
+@pytest.mark.parametrize('admitted, status', [(True, http_client.OK), (False, http_client.SERVICE_UNAVAILABLE)])
+def test_invoke_with_admission_control(path, admitted, status):
+    admission = MagicMock()
+    admission.acquire.return_value = admitted
+    serve(path, ipc_kwargs={'admission': admission})
+
+    assert _ipc.Client(path).invoke(b'[2]')[0] == status
+    admission.acquire.assert_called_once_with()
+    assert admission.release.called == admitted
+
+
+def test_max_connections(path):
+    serve(path, ipc_kwargs={'max_connections': 1})
+
+    client = _ipc.Client(path)
+    assert client.invoke(b'[2]')[2] == b'[4]'
+
+    # the second connection waits in the backlog until the first one is closed.
+    other_client = _ipc.Client(path)
+    other_client._connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    other_client._connection.connect(path)
+    other_client._connection.settimeout(.2)
+    with pytest.raises(socket.timeout):
+        other_client.invoke(b'[3]')
+
+    client.close()
+    other_client._connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    other_client._connection.connect(path)
+    other_client._connection.settimeout(5)
+    assert other_client.invoke(b'[3]')[2] == b'[6]'
+
+
+def test_invoke_latency(path):
+    # the overhead of the unix socket, without the transformer, stays well below the one of an HTTP request.
+    response = _worker.Response(response=b'42', mimetype=_content_types.JSON)
+    _ipc.serve(lambda content, content_type, accept: response, path)
+    client = _ipc.Client(path)
+
+    latencies = []
+    for _ in range(1000):
+        start = time.time()
+        client.invoke(b'[1]')
+        latencies.append(time.time() - start)
+
+    assert np.median(latencies) < .001
+
+
+def test_listen_replaces_previous_socket(path):
+    _ipc.listen(path).close()
+    assert os.path.exists(path)
+
+    listener = _ipc.listen(path)
+    listener.close()
+
+
+def test_serve_inherited_socket(path):
+    listener = _ipc.listen(path)
+
+    with patch.dict(os.environ, {_params.IPC_SOCKET_FD_ENV: str(listener.fileno())}):
+        serve('/ignored/path')
+
+    assert _ipc.Client(path).invoke(b'[2]')[2] == b'[4]'
@@ -0,0 +1,161 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import errno
+import gc
+import os
+
+from mock import MagicMock, mock_open, patch
+import numpy as np
+import pytest
+
+from sagemaker_containers import _memory, _params
+
+
+def test_rss():
+    before = _memory.rss()
+    data = b'x' * (64 * _memory.MB)
+
+    assert before > 0
+    assert _memory.rss() - before >= len(data) // 2
+
+
+@patch('sagemaker_containers._memory.open', side_effect=IOError(), create=True)
+def test_rss_without_proc(open):
+    assert _memory.rss() > 0
+
+
+def test_freeze():
+    try:
+        _memory.freeze()
+
+        if hasattr(gc, 'freeze'):
+            assert gc.get_freeze_count() > 0
+            gc.unfreeze()
+        else:
+            assert not gc.isenabled()
+    finally:
+        gc.enable()
+
+
+@patch('sagemaker_containers._cache.model_version', lambda model_dir: 'v1')
+def test_shared_array(tmpdir):
+    create_array = MagicMock(return_value=np.arange(12).reshape(3, 4))
+
+    array = _memory.shared_array('weights', create_array, directory=str(tmpdir))
+    array_2 = _memory.shared_array('weights', create_array, directory=str(tmpdir))
+
+    create_array.assert_called_once_with()
+    assert isinstance(array, np.memmap)
+    assert not array.flags.writeable
+    np.testing.assert_array_equal(array, np.arange(12).reshape(3, 4))
+    np.testing.assert_array_equal(array_2, array)
+    assert tmpdir.join('sagemaker-arrays', 'v1', 'weights.npy').check()
+    assert tmpdir.join('sagemaker-arrays', 'v1').listdir() == [tmpdir.join('sagemaker-arrays', 'v1', 'weights.npy')]
+
+
+def test_shared_array_new_model_version(tmpdir):
+    with patch('sagemaker_containers._cache.model_version', lambda model_dir: 'v1'):
+        array = _memory.shared_array('weights', [1, 2, 3], directory=str(tmpdir))
+
+    with patch('sagemaker_containers._cache.model_version', lambda model_dir: 'v2'):
+        array_2 = _memory.shared_array('weights', [4, 5, 6], directory=str(tmpdir))
+
+    np.testing.assert_array_equal(array, [1, 2, 3])
+    np.testing.assert_array_equal(array_2, [4, 5, 6])
+    assert tmpdir.join('sagemaker-arrays').listdir() == [tmpdir.join('sagemaker-arrays', 'v2')]
+
+
+def test_shared_array_with_array(tmpdir):
+    array = _memory.shared_array('weights', [1, 2, 3], directory=str(tmpdir))
+
+    np.testing.assert_array_equal(array, [1, 2, 3])
+
+
+@patch('sagemaker_containers._cache.model_version', lambda model_dir: 'v1')
+@patch('tempfile.gettempdir', lambda: '/fake/tmp')
+def test_shared_array_default_directory(tmpdir):
+    with patch('sagemaker_containers._memory.SHARED_MEMORY_DIR', str(tmpdir)):
+        _memory.shared_array('weights', [1, 2, 3])
+
+    assert tmpdir.join('sagemaker-arrays', 'v1', 'weights.npy').check()
+
+
+@patch('sagemaker_containers._cache.model_version', lambda model_dir: 'v1')
+@patch('sagemaker_containers._memory.logger')
+def test_shared_array_without_free_space(logger, tmpdir):
+    shared_memory_dir, tmp_dir = tmpdir.mkdir('shm'), tmpdir.mkdir('tmp')
+    statvfs = os.statvfs
+
+    def full_statvfs(path):
+        stat = statvfs(path)
+        return MagicMock(f_bavail=0 if path.startswith(str(shared_memory_dir)) else stat.f_bavail,
+                         f_frsize=stat.f_frsize)
+
+    with patch('sagemaker_containers._memory.SHARED_MEMORY_DIR', str(shared_memory_dir)), \
+            patch('tempfile.gettempdir', lambda: str(tmp_dir)), patch('os.statvfs', full_statvfs):
+        array = _memory.shared_array('weights', [1, 2, 3])
+        array_2 = _memory.shared_array('weights', [4, 5, 6])
+
+    np.testing.assert_array_equal(array_2, [1, 2, 3])
+    assert array.filename == str(tmp_dir.join('sagemaker-arrays', 'v1', 'weights.npy'))
+    assert not shared_memory_dir.join('sagemaker-arrays', 'v1', 'weights.npy').check()
+    logger.warning.assert_called_once()
+
+
+@patch('sagemaker_containers._cache.model_version', lambda model_dir: 'v1')
+@patch('os.statvfs', lambda path: MagicMock(f_bavail=0, f_frsize=4096))
+def test_shared_array_without_any_free_space(tmpdir):
+    with pytest.raises(IOError) as e:
+        _memory.shared_array('weights', [1, 2, 3], directory=str(tmpdir))
+
+    assert e.value.errno == errno.ENOSPC
+    assert tmpdir.join('sagemaker-arrays', 'v1').listdir() == []
+
+
+@patch('sagemaker_containers._cache.model_version', lambda model_dir: 'v1')
+def test_shared_array_in_state_dir(tmpdir):
+    with patch.dict('os.environ', {_params.SERVER_STATE_DIR_ENV: str(tmpdir)}):
+        _memory.shared_array('weights', [1, 2, 3])
+
+    assert tmpdir.join('sagemaker-arrays', 'v1', 'weights.npy').check()
+
+
+def test_usage():
+    usage = _memory.usage()
+
+    assert usage.shared >= 0
+    assert usage.private > 0
+
+
+SMAPS_ROLLUP = """00400000-7ffd9e5f2000 ---p 00000000 00:00 0                          [rollup]
+Rss:                3072 kB
+Shared_Clean:       1024 kB
+Shared_Dirty:          1 kB
+Private_Clean:        10 kB
+Private_Dirty:      2037 kB
+Shared_Hugetlb:        0 kB
+"""
+
+
+@patch('sagemaker_containers._memory.open', mock_open(read_data=SMAPS_ROLLUP), create=True)
+def test_usage_from_smaps_rollup():
+    with patch('os.path.exists', lambda path: True):
+        assert _memory.usage() == _memory.Usage(shared=1025 * 1024, private=2047 * 1024)
+
+
+@patch('sagemaker_containers._memory.rss', lambda: 42)
+@patch('sagemaker_containers._memory.open', side_effect=IOError(), create=True)
+def test_usage_without_proc(open):
+    assert _memory.usage() == _memory.Usage(shared=0, private=42)
@@ -0,0 +1,130 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import os
+import subprocess
+
+from mock import patch
+import numpy as np
+import pytest
+
+from sagemaker_containers import _metrics, _params
+
+
+def stage_count(metrics, stage):
+    prefix = 'sagemaker_request_stage_seconds_count{stage="%s"} ' % stage
+    return int([line for line in metrics.prometheus().splitlines() if line.startswith(prefix)][0].split()[-1])
+
+
+def test_observe():
+    metrics = _metrics.Metrics()
+
+    metrics.observe('predict', .003)
+    metrics.observe('predict', .2)
+    metrics.observe('predict', 100)
+
+    lines = metrics.prometheus().splitlines()
+
+    assert 'sagemaker_request_stage_seconds_bucket{stage="predict",le="0.0025"} 0' in lines
+    assert 'sagemaker_request_stage_seconds_bucket{stage="predict",le="0.005"} 1' in lines
+    assert 'sagemaker_request_stage_seconds_bucket{stage="predict",le="0.25"} 2' in lines
+    assert 'sagemaker_request_stage_seconds_bucket{stage="predict",le="60.0"} 2' in lines
+    assert 'sagemaker_request_stage_seconds_bucket{stage="predict",le="+Inf"} 3' in lines
+    assert 'sagemaker_request_stage_seconds_sum{stage="predict"} 100.203' in lines
+    assert 'sagemaker_request_stage_seconds_count{stage="predict"} 3' in lines
+    assert 'sagemaker_request_stage_seconds_count{stage="input"} 0' in lines
+
+
+def test_increment():
+    metrics = _metrics.Metrics()
+
+    metrics.increment('cache_hits')
+    metrics.increment('cache_hits', 2)
+
+    lines = metrics.prometheus().splitlines()
+    assert '# TYPE sagemaker_cache_hits_total counter' in lines
+    assert 'sagemaker_cache_hits_total 3' in lines
+    assert 'sagemaker_cache_misses_total 0' in lines
+
+
+def test_unknown_stage():
+    with pytest.raises(ValueError):
+        _metrics.Metrics().observe('unknown', 1)
+
+
+def test_timer():
+    with patch('sagemaker_containers._metrics.metrics', _metrics.Metrics()):
+        with _metrics.timer('input'):
+            pass
+
+        assert stage_count(_metrics.metrics, 'input') == 1
+
+
+def test_metrics_aggregated_across_workers(tmpdir):
+    with patch.dict('os.environ', {_params.SERVER_STATE_DIR_ENV: str(tmpdir)}):
+        metrics = _metrics.Metrics()
+        metrics.observe('predict', .01)
+
+        assert tmpdir.join('metrics', str(os.getpid())).check()
+
+        other_worker = np.zeros(_metrics._SIZE)
+        other_worker[_metrics.STAGES.index('predict') * _metrics._STAGE_SIZE] = 2
+        other_worker.tofile(str(tmpdir.join('metrics', str(os.getppid()))))
+
+        assert stage_count(metrics, 'predict') == 3
+
+
+def exited_pid():
+    process = subprocess.Popen(['true'])
+    process.wait()
+    return process.pid
+
+
+def test_metrics_of_exited_workers(tmpdir):
+    with patch.dict('os.environ', {_params.SERVER_STATE_DIR_ENV: str(tmpdir)}):
+        metrics = _metrics.Metrics()
+        metrics.observe('predict', .01)
+
+        for pid in exited_pid(), exited_pid():
+            exited_worker = np.zeros(_metrics._SIZE)
+            exited_worker[_metrics.STAGES.index('predict') * _metrics._STAGE_SIZE] = 2
+            exited_worker[-3] = 5
+            exited_worker.tofile(str(tmpdir.join('metrics', str(pid))))
+
+        assert stage_count(metrics, 'predict') == 5
+        assert metrics.value('requests_in_flight') == 0
+        assert set(os.listdir(str(tmpdir.join('metrics')))) == {'exited', str(os.getpid())}
+        assert stage_count(metrics, 'predict') == 5
+
+
+def test_metrics_with_reused_pid(tmpdir):
+    with patch.dict('os.environ', {_params.SERVER_STATE_DIR_ENV: str(tmpdir)}):
+        metrics = _metrics.Metrics()
+        metrics.observe('predict', .01)
+        metrics.add('requests_in_flight', 1)
+
+        # a new process reusing the pid starts with new metrics, and the gauges of the exited one are dropped.
+        metrics = _metrics.Metrics()
+        metrics.observe('predict', .01)
+
+        assert stage_count(metrics, 'predict') == 2
+        assert metrics.value('requests_in_flight') == 0
+        assert tmpdir.join('metrics', 'exited').check()
+
+
+def test_set_gauge():
+    with patch('sagemaker_containers._metrics.metrics', _metrics.Metrics()):
+        _metrics.set_gauge('nginx_start_time_seconds', 42)
+
+        assert _metrics.value('nginx_start_time_seconds') == 42
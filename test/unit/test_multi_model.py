@@ -0,0 +1,105 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import threading
+
+from mock import MagicMock, patch
+import pytest
+
+from sagemaker_containers import _multi_model
+
+
+@pytest.fixture
+def model_dir(tmpdir):
+    for name in ['model-a', 'model-b', 'model-c']:
+        tmpdir.mkdir(name)
+    tmpdir.join('file').write('')
+    return str(tmpdir)
+
+
+def test_model_cache_loads_models_lazily(model_dir):
+    model_fn = MagicMock(side_effect=lambda path: 'model from %s' % path)
+    models = _multi_model.ModelCache(model_fn, model_dir)
+
+    assert models.get('model-a') == 'model from %s/model-a' % model_dir
+    assert models.get('model-a') == 'model from %s/model-a' % model_dir
+
+    model_fn.assert_called_once_with('%s/model-a' % model_dir)
+    assert models.models == ['model-a']
+
+
+@pytest.mark.parametrize('name', [None, '', '.', '..', '../model-a', 'model-a/..', 'file', 'unknown'])
+def test_model_cache_model_not_found(model_dir, name):
+    models = _multi_model.ModelCache(MagicMock(), model_dir)
+
+    with pytest.raises(_multi_model.ModelNotFoundError):
+        models.get(name)
+
+    assert models.models == []
+
+
+@patch('sagemaker_containers._memory.rss')
+def test_model_cache_evicts_least_recently_used_models(rss, model_dir):
+    memory = [0]
+
+    def model_fn(path):
+        memory[0] += 100
+        return path
+
+    rss.side_effect = lambda: memory[0]
+    models = _multi_model.ModelCache(model_fn, model_dir, memory_budget=250)
+
+    models.get('model-a')
+    models.get('model-b')
+    models.get('model-a')
+    models.get('model-c')
+
+    assert models.models == ['model-a', 'model-c']
+    assert models.memory == 200
+
+
+def test_model_cache_never_evicts_the_invoked_model(model_dir):
+    models = _multi_model.ModelCache(lambda path: path, model_dir, memory_budget=1)
+
+    with patch('sagemaker_containers._memory.rss', MagicMock(side_effect=[0, 10])):
+        models.get('model-a')
+
+    assert models.models == ['model-a']
+
+
+def test_model_cache_loads_a_model_once_for_concurrent_requests(model_dir):
+    loading = threading.Event()
+    model_fn = MagicMock(side_effect=lambda path: loading.wait() and path)
+    models = _multi_model.ModelCache(model_fn, model_dir)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(models.get('model-a'))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+
+    loading.set()
+    for thread in threads:
+        thread.join()
+
+    assert model_fn.call_count == 1
+    assert results == ['%s/model-a' % model_dir] * 4
+
+
+def test_model_cache_load_error(model_dir):
+    models = _multi_model.ModelCache(MagicMock(side_effect=ValueError('Failed')), model_dir)
+
+    with pytest.raises(ValueError):
+        models.get('model-a')
+
+    assert models.models == []
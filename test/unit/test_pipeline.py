@@ -0,0 +1,93 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import threading
+
+from mock import patch
+import pytest
+
+from sagemaker_containers import _pipeline
+
+
+def test_run():
+    pipeline = _pipeline.Pipeline([_pipeline.Stage('decode', int, 2),
+                                   _pipeline.Stage('predict', lambda x: x * 2, 1),
+                                   _pipeline.Stage('encode', str, 2)], queue_size=4)
+
+    assert [pipeline.run(str(i)) for i in range(5)] == ['0', '2', '4', '6', '8']
+
+
+def test_stages_overlap():
+    predicting = threading.Event()
+    decoded = threading.Event()
+
+    def predict(x):
+        if x == 1:
+            predicting.set()
+            # the first request is predicted until the second one is decoded.
+            assert decoded.wait(5)
+        return x
+
+    def decode(x):
+        if x == 2:
+            assert predicting.wait(5)
+            decoded.set()
+        return x
+
+    pipeline = _pipeline.Pipeline([_pipeline.Stage('decode', decode, 2),
+                                   _pipeline.Stage('predict', predict, 1)], queue_size=2)
+
+    results = {}
+    threads = [threading.Thread(target=lambda x=x: results.update({x: pipeline.run(x)})) for x in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == {1: 1, 2: 2}
+
+
+def test_final():
+    def decode(x):
+        return _pipeline.Final('error') if x < 0 else x
+
+    pipeline = _pipeline.Pipeline([_pipeline.Stage('decode', decode, 1),
+                                   _pipeline.Stage('predict', lambda x: x * 2, 1)], queue_size=1)
+
+    assert pipeline.run(-1) == 'error'
+    assert pipeline.run(1) == 2
+
+
+def test_error():
+    pipeline = _pipeline.Pipeline([_pipeline.Stage('decode', int, 1)], queue_size=1)
+
+    with pytest.raises(ValueError):
+        pipeline.run('not a number')
+
+    assert pipeline.run('42') == 42
+
+
+def test_threads_started_once_per_process():
+    pipeline = _pipeline.Pipeline([_pipeline.Stage('decode', int, 2)], queue_size=1)
+
+    with patch('threading.Thread') as thread:
+        pipeline._start()
+        pipeline._start()
+
+        assert thread.call_count == 2
+
+        with patch('os.getpid', lambda: -1):
+            pipeline._start()
+
+        assert thread.call_count == 4
@@ -0,0 +1,107 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import os
+
+from mock import patch
+import pytest
+
+from sagemaker_containers import _params, _readiness
+
+
+@pytest.fixture(name='state_dir')
+def create_state_dir(tmpdir):
+    with patch.dict('os.environ', {_params.SERVER_STATE_DIR_ENV: str(tmpdir)}):
+        yield str(tmpdir)
+
+
+def test_is_ready_without_state_dir():
+    with patch.dict('os.environ', clear=True):
+        assert _readiness.state_dir() is None
+        assert _readiness.is_ready()
+
+
+def test_mark_ready_without_state_dir():
+    with patch.dict('os.environ', clear=True):
+        _readiness.mark_ready(2)
+
+
+def test_mark_ready(state_dir):
+    assert not _readiness.is_ready()
+
+    _readiness.mark_ready(2)
+
+    assert os.listdir(os.path.join(state_dir, _readiness.WORKERS_DIR)) == [str(os.getpid())]
+    assert not _readiness.is_ready()
+
+    with patch('os.getpid', os.getppid):
+        _readiness.mark_ready(2)
+
+    assert _readiness.is_ready()
+
+
+def test_mark_ready_single_worker(state_dir):
+    _readiness.mark_ready(1)
+
+    assert _readiness.is_ready()
+
+
+def test_ready_workers(state_dir):
+    assert _readiness.ready_workers() == set()
+
+    _readiness.mark_ready(2)
+    with patch('os.getpid', os.getppid):
+        _readiness.mark_ready(2)
+
+    assert _readiness.ready_workers() == {os.getpid(), os.getppid()}
+
+
+def test_ready_workers_ignores_exited_workers(state_dir):
+    _readiness.mark_ready(2)
+    # a pid that is not running.
+    with patch('os.getpid', lambda: 2 ** 22 + 1):
+        _readiness.mark_ready(2)
+
+    assert _readiness.ready_workers() == {os.getpid()}
+    assert not _readiness.is_ready()
+
+
+def test_remove_worker(state_dir):
+    _readiness.mark_ready(1)
+    with patch('os.getpid', os.getppid):
+        _readiness.mark_ready(1)
+
+    _readiness.remove_worker(os.getppid())
+
+    assert _readiness.ready_workers() == {os.getpid()}
+    assert _readiness.is_ready()
+
+    _readiness.remove_worker(os.getpid())
+
+    assert _readiness.ready_workers() == set()
+    assert not _readiness.is_ready()
+
+
+def test_reset(state_dir):
+    _readiness.mark_ready(1)
+
+    _readiness.reset()
+
+    assert not _readiness.is_ready()
+    assert _readiness.ready_workers() == set()
+
+
+def test_reset_without_state_dir():
+    with patch.dict('os.environ', clear=True):
+        _readiness.reset()
@@ -0,0 +1,70 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import io
+import struct
+
+import pytest
+
+from sagemaker_containers import _records
+
+
+def test_split_none():
+    assert _records.split(b'1,2\n3,4\n', _records.NONE) == [b'1,2\n3,4\n']
+    assert _records.split(b'', _records.NONE) == []
+
+
+def test_split_line():
+    assert _records.split(b'1,2\r\n3,4\n\n5,6', _records.LINE) == [b'1,2', b'3,4', b'5,6']
+
+
+def test_split_recordio():
+    records = [b'', b'a', b'abcd', b'abcdefg']
+
+    assert _records.split(_records.recordio_encode(records), _records.RECORDIO) == records
+
+
+def test_split_recordio_multiple_parts():
+    magic = struct.pack('<I', _records.RECORDIO_MAGIC)
+    data = (magic + struct.pack('<I', 1 << 29 | 2) + b'ab\x00\x00' +
+            magic + struct.pack('<I', 2 << 29 | 1) + b'c\x00\x00\x00' +
+            magic + struct.pack('<I', 3 << 29 | 1) + b'd\x00\x00\x00')
+
+    assert _records.split(data, _records.RECORDIO) == [magic.join([b'ab', b'c', b'd'])]
+
+
+@pytest.mark.parametrize('data', [b'\x00' * 8, _records.recordio_encode([b'abcd'])[:10],
+                                  _records.recordio_encode([b'abcd'])[:6]])
+def test_split_invalid_recordio(data):
+    with pytest.raises(ValueError):
+        _records.split(data, _records.RECORDIO)
+
+
+@pytest.mark.parametrize('split_type, data', [
+    (_records.NONE, b'1,2\n3,4\n'),
+    (_records.LINE, b'1,2\r\n3,4\n\n5,6'),
+    (_records.RECORDIO, _records.recordio_encode([b'', b'a', b'abcde']))])
+def test_read(split_type, data):
+    assert list(_records.read(io.BytesIO(data), split_type)) == _records.split(data, split_type)
+
+
+def test_read_is_incremental():
+    f = io.BytesIO(b'1,2\n3,4\n')
+    records = _records.read(f, _records.LINE)
+
+    assert next(records) == b'1,2'
+    assert f.tell() < len(f.getvalue())
+
+
+def test_split_invalid_split_type():
+    with pytest.raises(ValueError):
+        _records.split(b'', 'TFRecord')
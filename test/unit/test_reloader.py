@@ -0,0 +1,149 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import os
+import signal
+
+from mock import MagicMock, patch
+import numpy as np
+import pytest
+
+from sagemaker_containers import _memory, _reloader
+
+
+class Gunicorn(object):
+    """Fake gunicorn master, replacing its oldest worker by a new ready one on TTIN and TTOU. New workers load
+    the model with load_model."""
+
+    def __init__(self, workers, ready=True):
+        self.workers = list(workers)
+        self.ready = set(workers)
+        self.next_pid = max(workers) + 1
+        self.new_workers_ready = ready
+        self.workers_exit = True
+        self.load_model = lambda: None
+        self.models = {}
+
+    def kill(self, pid, signo):
+        if signo == signal.SIGTTIN:
+            self.workers.append(self.next_pid)
+            self.models[self.next_pid] = self.load_model()
+            if self.new_workers_ready:
+                self.ready.add(self.next_pid)
+            self.next_pid += 1
+        elif signo == signal.SIGTTOU and self.workers_exit:
+            self.workers.pop(0)
+
+
+@pytest.fixture(name='gunicorn')
+def fixture_gunicorn():
+    gunicorn = Gunicorn([10, 11])
+
+    with patch('os.kill', gunicorn.kill), patch('time.sleep'), \
+            patch('sagemaker_containers._autoscaler._children', lambda pid: list(gunicorn.workers)), \
+            patch('sagemaker_containers._readiness.ready_workers', lambda: set(gunicorn.ready)):
+        yield gunicorn
+
+
+def test_reload(gunicorn, tmpdir):
+    reloader = _reloader.Reloader(1, str(tmpdir))
+
+    assert reloader.reload()
+
+    assert gunicorn.workers == [12, 13]
+    assert reloader.reloads == 1
+
+
+def test_reload_aborted_when_new_worker_is_not_ready(gunicorn, tmpdir):
+    gunicorn.new_workers_ready = False
+    reloader = _reloader.Reloader(1, str(tmpdir))
+
+    with patch('sagemaker_containers._reloader.READY_TIMEOUT', 0):
+        assert not reloader.reload()
+
+    assert gunicorn.workers == [10, 11, 12]
+    assert reloader.reloads == 0
+
+
+def test_reload_fails_when_old_workers_do_not_exit(gunicorn, tmpdir):
+    gunicorn.workers_exit = False
+    reloader = _reloader.Reloader(1, str(tmpdir))
+
+    with patch('sagemaker_containers._reloader.STOP_TIMEOUT', 0):
+        assert not reloader.reload()
+
+    assert reloader.reloads == 0
+
+
+def test_reload_pauses_autoscaler(gunicorn, tmpdir):
+    autoscaler = MagicMock()
+    gunicorn.load_model = lambda: autoscaler.pause.called and not autoscaler.resume.called
+    reloader = _reloader.Reloader(1, str(tmpdir), autoscaler=autoscaler)
+
+    assert reloader.reload()
+
+    assert gunicorn.models == {12: True, 13: True}
+    autoscaler.resume.assert_called_once_with()
+
+
+def test_reload_shared_array(gunicorn, tmpdir):
+    model_dir, state_dir = tmpdir.mkdir('model'), tmpdir.mkdir('state')
+    weights = str(model_dir.join('weights.npy'))
+
+    def load_model():
+        return _memory.shared_array('weights', lambda: np.load(weights), directory=str(state_dir))
+
+    np.save(weights, np.array([1, 2, 3]))
+    with patch('sagemaker_containers._env.model_dir', str(model_dir)):
+        old_model = load_model()
+
+        np.save(weights, np.array([4, 5, 6, 7]))
+        gunicorn.load_model = load_model
+        assert _reloader.Reloader(1, str(model_dir)).reload()
+
+    np.testing.assert_array_equal(old_model, [1, 2, 3])
+    for pid in gunicorn.workers:
+        np.testing.assert_array_equal(gunicorn.models[pid], [4, 5, 6, 7])
+    assert len(os.listdir(str(state_dir.join('sagemaker-arrays')))) == 1
+
+
+@patch('os.kill')
+def test_reload_with_preloaded_model(kill, tmpdir):
+    reloader = _reloader.Reloader(1, str(tmpdir), preload_model=True)
+
+    assert not reloader.reload()
+    kill.assert_not_called()
+
+
+@patch('time.sleep')
+def test_model_changed(sleep, tmpdir):
+    reloader = _reloader.Reloader(1, str(tmpdir), interval=5)
+
+    assert not reloader._model_changed()
+
+    tmpdir.join('model.pkl').write('new model')
+
+    assert reloader._model_changed()
+    sleep.assert_called_with(5)
+
+
+@patch('signal.signal')
+@patch('threading.Thread')
+def test_start(thread, signal_fn, tmpdir):
+    reloader = _reloader.Reloader(1, str(tmpdir))
+    reloader.start()
+
+    assert signal_fn.call_args[0][0] == signal.SIGHUP
+    signal_fn.call_args[0][1](signal.SIGHUP, None)
+
+    assert reloader._requested.is_set()
+    thread.return_value.start.assert_called_with()
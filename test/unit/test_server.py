@@ -10,9 +10,46 @@
 # distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
 # ANY KIND, either express or implied. See the License for the specific
 # language governing permissions and limitations under the License.
-from mock import call, patch, PropertyMock
+import os
+import signal
+import stat
 
-from sagemaker_containers import _env, _server
+from mock import call, MagicMock, patch, PropertyMock
+import pytest
+import six
+
+import sagemaker_containers
+
+from sagemaker_containers import _env, _params, _server
+
+create_state_dir = _server._create_state_dir
+
+
+@pytest.fixture(autouse=True)
+def patch_state_dir():
+    with patch.dict('os.environ'), patch('sagemaker_containers._server._create_state_dir', lambda: '/tmp/state'), \
+            patch('sagemaker_containers._metrics.set_gauge'):
+        yield
+
+
+def test_create_state_dir(tmpdir):
+    with patch('sagemaker_containers._memory.SHARED_MEMORY_DIR', str(tmpdir)):
+        state_dir = create_state_dir()
+
+    assert os.path.dirname(state_dir) == str(tmpdir)
+    assert stat.S_IMODE(os.stat(state_dir).st_mode) == 0o755
+
+
+@patch.object(_env.ServingEnv, 'model_server_worker_class', PropertyMock(return_value='asgi'))
+@patch.object(_env.ServingEnv, 'max_concurrent_requests', PropertyMock(return_value=4))
+@patch('sagemaker_containers._env.num_gpus', lambda: 0)
+@patch('subprocess.Popen')
+def test_start_asgi_with_admission_control(popen):
+    with pytest.raises(ValueError) as e:
+        _server.start('my_module')
+
+    assert 'max_concurrent_requests is not supported' in str(e.value)
+    popen.assert_not_called()
 
 
 @patch.object(_env.ServingEnv, 'model_server_workers', PropertyMock(return_value=2))
@@ -31,16 +68,18 @@ def test_start_no_nginx(popen):
          '--worker-connections', '2000',
          '-w', '2',
          '--log-level', 'info',
+         '-c', 'python:sagemaker_containers._gunicorn',
          'my_module'])]
 
     _server.start('my_module')
     popen.assert_has_calls(calls)
+    assert os.environ[_params.SERVER_STATE_DIR_ENV] == '/tmp/state'
 
 
 @patch.object(_env.ServingEnv, 'model_server_workers', PropertyMock(return_value=2))
 @patch.object(_env.ServingEnv, 'model_server_timeout', PropertyMock(return_value=100))
 @patch.object(_env.ServingEnv, 'use_nginx', PropertyMock(return_value=True))
-@patch('pkg_resources.resource_filename', lambda x, y: '/tmp/nginx.conf')
+@patch('sagemaker_containers._server._create_nginx_config', lambda env: '/tmp/nginx.conf')
 @patch('sagemaker_containers._env.num_gpus', lambda: 0)
 @patch('os.wait', lambda: (-1, 0))
 @patch('subprocess.Popen')
@@ -53,9 +92,295 @@ def test_start_with_nginx(popen):
               '-k', 'gevent',
               '-b', 'unix:/tmp/gunicorn.sock',
               '--worker-connections', '2000',
+              '--keep-alive', '3600',
               '-w', '2',
               '--log-level', 'info',
+              '-c', 'python:sagemaker_containers._gunicorn',
               'my_module'])
     ]
     _server.start('my_module')
     popen.assert_has_calls(calls)
+
+
+@patch.object(_env.ServingEnv, 'model_server_workers', PropertyMock(return_value=2))
+@patch.object(_env.ServingEnv, 'model_server_timeout', PropertyMock(return_value=100))
+@patch.object(_env.ServingEnv, 'use_nginx', PropertyMock(return_value=False))
+@patch.object(_env.ServingEnv, 'preload_model', PropertyMock(return_value=True))
+@patch('sagemaker_containers._env.num_gpus', lambda: 0)
+@patch('os.wait', lambda: (-1, 0))
+@patch('subprocess.Popen')
+def test_start_with_preload_model(popen):
+    popen.return_value.pid = -1
+    calls = [call(
+        ['gunicorn',
+         '--timeout', '100',
+         '-k', 'gevent',
+         '-b', '0.0.0.0:8080',
+         '--worker-connections', '2000',
+         '-w', '2',
+         '--log-level', 'info',
+         '-c', 'python:sagemaker_containers._gunicorn',
+         '--preload',
+         'my_module'])]
+
+    _server.start('my_module')
+    popen.assert_has_calls(calls)
+
+
+@patch.object(_env.ServingEnv, 'model_server_workers', PropertyMock(return_value=2))
+@patch.object(_env.ServingEnv, 'model_server_timeout', PropertyMock(return_value=100))
+@patch.object(_env.ServingEnv, 'use_nginx', PropertyMock(return_value=False))
+@patch.object(_env.ServingEnv, 'model_server_worker_class', PropertyMock(return_value='gthread'))
+@patch.object(_env.ServingEnv, 'model_server_threads', PropertyMock(return_value=8))
+@patch('sagemaker_containers._env.num_gpus', lambda: 0)
+@patch('os.wait', lambda: (-1, 0))
+@patch('subprocess.Popen')
+def test_start_with_gthread_worker_class(popen):
+    popen.return_value.pid = -1
+    calls = [call(
+        ['gunicorn',
+         '--timeout', '100',
+         '-k', 'gthread',
+         '-b', '0.0.0.0:8080',
+         '--threads', '8',
+         '-w', '2',
+         '--log-level', 'info',
+         '-c', 'python:sagemaker_containers._gunicorn',
+         'my_module'])]
+
+    _server.start('my_module')
+    popen.assert_has_calls(calls)
+
+
+@patch.object(_env.ServingEnv, 'model_server_worker_class', PropertyMock(return_value='eventlet'))
+@patch('sagemaker_containers._env.num_gpus', lambda: 0)
+@patch('subprocess.Popen')
+def test_start_with_invalid_worker_class(popen):
+    with pytest.raises(ValueError) as e:
+        _server.start('my_module')
+
+    assert 'Invalid model server worker class eventlet' in str(e.value)
+    popen.assert_not_called()
+
+
+@patch.object(_env.ServingEnv, 'model_server_workers', PropertyMock(return_value=2))
+@patch.object(_env.ServingEnv, 'model_server_timeout', PropertyMock(return_value=100))
+@patch.object(_env.ServingEnv, 'use_nginx', PropertyMock(return_value=False))
+@patch.object(_env.ServingEnv, 'model_server_worker_class', PropertyMock(return_value='asgi'))
+@patch('sagemaker_containers._env.num_gpus', lambda: 0)
+@patch('os.wait', lambda: (-1, 0))
+@patch('subprocess.Popen')
+def test_start_with_asgi_worker_class(popen):
+    popen.return_value.pid = -1
+    calls = [call(
+        ['gunicorn',
+         '--timeout', '100',
+         '-k', 'uvicorn.workers.UvicornWorker',
+         '-b', '0.0.0.0:8080',
+         '-w', '2',
+         '--log-level', 'info',
+         '-c', 'python:sagemaker_containers._gunicorn',
+         'my_module'])]
+
+    _server.start('my_module')
+    popen.assert_has_calls(calls)
+
+
+@patch.object(_env.ServingEnv, 'model_server_workers', PropertyMock(return_value=2))
+@patch.object(_env.ServingEnv, 'model_server_min_workers', PropertyMock(return_value=1))
+@patch.object(_env.ServingEnv, 'model_server_max_workers', PropertyMock(return_value=4))
+@patch.object(_env.ServingEnv, 'use_nginx', PropertyMock(return_value=False))
+@patch('sagemaker_containers._env.num_gpus', lambda: 0)
+@patch('os.wait', lambda: (-1, 0))
+@patch('sagemaker_containers._autoscaler.Autoscaler')
+@patch('subprocess.Popen')
+def test_start_with_autoscaling(popen, autoscaler):
+    popen.return_value.pid = -1
+
+    _server.start('my_module')
+
+    autoscaler.assert_called_with(-1, 2, 1, 4, 1)
+    autoscaler.return_value.start.assert_called_with()
+
+
+@patch.object(_env.ServingEnv, 'model_server_workers', PropertyMock(return_value=2))
+@patch.object(_env.ServingEnv, 'model_server_min_workers', PropertyMock(return_value=1))
+@patch.object(_env.ServingEnv, 'model_server_max_workers', PropertyMock(return_value=4))
+@patch.object(_env.ServingEnv, 'use_nginx', PropertyMock(return_value=True))
+@patch('sagemaker_containers._server._create_nginx_config', lambda env: '/tmp/nginx.conf')
+@patch('sagemaker_containers._env.num_gpus', lambda: 0)
+@patch('sagemaker_containers._readiness.reset')
+@patch('sagemaker_containers._reloader.Reloader')
+@patch('sagemaker_containers._autoscaler.Autoscaler')
+@patch('sagemaker_containers._supervisor.Supervisor')
+def test_start_supervises_nginx_and_gunicorn(supervisor, autoscaler, reloader, reset):
+    _server.start('my_module')
+
+    nginx, gunicorn = supervisor.call_args[0][0]
+    assert (nginx.name, nginx.args, nginx.stop_signal) == ('nginx', ['nginx', '-c', '/tmp/nginx.conf'],
+                                                           signal.SIGQUIT)
+    assert (gunicorn.name, gunicorn.args[0], gunicorn.stop_signal) == ('gunicorn', 'gunicorn', signal.SIGTERM)
+    supervisor.return_value.start.assert_called_with()
+    supervisor.return_value.run.assert_called_with()
+    assert reloader.call_args[0][4] == autoscaler.return_value
+
+    # gunicorn restarted by the supervisor.
+    gunicorn.process = MagicMock(pid=42)
+    gunicorn.on_start(gunicorn)
+
+    reset.assert_called_with()
+    assert reloader.return_value.master_pid == 42
+    autoscaler.return_value.follow.assert_called_with(42, 2)
+
+
+@patch.object(_env.ServingEnv, 'model_server_workers', PropertyMock(return_value=2))
+@patch.object(_env.ServingEnv, 'model_server_timeout', PropertyMock(return_value=100))
+@patch.object(_env.ServingEnv, 'use_nginx', PropertyMock(return_value=False))
+@patch.object(_env.ServingEnv, 'model_server_cpu_affinity', PropertyMock(return_value=True))
+@patch('sagemaker_containers._affinity.available_cpus', lambda: [0, 1, 2, 3, 4, 5])
+@patch('sagemaker_containers._env.num_gpus', lambda: 0)
+@patch('os.wait', lambda: (-1, 0))
+@patch('subprocess.Popen')
+def test_start_with_cpu_affinity(popen):
+    popen.return_value.pid = -1
+    calls = [call(
+        ['gunicorn',
+         '--timeout', '100',
+         '-k', 'gevent',
+         '-b', '0.0.0.0:8080',
+         '--worker-connections', '2000',
+         '-w', '2',
+         '--log-level', 'info',
+         '-c', 'python:sagemaker_containers._gunicorn',
+         'my_module'])]
+
+    _server.start('my_module')
+
+    popen.assert_has_calls(calls)
+    assert os.environ['OMP_NUM_THREADS'] == '3'
+    assert os.environ['MKL_NUM_THREADS'] == '3'
+    assert os.environ[_params.CPU_AFFINITY_WORKERS_ENV] == '2'
+
+
+@patch.object(_env.ServingEnv, 'use_nginx', PropertyMock(return_value=False))
+@patch.object(_env.ServingEnv, 'model_server_reload_interval', PropertyMock(return_value=30))
+@patch('sagemaker_containers._env.num_gpus', lambda: 0)
+@patch('os.wait', lambda: (-1, 0))
+@patch('sagemaker_containers._reloader.Reloader')
+@patch('subprocess.Popen')
+def test_start_with_model_reload(popen, reloader):
+    popen.return_value.pid = -1
+
+    _server.start('my_module')
+
+    reloader.assert_called_with(-1, _env.model_dir, 30, False, None)
+    reloader.return_value.start.assert_called_with()
+
+
+@patch.object(_env.ServingEnv, 'use_nginx', PropertyMock(return_value=False))
+@patch.object(_env.ServingEnv, 'fast_ping', PropertyMock(return_value=True))
+@patch('sagemaker_containers._env.num_gpus', lambda: 0)
+@patch('os.wait', lambda: (-1, 0))
+@patch('sagemaker_containers._reloader.Reloader')
+@patch('sagemaker_containers._server.logger')
+@patch('subprocess.Popen')
+def test_start_with_fast_ping_without_nginx(popen, logger, reloader):
+    popen.return_value.pid = -1
+
+    _server.start('my_module')
+
+    logger.warning.assert_called_with('fast_ping ignored: /ping is answered by the workers without nginx.')
+
+
+@patch.object(_env.ServingEnv, 'use_nginx', PropertyMock(return_value=False))
+@patch.object(_env.ServingEnv, 'ipc_socket', PropertyMock(return_value='/tmp/model.sock'))
+@patch('sagemaker_containers._env.num_gpus', lambda: 0)
+@patch('os.wait', lambda: (-1, 0))
+@patch('sagemaker_containers._reloader.Reloader')
+@patch('sagemaker_containers._ipc.listen')
+@patch('subprocess.Popen')
+def test_start_with_ipc_socket(popen, listen, reloader):
+    popen.return_value.pid = -1
+    listen.return_value.fileno.return_value = 42
+
+    _server.start('my_module')
+
+    assert os.environ[_params.IPC_SOCKET_FD_ENV] == '42'
+
+    listen.assert_called_with('/tmp/model.sock')
+    gunicorn_args = popen.call_args_list[-1]
+    assert gunicorn_args[1] == ({'pass_fds': (42,)} if six.PY3 else {})
+
+
+def template_filename(package, resource):
+    return os.path.join(os.path.dirname(sagemaker_containers.__file__), '..', '..', 'etc', os.path.basename(resource))
+
+
+@pytest.mark.parametrize('upstream_keepalive, proxy_buffering, expected_keepalive, expected_buffering', [
+    (32, True, 'keepalive 32;', 'proxy_buffering on;'),
+    (0, False, None, 'proxy_buffering off;')
+])
+@patch.object(_env.ServingEnv, 'nginx_worker_processes', PropertyMock(return_value=4))
+@patch.object(_env.ServingEnv, 'nginx_worker_connections', PropertyMock(return_value=1024))
+@patch.object(_env.ServingEnv, 'nginx_keepalive_timeout', PropertyMock(return_value=75))
+@patch('pkg_resources.resource_filename', template_filename)
+@patch('sagemaker_containers._env.num_gpus', lambda: 0)
+def test_create_nginx_config(tmpdir, upstream_keepalive, proxy_buffering, expected_keepalive, expected_buffering):
+    config_file = str(tmpdir.join('nginx.conf'))
+
+    with patch.object(_env.ServingEnv, 'nginx_upstream_keepalive', PropertyMock(return_value=upstream_keepalive)), \
+            patch.object(_env.ServingEnv, 'nginx_proxy_buffering', PropertyMock(return_value=proxy_buffering)), \
+            patch('sagemaker_containers._server.NGINX_CONFIG_FILE', config_file):
+        assert _server._create_nginx_config(_env.ServingEnv()) == config_file
+
+    with open(config_file) as f:
+        lines = [line.strip() for line in f.read().splitlines()]
+
+    assert 'worker_processes 4;' in lines
+    assert 'worker_connections 1024;' in lines
+    assert 'keepalive_timeout 75;' in lines
+    assert 'client_body_buffer_size 6m;' in lines
+    assert 'location ~ ^/(ping|invocations|metrics|models/[^/]+/invoke) {' in lines
+    assert expected_buffering in lines
+    if expected_keepalive:
+        assert expected_keepalive in lines
+    else:
+        assert not any(line.startswith('keepalive ') for line in lines)
+
+
+@patch.object(_env.ServingEnv, 'fast_ping', PropertyMock(return_value=True))
+@patch('pkg_resources.resource_filename', template_filename)
+@patch('sagemaker_containers._env.num_gpus', lambda: 0)
+def test_create_nginx_config_with_fast_ping(tmpdir):
+    config_file = str(tmpdir.join('nginx.conf'))
+    ready_file = str(tmpdir.join('ready'))
+
+    with patch('sagemaker_containers._server.NGINX_CONFIG_FILE', config_file), \
+            patch('sagemaker_containers._readiness.ready_file', lambda: ready_file):
+        _server._create_nginx_config(_env.ServingEnv())
+
+    with open(config_file) as f:
+        config = f.read()
+    lines = [line.strip() for line in config.splitlines()]
+
+    assert 'location = /ping {' in lines
+    assert 'if (-f %s) {' % ready_file in lines
+    assert 'return 503;' in lines
+    assert config.index('location = /ping {') < config.index('location ~ ^/(ping|invocations')
+
+
+@patch.object(_env.ServingEnv, 'response_compression', PropertyMock(return_value=True))
+@patch.object(_env.ServingEnv, 'response_compression_min_size', PropertyMock(return_value=2048))
+@patch('pkg_resources.resource_filename', template_filename)
+@patch('sagemaker_containers._env.num_gpus', lambda: 0)
+def test_create_nginx_config_with_response_compression(tmpdir):
+    config_file = str(tmpdir.join('nginx.conf'))
+
+    with patch('sagemaker_containers._server.NGINX_CONFIG_FILE', config_file):
+        _server._create_nginx_config(_env.ServingEnv())
+
+    with open(config_file) as f:
+        lines = [line.strip() for line in f.read().splitlines()]
+
+    assert 'gzip on;' in lines
+    assert 'gzip_min_length 2048;' in lines
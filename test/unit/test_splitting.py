@@ -0,0 +1,98 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import threading
+
+from mock import MagicMock
+import pytest
+from six.moves import http_client
+
+from sagemaker_containers import _content_types, _encoders, _splitting, _worker
+
+
+def transform_fn(model, content, content_type, accept):
+    return _worker.Response(_encoders.encode(_encoders.decode(content, content_type) * 2, accept), accept)
+
+
+@pytest.mark.parametrize('records, threads, expected', [(10, 4, 1), (128, 4, 2), (1000, 4, 4), (1000, 1, 1)])
+def test_chunks(records, threads, expected):
+    content = '\n'.join(str(i) for i in range(records))
+
+    chunks = _splitting.Splitter(transform_fn, threads, min_chunk_records=64).chunks(content)
+
+    assert len(chunks) == expected
+    assert ''.join(chunks) == content
+
+
+def test_chunks_keeps_empty_records():
+    content = b'1,2\n\n' * 4
+
+    assert _splitting.Splitter(transform_fn, 2, min_chunk_records=4).chunks(content) == [b'1,2\n\n1,2\n\n'] * 2
+
+
+def test_chunks_with_quotes():
+    splitter = _splitting.Splitter(transform_fn, 2, min_chunk_records=1)
+
+    assert splitter.chunks(u'1,"a\nb"\n2,c\n') == [u'1,"a\nb"\n2,c\n']
+    assert splitter.chunks(b'{"a": 1}\n{"a": 2}\n', _content_types.JSONLINES) == [b'{"a": 1}\n', b'{"a": 2}\n']
+
+
+@pytest.mark.parametrize('content_type, accept', [(_content_types.CSV, _content_types.CSV),
+                                                  (_content_types.JSONLINES, _content_types.JSONLINES),
+                                                  (_content_types.CSV, _content_types.JSONLINES)])
+def test_transform(content_type, accept):
+    content = _encoders.encode([[i, i + 1] for i in range(200)], content_type)
+    threads = set()
+
+    def chunk_transform_fn(model, content, content_type, accept):
+        threads.add(threading.current_thread().ident)
+        return transform_fn(model, content, content_type, accept)
+
+    splitter = _splitting.Splitter(chunk_transform_fn, 4, min_chunk_records=10)
+    response = splitter.transform(MagicMock(), content, content_type, accept)
+
+    assert response.status_code == http_client.OK
+    assert response.mimetype == accept
+    assert response.get_data(as_text=True) == transform_fn(None, content, content_type, accept).get_data(as_text=True)
+    assert threading.current_thread().ident not in threads
+
+
+@pytest.mark.parametrize('content, content_type, accept', [('[[1, 2], [3, 4]]', _content_types.JSON,
+                                                            _content_types.CSV),
+                                                           ('1\n2\n3\n4', _content_types.CSV, _content_types.JSON),
+                                                           ('1\n2', _content_types.CSV, _content_types.CSV)])
+def test_transform_without_splitting(content, content_type, accept):
+    chunk_transform_fn = MagicMock()
+
+    splitter = _splitting.Splitter(chunk_transform_fn, 4, min_chunk_records=2)
+    splitter.transform('model', content, content_type, accept)
+
+    chunk_transform_fn.assert_called_once_with('model', content, content_type, accept)
+
+
+def test_transform_with_error():
+    def chunk_transform_fn(model, content, content_type, accept):
+        if content.startswith('3'):
+            return _worker.Response('error', status=http_client.UNSUPPORTED_MEDIA_TYPE)
+        return _worker.Response(content, accept)
+
+    splitter = _splitting.Splitter(chunk_transform_fn, 2, min_chunk_records=2)
+    response = splitter.transform(None, '1\n2\n3\n4', _content_types.CSV, _content_types.CSV)
+
+    assert response.status_code == http_client.UNSUPPORTED_MEDIA_TYPE
+    assert response.get_data(as_text=True) == 'error'
+
+
+def test_join():
+    assert _splitting._join([b'1\n2\n', b'3\n4', b'5']) == b'1\n2\n3\n4\n5'
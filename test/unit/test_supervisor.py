@@ -0,0 +1,110 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import signal
+import sys
+import threading
+
+from mock import MagicMock, patch
+import pytest
+
+from sagemaker_containers import _metrics, _supervisor
+
+SLEEP = [sys.executable, '-c', 'import time; time.sleep(60)']
+CRASH = [sys.executable, '-c', 'import sys; sys.exit(1)']
+
+
+def crash_once(marker):
+    # crashes the first time, when the marker does not exist, and exits without error the second time.
+    return [sys.executable, '-c', 'import os, sys; open(sys.argv[1], "a"); sys.exit(0 if os.path.getsize(sys.argv[1]) '
+                                  'else open(sys.argv[1], "w").write("x"))', marker]
+
+
+@pytest.fixture(autouse=True)
+def patch_supervisor():
+    with patch('signal.signal'), patch.object(_supervisor, 'RESTART_DELAY', 0), \
+            patch.object(_supervisor, 'MAX_FAILURES', 3):
+        yield
+
+
+def test_restart_crashed_child(tmpdir):
+    restarts = _metrics.value('nginx_restarts')
+    on_start = MagicMock()
+
+    nginx = _supervisor.Child('nginx', crash_once(str(tmpdir.join('marker'))), on_start=on_start)
+    gunicorn = _supervisor.Child('gunicorn', SLEEP)
+    supervisor = _supervisor.Supervisor([nginx, gunicorn])
+
+    supervisor.start()
+    gunicorn_pid = gunicorn.pid
+    supervisor.run()
+
+    assert nginx.restarts == 1
+    assert on_start.call_count == 2
+    assert gunicorn.restarts == 0 and gunicorn.pid == gunicorn_pid
+    assert gunicorn.status == signal.SIGTERM
+    assert _metrics.value('nginx_restarts') == restarts + 1
+    assert _metrics.value('nginx_start_time_seconds') == nginx.started
+
+
+def test_stop_after_max_failures():
+    nginx = _supervisor.Child('nginx', CRASH)
+    gunicorn = _supervisor.Child('gunicorn', SLEEP)
+    supervisor = _supervisor.Supervisor([nginx, gunicorn])
+
+    supervisor.start()
+    supervisor.run()
+
+    assert nginx.restarts == _supervisor.MAX_FAILURES - 1
+    assert gunicorn.status == signal.SIGTERM
+
+
+def test_stop():
+    nginx = _supervisor.Child('nginx', SLEEP, stop_signal=signal.SIGQUIT)
+    gunicorn = _supervisor.Child('gunicorn', SLEEP)
+    supervisor = _supervisor.Supervisor([nginx, gunicorn])
+
+    supervisor.start()
+    threading.Timer(.5, supervisor.stop).start()
+    supervisor.run()
+
+    assert nginx.status == signal.SIGQUIT
+    assert gunicorn.status == signal.SIGTERM
+    assert nginx.restarts == gunicorn.restarts == 0
+
+
+def test_start_installs_signal_handlers():
+    supervisor = _supervisor.Supervisor([])
+
+    with patch('signal.signal') as install:
+        supervisor.start()
+
+    installed = sorted(call[0][0] for call in install.call_args_list)
+    assert installed == sorted(_supervisor.STOP_SIGNALS + _supervisor.FORWARDED_SIGNALS)
+
+
+@patch('os.kill')
+def test_signal_without_process(kill):
+    child = _supervisor.Child('gunicorn', SLEEP)
+    child.signal(signal.SIGTERM)
+
+    child.process = MagicMock(pid=-1)
+    child.signal(signal.SIGTERM)
+
+    kill.assert_not_called()
+
+
+@pytest.mark.parametrize('status, expected', [(1 << 8, 'exit status 1'), (signal.SIGKILL, 'killed by signal 9')])
+def test_describe(status, expected):
+    assert _supervisor._describe(status) == expected
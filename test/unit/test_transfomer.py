@@ -10,13 +10,17 @@
 # distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
 # ANY KIND, either express or implied. See the License for the specific
 # language governing permissions and limitations under the License.
+import io
 import json
+import threading
+import time
 
-from mock import MagicMock, patch
+from mock import call, MagicMock, patch, PropertyMock
+import numpy as np
 import pytest
 from six.moves import http_client
 
-from sagemaker_containers import _content_types, _env, _errors, _transformer
+from sagemaker_containers import _cache, _content_types, _env, _errors, _transformer, _worker
 import test
 
 
@@ -34,6 +38,20 @@ def test_default_output_fn():
     assert response.headers['accept'] == _content_types.CSV
 
 
+def test_default_output_fn_with_iterator():
+    response = _transformer.default_output_fn(iter([[1, 2], [3]]), _content_types.CSV)
+
+    assert response.is_streamed
+    assert response.get_data(as_text=True) == '1\n2\n3\n'
+    assert response.mimetype == _content_types.CSV
+
+
+def test_default_input_fn_with_stream():
+    data = _transformer.default_input_fn(io.BytesIO(b'1,2\n3,4\n'), _content_types.CSV)
+
+    np.testing.assert_equal(data, np.array([[1., 2.], [3., 4.]]))
+
+
 def test_default_model_fn():
     with pytest.raises(NotImplementedError):
         _transformer.default_model_fn('model_dir')
@@ -171,9 +189,292 @@ def test_transformer_with_custom_transform_fn():
     transform_fn.assert_called_with(model, request.content, request.content_type, request.accept)
 
 
+@patch('sagemaker_containers._worker.Request', lambda: request)
+def test_transformer_with_streaming_transform_fn():
+    transform = _transformer.Transformer(model_fn=MagicMock(), transform_fn=lambda *args: iter(['1\n', '2\n']))
+    transform.initialize()
+
+    response = transform.transform()
+
+    assert response.is_streamed
+    assert response.get_data(as_text=True) == '1\n2\n'
+    assert response.mimetype == request.accept
+
+
+@patch.object(_env.ServingEnv, 'stream_requests', PropertyMock(return_value=True))
+@patch.object(_env.ServingEnv, 'response_cache_size', PropertyMock(return_value=1024))
+def test_transformer_with_stream_requests():
+    input_fn = MagicMock(side_effect=lambda stream, content_type: stream.read())
+    predict_fn = MagicMock()
+
+    transform = _transformer.Transformer(model_fn=MagicMock(), input_fn=input_fn, predict_fn=predict_fn,
+                                         output_fn=MagicMock())
+    transform.initialize()
+
+    csv_request = test.request(data='1,2', content_type=_content_types.CSV)
+    with patch('sagemaker_containers._worker.Request', lambda: csv_request):
+        transform.transform()
+
+    assert input_fn.call_args[0][1] == _content_types.CSV
+    assert predict_fn.call_args[0][0] == b'1,2'
+    assert transform.cache is None
+
+
+@patch.object(_env.ServingEnv, 'multi_model', PropertyMock(return_value=True))
+def test_transformer_with_multi_model(tmpdir):
+    tmpdir.mkdir('model-a')
+    model_fn = MagicMock(side_effect=lambda path: path)
+    transform_fn = MagicMock(return_value=_worker.Response('42'))
+
+    with patch('sagemaker_containers._env.model_dir', str(tmpdir)):
+        transform = _transformer.Transformer(model_fn=model_fn, transform_fn=transform_fn)
+    transform.initialize()
+
+    model_fn.assert_not_called()
+
+    model_request = test.request(path='/models/model-a/invoke', data='42', content_type=_content_types.JSON)
+    with patch('sagemaker_containers._worker.Request', lambda: model_request):
+        assert transform.transform().status_code == http_client.OK
+
+    transform_fn.assert_called_with(str(tmpdir.join('model-a')), '42', _content_types.JSON, _content_types.JSON)
+    assert transform.models.models == ['model-a']
+
+    unknown_request = test.request(path='/models/unknown/invoke', data='42', content_type=_content_types.JSON)
+    with patch('sagemaker_containers._worker.Request', lambda: unknown_request):
+        response = transform.transform()
+
+    assert response.status_code == http_client.NOT_FOUND
+    assert json.loads(response.get_data(as_text=True))['error'] == 'ModelNotFoundError'
+
+
+def test_transformer_transform_content():
+    model = MagicMock()
+    transform_fn = MagicMock(return_value=_worker.Response('42'))
+
+    transform = _transformer.Transformer(model_fn=lambda model_dir: model, transform_fn=transform_fn)
+    transform.initialize()
+
+    response = transform.transform_content('[1]', _content_types.JSON, _content_types.CSV)
+
+    assert response.get_data(as_text=True) == '42'
+    transform_fn.assert_called_with(model, '[1]', _content_types.JSON, _content_types.CSV)
+
+
 def test_transformer_too_many_custom_methods():
     with pytest.raises(ValueError) as e:
         _transformer.Transformer(input_fn=MagicMock(), predict_fn=MagicMock(),
                                  output_fn=MagicMock(), transform_fn=MagicMock())
 
     assert 'Cannot use transform_fn implementation with input_fn, predict_fn, and/or output_fn' in str(e)
+
+
+@patch.object(_env.ServingEnv, 'max_batch_size', PropertyMock(return_value=8))
+@patch('sagemaker_containers._worker.Request', lambda: request)
+def test_transformer_with_batching():
+    model = MagicMock()
+    predict_fn = MagicMock(return_value=[42])
+    output_fn = MagicMock()
+
+    transform = _transformer.Transformer(model_fn=lambda model_dir: model, input_fn=MagicMock(return_value=[6]),
+                                         predict_fn=predict_fn, output_fn=output_fn)
+    transform.initialize()
+    transform.transform()
+
+    predict_fn.assert_called_with([6], model)
+    output_fn.assert_called_with([42], request.accept)
+
+
+@patch.object(_env.ServingEnv, 'pipeline_threads', PropertyMock(return_value=2))
+def test_transformer_with_pipeline():
+    model = MagicMock()
+    threads = set()
+
+    def predict_fn(data, model):
+        threads.add(threading.current_thread().name)
+        return [x * 2 for x in data]
+
+    transform = _transformer.Transformer(model_fn=lambda model_dir: model, predict_fn=predict_fn)
+    transform.initialize()
+
+    response = transform.transform_content('[1, 2]', _content_types.JSON, _content_types.CSV)
+
+    assert response.get_data(as_text=True) == '2\n4\n'
+    assert threads == {'pipeline-predict'}
+
+
+@patch.object(_env.ServingEnv, 'record_split_threads', PropertyMock(return_value=4))
+def test_transformer_with_record_split_threads():
+    threads = set()
+
+    def predict_fn(data, model):
+        threads.add(threading.current_thread().ident)
+        return data * 2
+
+    transform = _transformer.Transformer(model_fn=MagicMock(), predict_fn=predict_fn)
+    transform.initialize()
+
+    content = '\n'.join('%d,%d' % (i, i + 1) for i in range(1000))
+    response = transform.transform_content(content, _content_types.CSV, _content_types.CSV)
+
+    assert response.get_data(as_text=True) == ''.join('%d,%d\n' % (2 * i, 2 * i + 2) for i in range(1000))
+    assert len(threads) > 1
+
+
+@patch.object(_env.ServingEnv, 'record_split_threads', PropertyMock(return_value=4))
+@patch('sagemaker_containers._splitting.Splitter')
+def test_transformer_with_record_split_threads_not_thread_safe(splitter):
+    _transformer.Transformer(thread_safe=False)
+    _transformer.Transformer(transform_fn=MagicMock())
+
+    assert not splitter.called
+
+
+@pytest.mark.parametrize('content_type, accept, status', [
+    ('fake/content-type', _content_types.JSON, http_client.UNSUPPORTED_MEDIA_TYPE),
+    (_content_types.JSON, 'fake/accept', http_client.NOT_ACCEPTABLE)])
+@patch.object(_env.ServingEnv, 'pipeline_threads', PropertyMock(return_value=2))
+def test_transformer_with_pipeline_unsupported_format(content_type, accept, status):
+    transform = _transformer.Transformer(model_fn=MagicMock(), predict_fn=lambda data, model: data)
+    transform.initialize()
+
+    response = transform.transform_content('[1, 2]', content_type, accept)
+
+    assert response.status_code == status
+    assert json.loads(response.get_data(as_text=True))['error'] == 'UnsupportedFormatError'
+
+
+@patch.object(_env.ServingEnv, 'pipeline_threads', PropertyMock(return_value=2))
+def test_transformer_with_pipeline_client_error():
+    transform = _transformer.Transformer(model_fn=MagicMock(), predict_fn=MagicMock(side_effect=ValueError('bad')))
+    transform.initialize()
+
+    with pytest.raises(_errors.ClientError):
+        transform.transform_content('[1, 2]', _content_types.JSON, _content_types.JSON)
+
+
+@pytest.mark.parametrize('kwargs', [dict(transform_fn=MagicMock()), dict(thread_safe=False)])
+@patch.object(_env.ServingEnv, 'pipeline_threads', PropertyMock(return_value=2))
+def test_transformer_without_pipeline(kwargs):
+    assert _transformer.Transformer(**kwargs)._pipeline is None
+
+
+@patch.object(_env.ServingEnv, 'response_cache_size', PropertyMock(return_value=1024))
+@patch('sagemaker_containers._cache.model_version', lambda model_dir: 'version')
+@patch('sagemaker_containers._worker.Request', lambda: request)
+def test_transformer_with_response_cache():
+    transform_fn = MagicMock(return_value=_worker.Response(b'1,2', _content_types.CSV))
+
+    transform = _transformer.Transformer(model_fn=MagicMock(), transform_fn=transform_fn)
+    transform.initialize()
+
+    response = transform.transform()
+    cached_response = transform.transform()
+
+    transform_fn.assert_called_once()
+    assert isinstance(transform.cache, _cache.MemoryCache)
+    assert (transform.cache.hits, transform.cache.misses) == (1, 1)
+    assert cached_response.get_data() == response.get_data() == b'1,2'
+    assert cached_response.status_code == http_client.OK
+    assert list(cached_response.headers) == list(response.headers)
+
+
+def transform_concurrently(transform, requests, transform_fn):
+    # the first request is transformed until the other requests wait for it.
+    def wait_for_requests(*args):
+        while transform.single_flight.deduplicated < requests - 1:
+            time.sleep(.01)
+        return transform_fn(*args)
+
+    responses = []
+    threads = [threading.Thread(target=lambda: responses.append(
+        transform.transform_content('[1]', _content_types.JSON, _content_types.CSV))) for _ in range(requests)]
+    with patch.object(transform, '_transform_fn', MagicMock(side_effect=wait_for_requests)) as mock:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+    return mock, responses
+
+
+@patch.object(_env.ServingEnv, 'request_coalescing', PropertyMock(return_value=True))
+@patch('sagemaker_containers._cache.model_version', lambda model_dir: 'version')
+@patch('sagemaker_containers._metrics.increment')
+def test_transformer_with_request_coalescing(increment):
+    transform = _transformer.Transformer(model_fn=MagicMock())
+    transform.initialize()
+
+    transform_fn, responses = transform_concurrently(
+        transform, 3, lambda model, content, content_type, accept: _worker.Response(b'1', accept))
+
+    transform_fn.assert_called_once()
+    assert [response.get_data() for response in responses] == [b'1'] * 3
+    assert len(set(id(response) for response in responses)) == 3
+    assert transform.single_flight.deduplicated == 2
+    increment.assert_has_calls([call('requests_coalesced')] * 2)
+
+
+@patch.object(_env.ServingEnv, 'request_coalescing', PropertyMock(return_value=True))
+@patch('sagemaker_containers._cache.model_version', lambda model_dir: 'version')
+def test_transformer_with_request_coalescing_streamed_response():
+    transform = _transformer.Transformer(model_fn=MagicMock())
+    transform.initialize()
+
+    transform_fn, responses = transform_concurrently(
+        transform, 2, lambda model, content, content_type, accept: iter([b'1', b'2']))
+
+    assert transform_fn.call_count == 2
+    assert [response.get_data() for response in responses] == [b'12'] * 2
+
+
+@pytest.mark.parametrize('stream_requests', [False, True])
+def test_transformer_without_request_coalescing(stream_requests):
+    with patch.object(_env.ServingEnv, 'request_coalescing', PropertyMock(return_value=stream_requests)), \
+            patch.object(_env.ServingEnv, 'stream_requests', PropertyMock(return_value=stream_requests)):
+        assert _transformer.Transformer().single_flight is None
+
+
+@patch.object(_env.ServingEnv, 'response_cache_size', PropertyMock(return_value=1024))
+@patch('sagemaker_containers._cache.model_version', lambda model_dir: 'version')
+@patch('sagemaker_containers._worker.Request', lambda: request)
+def test_transformer_with_response_cache_does_not_cache_errors():
+    transform_fn = MagicMock(return_value=_worker.Response(b'{}', status=http_client.BAD_REQUEST))
+
+    transform = _transformer.Transformer(model_fn=MagicMock(), transform_fn=transform_fn)
+    transform.initialize()
+    transform.transform()
+    transform.transform()
+
+    assert transform_fn.call_count == 2
+    assert transform.cache.hits == 0
+
+
+def test_transformer_without_response_cache():
+    assert _transformer.Transformer().cache is None
+
+
+def test_transformer_thread_safe():
+    assert _transformer.Transformer().thread_safe
+    assert not _transformer.Transformer(thread_safe=False).thread_safe
+
+
+@pytest.mark.parametrize('worker_class, synchronized', [('gthread', True), ('gevent', False), ('sync', False)])
+@patch('sagemaker_containers._transformer._synchronized')
+def test_transformer_not_thread_safe(synchronized_fn, worker_class, synchronized):
+    transform_fn = MagicMock()
+
+    with patch.object(_env.ServingEnv, 'model_server_worker_class', PropertyMock(return_value=worker_class)):
+        _transformer.Transformer(transform_fn=transform_fn, thread_safe=False)
+
+    assert synchronized_fn.called == synchronized
+
+
+def test_synchronized():
+    calls = []
+
+    def fn(x):
+        calls.append(x)
+        return x * 2
+
+    assert _transformer._synchronized(fn)(21) == 42
+    assert calls == [21]
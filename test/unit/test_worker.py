@@ -12,12 +12,17 @@
 # language governing permissions and limitations under the License.
 from __future__ import absolute_import
 
+import gzip
+import io
+import json
+import os
+
 from mock import MagicMock, patch, PropertyMock
 import numpy as np
 import pytest
 from six.moves import http_client, range
 
-from sagemaker_containers import _content_types, _encoders, _worker
+from sagemaker_containers import _content_types, _encoders, _env, _transformer, _worker
 import test
 
 
@@ -25,6 +30,11 @@ def test_default_ping_fn():
     assert _worker.default_healthcheck_fn().status_code == http_client.OK
 
 
+@patch('sagemaker_containers._readiness.is_ready', lambda: False)
+def test_default_ping_fn_not_ready():
+    assert _worker.default_healthcheck_fn().status_code == http_client.SERVICE_UNAVAILABLE
+
+
 @pytest.fixture(name='flask')
 def patch_flask():
     property_mock = PropertyMock(return_value='user_program')
@@ -49,9 +59,74 @@ def test_worker_with_initialize(module_name, expected_name):
     mock = MagicMock()
     app = _worker.Worker(transform_fn=mock.transform, initialize_fn=mock.initialize, module_name=module_name)
     assert app.import_name == expected_name
-    assert app.before_first_request_funcs == [mock.initialize]
+    assert app.before_first_request_funcs == []
     assert app.request_class == _worker.Request
 
+    mock.initialize.assert_called_once_with()
+
+
+@patch('sagemaker_containers._env.ServingEnv.preload_model', PropertyMock(return_value=True))
+def test_worker_with_preload_model():
+    mock = MagicMock()
+    app = _worker.Worker(transform_fn=mock.transform, initialize_fn=mock.initialize, module_name='test_module')
+
+    mock.initialize.assert_called_once_with()
+    assert app.before_first_request_funcs == []
+
+
+@patch('sagemaker_containers._readiness.mark_ready')
+def test_worker_marks_itself_ready(mark_ready):
+    _worker.Worker(transform_fn=MagicMock(), module_name='test_module')
+
+    mark_ready.assert_called_with(_worker.env.model_server_workers)
+
+
+@patch('sagemaker_containers._env.ServingEnv.preload_model', PropertyMock(return_value=True))
+@patch('sagemaker_containers._readiness.mark_ready')
+def test_worker_with_preload_model_is_not_marked_ready_in_master(mark_ready):
+    _worker.Worker(transform_fn=MagicMock(), initialize_fn=MagicMock(), module_name='test_module')
+
+    mark_ready.assert_not_called()
+
+
+def test_worker_warmup():
+    for extension, data in [('json', '[42]'), ('csv', '42'), ('txt', 'ignored')]:
+        with open(os.path.join(_env.model_dir, 'warmup.%s' % extension), 'w') as f:
+            f.write(data)
+
+    requests = []
+
+    def transform_fn():
+        request = _worker.Request()
+        requests.append((request.content, request.content_type, request.accept))
+        return _worker.Response(response='fake data', accept=request.accept)
+
+    initialize_fn = MagicMock(side_effect=lambda: requests.append('initialize'))
+
+    _worker.Worker(transform_fn=transform_fn, initialize_fn=initialize_fn, module_name='test_module')
+
+    assert requests == ['initialize',
+                        ('42', _content_types.CSV, _content_types.CSV),
+                        ('[42]', _content_types.JSON, _content_types.JSON)]
+
+
+@patch('sagemaker_containers._readiness.mark_ready')
+@patch('sagemaker_containers._worker.logger')
+def test_worker_warmup_with_error(logger, mark_ready):
+    with open(os.path.join(_env.model_dir, 'warmup.json'), 'w') as f:
+        f.write('[42]')
+
+    def transform_fn():
+        raise ValueError()
+
+    _worker.Worker(transform_fn=transform_fn, module_name='test_module')
+
+    # a failed warmup request is logged, and does not prevent the worker from serving requests.
+    args = logger.warning.call_args[0]
+    assert args[0] == 'Warmup request %s failed with status code %s: %s'
+    assert (args[1], args[2]) == (os.path.join(_env.model_dir, 'warmup.json'), http_client.INTERNAL_SERVER_ERROR)
+    mark_ready.assert_called_with(_worker.env.model_server_workers)
+
 
 def test_invocations():
     def transform_fn():
@@ -67,6 +142,140 @@ def test_invocations():
             assert response.mimetype == _content_types.JSON
 
 
+@patch('sagemaker_containers._env.ServingEnv.max_concurrent_requests', PropertyMock(return_value=1))
+@patch('sagemaker_containers._env.ServingEnv.retry_after', PropertyMock(return_value=5))
+def test_invocations_with_admission_control():
+    app = _worker.Worker(transform_fn=lambda: _worker.Response(response='fake data'), module_name='test_module')
+
+    with app.test_client() as client:
+        assert client.post('/invocations', buffered=True).status_code == http_client.OK
+        assert (app.admission.admitted, app.admission.in_flight) == (1, 0)
+
+        app.admission.acquire()
+        response = client.post('/invocations')
+
+    assert response.status_code == http_client.SERVICE_UNAVAILABLE
+    assert response.headers['Retry-After'] == '5'
+    assert json.loads(response.get_data().decode('utf-8'))['error'] == 'ServiceUnavailable'
+    assert app.admission.rejected == 1
+
+
+@patch('sagemaker_containers._env.ServingEnv.max_concurrent_requests', PropertyMock(return_value=1))
+def test_invocations_with_admission_control_streamed():
+    app = _worker.Worker(transform_fn=lambda: _worker.Response(response=iter([b'fake ', b'data'])),
+                         module_name='test_module')
+
+    with app.test_client() as client:
+        response = client.post('/invocations', buffered=False)
+        assert app.admission.in_flight == 1
+        assert client.post('/invocations').status_code == http_client.SERVICE_UNAVAILABLE
+
+        assert response.get_data() == b'fake data'
+        response.close()
+
+    assert app.admission.in_flight == 0
+
+
+def test_invocations_without_admission_control():
+    assert _worker.Worker(transform_fn=MagicMock(), module_name='test_module').admission is None
+
+
+def test_invocations_streamed():
+    def transform_fn():
+        return _worker.Response(response=('%s\n' % i for i in range(3)), accept=_content_types.CSV)
+
+    app = _worker.Worker(transform_fn=transform_fn, module_name='test_module')
+
+    with app.test_client() as client:
+        response = client.post('/invocations')
+
+    assert response.status_code == http_client.OK
+    assert 'Content-Length' not in response.headers
+    assert response.get_data(as_text=True) == '0\n1\n2\n'
+
+
+def test_invocations_with_compressed_request():
+    app = _worker.Worker(transform_fn=lambda: _worker.Response(response=_worker.Request().content),
+                         module_name='test_module')
+
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as f:
+        f.write(b'[1, 2, 3]')
+
+    with app.test_client() as client:
+        response = client.post('/invocations', data=buffer.getvalue(), headers={'Content-Encoding': 'gzip'})
+        assert response.get_data(as_text=True) == '[1, 2, 3]'
+
+        response = client.post('/invocations', data=b'[1, 2, 3]', headers={'Content-Encoding': 'br'})
+        assert response.status_code == http_client.UNSUPPORTED_MEDIA_TYPE
+
+
+@patch('sagemaker_containers._env.ServingEnv.max_decompressed_request_size', PropertyMock(return_value=1024 ** 2))
+def test_invocations_with_decompression_bomb():
+    app = _worker.Worker(transform_fn=lambda: _worker.Response(response=_worker.Request().content),
+                         module_name='test_module')
+
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as f:
+        f.write(b'\x00' * 64 * 1024 ** 2)
+
+    with app.test_client() as client:
+        response = client.post('/invocations', data=buffer.getvalue(), headers={'Content-Encoding': 'gzip'})
+
+    assert len(buffer.getvalue()) < 128 * 1024
+    assert response.status_code == http_client.REQUEST_ENTITY_TOO_LARGE
+
+
+@patch('sagemaker_containers._env.ServingEnv.response_compression', PropertyMock(return_value=True))
+@patch('sagemaker_containers._env.ServingEnv.response_compression_min_size', PropertyMock(return_value=10))
+@patch('sagemaker_containers._env.ServingEnv.use_nginx', PropertyMock(return_value=False))
+def test_invocations_with_response_compression():
+    app = _worker.Worker(transform_fn=lambda: _worker.Response(response=b'0123456789' * 10),
+                         module_name='test_module')
+
+    with app.test_client() as client:
+        response = client.post('/invocations', headers={'Accept-Encoding': 'gzip'})
+        uncompressed = client.post('/invocations')
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.GzipFile(fileobj=io.BytesIO(response.get_data())).read() == b'0123456789' * 10
+    assert 'Content-Encoding' not in uncompressed.headers
+
+
+@patch('sagemaker_containers._env.ServingEnv.response_compression_min_size', PropertyMock(return_value=0))
+@patch('sagemaker_containers._env.ServingEnv.use_nginx', PropertyMock(return_value=True))
+@patch('sagemaker_containers._compression.zstandard', None)
+def test_compress_leaves_gzip_to_nginx():
+    response = _worker.compress(_worker.Response(response=b'42'), 'gzip')
+
+    assert 'Content-Encoding' not in response.headers
+
+
+@patch('sagemaker_containers._env.ServingEnv.multi_model', PropertyMock(return_value=True))
+def test_invoke_model():
+    def transform_fn():
+        return _worker.Response(response=_worker.Request().target_model)
+
+    app = _worker.Worker(transform_fn=transform_fn, module_name='test_module')
+
+    with app.test_client() as client:
+        assert client.post('/models/model-a/invoke').get_data(as_text=True) == 'model-a'
+        assert client.post('/invocations', headers={_worker.TARGET_MODEL_HEADER: 'model-b'}).get_data(
+            as_text=True) == 'model-b'
+
+
+def test_metrics():
+    app = _worker.Worker(transform_fn=lambda: _worker.Response(response='fake data'), module_name='test_module')
+
+    with app.test_client() as client:
+        client.post('/invocations')
+        response = client.get('/metrics')
+
+    assert response.status_code == http_client.OK
+    assert response.mimetype == 'text/plain'
+    assert 'sagemaker_request_stage_seconds_count{stage="write"}' in response.get_data(as_text=True)
+
+
 def test_ping():
     app = _worker.Worker(transform_fn=MagicMock(), module_name='test_module')
 
@@ -95,9 +304,37 @@ def test_request():
     np.testing.assert_array_equal(result, np.array([6, 9.3]))
 
 
+def test_request_target_model():
+    assert test.request(path='/invocations').target_model is None
+    assert test.request(path='/models/model-a/invoke').target_model == 'model-a'
+    assert test.request(headers={'X-Amzn-SageMaker-Target-Model': 'model-b'}).target_model == 'model-b'
+
+
 def test_request_content_type():
     response = test.request(content_type=_content_types.CSV)
     assert response.content_type == _content_types.CSV
 
     response = test.request(headers={'ContentType': _content_types.NPY})
     assert response.content_type == _content_types.NPY
+
+
+@patch('sagemaker_containers._env.ServingEnv.ipc_socket', PropertyMock(return_value='/tmp/model.sock'))
+@patch('sagemaker_containers._ipc.serve')
+def test_worker_with_ipc_socket(serve):
+    transformer = _transformer.Transformer(model_fn=MagicMock())
+    transformer.initialize()
+
+    _worker.Worker(transform_fn=transformer.transform, module_name='test_module')
+
+    serve.assert_called_with(transformer.transform_content, '/tmp/model.sock', False, None, 100 * 1024 * 1024)
+
+
+@pytest.mark.parametrize('transform_fn, preload_model', [(MagicMock(), False), (_transformer.Transformer().transform,
+                                                                                True)])
+@patch('sagemaker_containers._env.ServingEnv.ipc_socket', PropertyMock(return_value='/tmp/model.sock'))
+@patch('sagemaker_containers._ipc.serve')
+def test_worker_without_ipc_socket(serve, transform_fn, preload_model):
+    with patch('sagemaker_containers._env.ServingEnv.preload_model', PropertyMock(return_value=preload_model)):
+        _worker.Worker(transform_fn=transform_fn, initialize_fn=MagicMock(), module_name='test_module')
+
+    assert not serve.called